@@ -0,0 +1,137 @@
+"""
+A local stand-in for the Ollama OpenAI-compatible endpoint.
+
+Answers POST /v1/chat/completions after a configurable delay with a fixed
+markdown page, so the conversion pipeline can be timed without a GPU or a
+paid API. Run it on its own with:
+
+    python -m benchmarks.fake_vlm --port 11500 --latency 0.5
+
+and point the app at it with OLLAMA_HOST=http://127.0.0.1:11500.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_MARKDOWN = "# Page\n\nLorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+
+
+class FakeVlmServer:
+    """
+    Serve the fake endpoint from a background thread.
+
+    Args:
+        latency (float): Seconds to wait before answering each request.
+        jitter (float): Extra random delay of up to this many seconds.
+        failure_rate (float): Fraction of requests answered with HTTP 500.
+        host (str): Interface to bind.
+        port (int): Port to bind; 0 picks a free one.
+        statuses (list): HTTP error statuses to answer the first requests with, in order.
+        retry_after (float): Retry-After header sent with 429 and 503 answers.
+    """
+
+    def __init__(self, latency: float = 0.1, jitter: float = 0.0, failure_rate: float = 0.0, host: str = "127.0.0.1", port: int = 0, statuses: list = None, retry_after: float = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.statuses = list(statuses or [])
+        self.retry_after = retry_after
+        self.requests = 0
+        self.failures = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                delay = fake.latency + random.uniform(0, fake.jitter)
+                failed = random.random() < fake.failure_rate
+                with fake._lock:
+                    fake.requests += 1
+                    fake.bytes_received += len(body)
+                    status = fake.statuses.pop(0) if fake.statuses else (500 if failed else None)
+                    if status:
+                        fake.failures += 1
+                time.sleep(delay)
+                if not self.path.startswith("/v1/chat/completions"):
+                    self.send_error(404)
+                    return
+                if status:
+                    self.send_response(status)
+                    if status in (429, 503) and fake.retry_after is not None:
+                        self.send_header("Retry-After", str(fake.retry_after))
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                model = json.loads(body or b"{}").get("model", "fake")
+                payload = json.dumps({
+                    "id": f"chatcmpl-{fake.requests}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": PAGE_MARKDOWN},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 1000, "completion_tokens": 20, "total_tokens": 1020},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible VLM endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeVlmServer(args.latency, args.jitter, args.failure_rate, args.host, args.port)
+    print(f"Fake VLM listening on {server.url}/v1/chat/completions")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Report what importing a module costs at startup, using `python -X importtime`.
+
+    cd fichero
+    PYTHONPATH=src python -m benchmarks.import_time fichero.app --budget 1.0
+
+Prints the slowest imports, writes them to a JSON file and exits non-zero if
+the total exceeds the budget or any of the heavy packages the GUI is meant to
+load lazily (docling, torch, chromadb, ...) are imported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# packages that must not be imported while the window is coming up
+HEAVY_PACKAGES = (
+    "docling",
+    "torch",
+    "chromadb",
+    "sentence_transformers",
+    "transformers",
+    "langchain",
+    "langchain_text_splitters",
+    "pandas",
+)
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    Parse `-X importtime` output into (module, self_us, cumulative_us, depth) tuples.
+
+    `depth` is 0 for imports made directly by the profiled statement.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # python indents nested imports by two spaces after a leading one
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile_import(module: str) -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def report(module: str, rows: list, top: int = 20) -> dict:
+    total_us = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+    modules = {name for name, _, _, _ in rows}
+    heavy = sorted(
+        package for package in HEAVY_PACKAGES
+        if package in modules or any(m.startswith(package + ".") for m in modules)
+    )
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_seconds": round(total_us / 1e6, 3),
+        "modules_imported": len(modules),
+        "heavy_packages": heavy,
+        "slowest": [
+            {"module": name, "self_ms": round(self_us / 1e3, 1), "cumulative_ms": round(cumulative_us / 1e3, 1)}
+            for name, self_us, cumulative_us, _ in slowest
+        ],
+    }
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Profile module import time.")
+    parser.add_argument("module", nargs="?", default="fichero.app")
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum total import time in seconds.")
+    parser.add_argument("--top", type=int, default=20, help="How many of the slowest imports to list.")
+    parser.add_argument("--allow-heavy", action="store_true", help="Do not fail when heavy packages are imported.")
+    parser.add_argument("--output", default="import_time.json", help="Where to write the JSON report.")
+    args = parser.parse_args(argv)
+
+    result = report(args.module, profile_import(args.module), args.top)
+    Path(args.output).write_text(json.dumps(result, indent=2))
+    for row in result["slowest"]:
+        print(f"{row['cumulative_ms']:>10.1f} ms  {row['module']}")
+    print(f"import {args.module}: {result['total_seconds']:.3f}s, {result['modules_imported']} modules")
+
+    failed = False
+    if result["total_seconds"] > args.budget:
+        print(f"Over the {args.budget:.2f}s budget.", file=sys.stderr)
+        failed = True
+    if result["heavy_packages"] and not args.allow_heavy:
+        print(f"Heavy packages imported at startup: {', '.join(result['heavy_packages'])}", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
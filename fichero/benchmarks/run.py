@@ -0,0 +1,156 @@
+"""
+Benchmark the conversion pipeline against the fake VLM server.
+
+    cd fichero
+    PYTHONPATH=src python -m benchmarks.run --files 20 --pages 3 --latency 0.2
+
+Generates a corpus of PDFs and images, converts it with `process_file` (one
+file at a time) and `convert_folders` (the batch path used by the app), and
+writes files/sec, pages/sec, p50/p95 latency, peak RSS and import time to a
+JSON file so results can be compared between releases.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fichero.fanout import percentile
+
+from .fake_vlm import FakeVlmServer
+
+BENCH_MODEL = {
+    "name": "fake-vlm",
+    "provider": "ollama",
+    "api_key": "OLLAMA_NEEDS_NO_KEY",
+    "prompt": "Extract text to markdown.",
+}
+
+
+def make_corpus(root: Path, files: int, pages: int, size=(1240, 1754)) -> dict:
+    """
+    Write `files` documents under `root`, alternating multi-page PDFs and PNG scans.
+
+    Returns the number of files and pages written.
+    """
+    from PIL import Image, ImageDraw
+
+    root.mkdir(parents=True, exist_ok=True)
+    total_pages = 0
+    for i in range(files):
+        images = []
+        for p in range(pages if i % 2 == 0 else 1):
+            image = Image.new("RGB", size, "white")
+            draw = ImageDraw.Draw(image)
+            for line in range(40):
+                draw.text((80, 80 + line * 40), f"Document {i} page {p} line {line} lorem ipsum dolor sit amet", fill="black")
+            images.append(image)
+        if i % 2 == 0:
+            images[0].save(root / f"doc_{i:05d}.pdf", "PDF", save_all=True, append_images=images[1:], resolution=150)
+        else:
+            images[0].save(root / f"scan_{i:05d}.png")
+        total_pages += len(images)
+    return {"files": files, "pages": total_pages}
+
+
+def peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1e6
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def measure_import_time(module: str = "fichero.process") -> float:
+    """
+    Seconds to import `module` in a fresh interpreter.
+    """
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True, env=os.environ.copy())
+    return time.perf_counter() - started
+
+
+def summarize(latencies: list, seconds: float, files: int, pages: int) -> dict:
+    return {
+        "seconds": round(seconds, 3),
+        "files": files,
+        "pages": pages,
+        "files_per_sec": round(files / seconds, 3) if seconds else 0.0,
+        "pages_per_sec": round(pages / seconds, 3) if seconds else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 3),
+        "latency_p95": round(percentile(latencies, 95), 3),
+    }
+
+
+def run(args) -> dict:
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args).copy(),
+    }
+
+    with FakeVlmServer(latency=args.latency, jitter=args.jitter) as server:
+        os.environ["OLLAMA_HOST"] = server.url
+        results["startup_seconds"] = round(measure_import_time(), 3)
+
+        from fichero.process import convert_folders, process_file
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            corpus = tmp / "corpus"
+            results["corpus"] = make_corpus(corpus, args.files, args.pages)
+
+            # one file at a time through process_file
+            latencies = []
+            pages = 0
+            started = time.perf_counter()
+            for path in sorted(corpus.iterdir()):
+                file_started = time.perf_counter()
+                doc = process_file(path, BENCH_MODEL["provider"], BENCH_MODEL["name"], BENCH_MODEL["prompt"])
+                latencies.append(time.perf_counter() - file_started)
+                pages += len(doc.pages)
+            results["process_file"] = summarize(latencies, time.perf_counter() - started, len(latencies), pages)
+
+            # the batch path, with the pool size under test
+            started = time.perf_counter()
+            summary = convert_folders([corpus], tmp / "out", BENCH_MODEL, max_workers=args.workers)
+            elapsed = time.perf_counter() - started
+            records = [r for r in summary.records if r.status == "done"]
+            results["convert_folders"] = summarize(
+                [r.seconds for r in records], elapsed, len(records), sum(r.pages for r in records)
+            )
+            results["convert_folders"]["failed"] = summary.failed
+            results["convert_folders"]["workers"] = args.workers
+
+        results["vlm_requests"] = server.requests
+        results["vlm_bytes_received"] = server.bytes_received
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return results
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Benchmark Fichero against a fake VLM server.")
+    parser.add_argument("--files", type=int, default=20, help="Documents in the generated corpus.")
+    parser.add_argument("--pages", type=int, default=3, help="Pages per generated PDF.")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake VLM latency per page, in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, in seconds.")
+    parser.add_argument("--workers", type=int, default=4, help="Pool size for convert_folders.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
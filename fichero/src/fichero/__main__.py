@@ -1,4 +1,14 @@
-from fichero.app import main
+import sys
+
+from fichero.cli import COMMANDS
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        # headless batch commands never load Toga
+        from fichero.cli import main as cli_main
+
+        sys.exit(cli_main())
+
+    from fichero.app import main
+
     main().main_loop()
@@ -1,14 +1,20 @@
-import traceback
+import asyncio
+import logging
+import threading
+from functools import partial
 from pathlib import Path
 import os
 import json
-import srsly
 import toga
 from toga.constants import COLUMN
 from toga.style import Pack
-from .process import process_folders
-from .store import test_chroma_client
-from .secrets import get_models_config
+from .secrets import get_models_config, save_models_config, selected_model_config
+from .manifest import Manifest
+from .lazy import import_heavy, prewarm
+from .timing import LOG_NAME, instrumentation
+
+# fichero.process and fichero.store pull in docling, torch and chromadb, so
+# they are imported on first use (or pre-warmed) rather than at startup
 
 
 class Fichero(toga.App):
@@ -18,16 +24,42 @@ class Fichero(toga.App):
         self.label.text = "📁 Folders selected:\n"
 
     async def action_open_logs(self, widget):
-        #this will open a window that displays the logs
+        # live per-stage totals and the slowest files, refreshed while the window is open
         logs = toga.Window(title="Logs")
-        logs.content = toga.ScrollContainer(
-            content=toga.MultilineTextInput(
-                value="".join(traceback.format_stack()),
-                style=Pack(flex=1, padding=10, font_size=14),
-            ),
-            style=Pack(flex=1, padding=10)
+        totals_table = toga.Table(
+            headings=["Stage", "Count", "Seconds", "MB", "Errors"],
+            style=Pack(flex=1),
         )
+        slowest_table = toga.Table(headings=["File", "Seconds"], style=Pack(flex=1))
+        files_label = toga.Label("")
+        logs.content = toga.Box(
+            children=[
+                toga.Label("Stage totals"),
+                totals_table,
+                files_label,
+                toga.Label("Slowest files"),
+                slowest_table,
+                toga.Label(f"Timing log: {instrumentation.log_path}"),
+            ],
+            style=Pack(direction=COLUMN, margin=10, flex=1),
+        )
+        closed = threading.Event()
+
+        def on_close(window, **kwargs):
+            closed.set()
+            return True
+
+        logs.on_close = on_close
         logs.show()
+        while not closed.is_set():
+            summary = instrumentation.summary()
+            totals_table.data = [
+                (stage, totals["count"], f"{totals['seconds']:.1f}", f"{totals['bytes'] / 1e6:.2f}", totals["errors"])
+                for stage, totals in summary["stages"].items()
+            ]
+            files_label.text = f"{summary['files']} files finished"
+            slowest_table.data = [(path, f"{seconds:.1f}") for path, seconds in instrumentation.slowest(20)]
+            await asyncio.sleep(1)
 
     async def action_select_folders(self, widget):
         try:
@@ -106,12 +138,267 @@ class Fichero(toga.App):
             if not isinstance(window, toga.MainWindow):
                 window.close()
 
+    def show_progress(self, progress):
+        # called on the event loop with a Progress from the conversion thread
+        self.info_label.text = str(progress)
+
+    def action_cancel(self, widget):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.info_label.text = "Cancelling after the files in progress..."
+
+    async def action_plan(self, widget):
+        # count files and pages and estimate time and cost, without converting
+        if self.cancel_event is not None:
+            return
+        if not (self.folders and self.model_selection.value):
+            self.info_label.text = "Please select folders\n and a model first."
+            return
+        model_config = selected_model_config(self)
+        if not model_config:
+            self.info_label.text = "The selected model has no configuration."
+            return
+        self.info_label.text = "Counting files and pages..."
+        try:
+            process = await self.loop.run_in_executor(None, import_heavy, "fichero.process")
+            plan = await self.loop.run_in_executor(
+                None,
+                partial(process.plan_run, list(self.folders), model_config, log_path=self.paths.logs / LOG_NAME),
+            )
+        except Exception as e:
+            self.info_label.text = f"Dry run failed: {e}"
+            return
+        self.info_label.text = str(plan)
+        # totals per folder and extension, as `fichero convert --dry-run` prints them
+        plan_window = toga.Window(title="Dry Run")
+        plan_table = toga.Table(
+            headings=["Folder", "Ext", "Files", "Pages", "MB"],
+            data=plan.rows(),
+            style=Pack(flex=1),
+        )
+        plan_window.content = toga.Box(
+            children=[
+                plan_table,
+                toga.Label(f"{plan}\nScanned in {plan.scan_seconds:.1f}s."),
+            ],
+            style=Pack(direction=COLUMN, margin=10, flex=1),
+        )
+        plan_window.show()
+
+    async def action_start(self, widget):
+        if self.cancel_event is not None:
+            return
+        if not (self.folders and self.model_selection.value):
+            self.info_label.text = "Please select folders\n and a model before starting."
+            return
+        model_config = selected_model_config(self)
+        if not model_config:
+            self.info_label.text = "The selected model has no configuration."
+            return
+
+        self.info_label.text = "Starting..."
+        self.cancel_event = threading.Event()
+        self.btn_start.enabled = False
+        self.btn_cancel.enabled = True
+
+        def on_progress(progress):
+            self.loop.call_soon_threadsafe(self.show_progress, progress)
+
+        try:
+            process = await self.loop.run_in_executor(None, import_heavy, "fichero.process")
+            summary = await self.loop.run_in_executor(
+                None,
+                partial(
+                    process.convert_folders,
+                    list(self.folders),
+                    self.output_folder,
+                    model_config,
+                    on_progress=on_progress,
+                    cancel_event=self.cancel_event,
+                    manifest=self.manifest,
+                    page_cache_path=self.paths.data / "page_cache.sqlite3",
+                    output_format=self.output_format,
+                ),
+            )
+            self.info_label.text = str(summary)
+            if summary.cancelled:
+                self.info_label.text += "\nCancelled."
+        except Exception as e:
+            self.info_label.text = f"Run failed: {e}"
+        finally:
+            self.cancel_event = None
+            self.btn_start.enabled = True
+            self.btn_cancel.enabled = False
+
+    def action_open_compare(self, widget):
+        # run several models over the selected folders in one pass, rendering each page once
+        compare_window = toga.Window(title="Compare Models")
+        switches = [toga.Switch(entry["name"]) for entry in self.models_config]
+        results = toga.Table(
+            headings=["Model", "Pages", "Mean s", "p95 s", "MB sent", "Cost"],
+            style=Pack(flex=1),
+        )
+        status_label = toga.Label("Each model writes to its own subfolder of the output folder.")
+
+        async def do_compare(widget):
+            if self.cancel_event is not None:
+                return
+            names = {switch.text for switch in switches if switch.value}
+            model_configs = [dict(entry) for entry in self.models_config if entry["name"] in names]
+            if not (self.folders and len(model_configs) > 1):
+                status_label.text = "Please select folders and at least two models."
+                return
+            self.cancel_event = threading.Event()
+            self.btn_start.enabled = False
+            self.btn_cancel.enabled = True
+            status_label.text = "Running..."
+
+            def on_progress(progress):
+                self.loop.call_soon_threadsafe(self.show_progress, progress)
+
+            try:
+                fanout = await self.loop.run_in_executor(None, import_heavy, "fichero.fanout")
+                summary, reports = await self.loop.run_in_executor(
+                    None,
+                    partial(
+                        fanout.fanout_folders,
+                        list(self.folders),
+                        self.output_folder,
+                        model_configs,
+                        on_progress=on_progress,
+                        cancel_event=self.cancel_event,
+                        page_cache_path=self.paths.data / "page_cache.sqlite3",
+                    ),
+                )
+            except Exception as e:
+                status_label.text = f"Run failed: {e}"
+                return
+            finally:
+                self.cancel_event = None
+                self.btn_start.enabled = True
+                self.btn_cancel.enabled = False
+            status_label.text = str(summary)
+            results.data = [
+                (
+                    report["model"],
+                    report["pages"],
+                    f"{report['latency_mean']:.2f}",
+                    f"{report['latency_p95']:.2f}",
+                    f"{report['bytes_sent'] / 1e6:.2f}",
+                    f"{report['cost']:.4f}",
+                )
+                for report in reports
+            ]
+
+        compare_window.content = toga.Box(
+            children=[
+                *switches,
+                toga.Button("Compare", on_press=do_compare),
+                status_label,
+                results,
+            ],
+            style=Pack(direction=COLUMN, margin=10, flex=1),
+        )
+        compare_window.show()
+
+    def get_searcher(self):
+        # the Chroma client and LaBSE model are only loaded once search is used
+        if self.searcher is None:
+            store = import_heavy("fichero.store")
+            client = store.create_chroma_client(self.paths.data / "chroma_db")
+            self.searcher = store.Searcher(store.get_collection(client))
+        return self.searcher
+
+    def action_open_search(self, widget):
+        search_window = toga.Window(title="Search")
+        query_input = toga.TextInput(placeholder="Search the converted documents")
+        folder_input = toga.TextInput(placeholder="Folder (optional)", style=Pack(flex=1))
+        file_input = toga.TextInput(placeholder="File (optional)", style=Pack(flex=1))
+        page_input = toga.NumberInput(min=1, style=Pack(flex=1))
+        model_input = toga.TextInput(placeholder="Model (optional)", style=Pack(flex=1))
+        results = toga.MultilineTextInput(readonly=True, style=Pack(flex=1))
+        status_label = toga.Label("")
+
+        async def do_search(widget):
+            if not query_input.value:
+                return
+            status_label.text = "Searching..."
+            try:
+                searcher = await self.loop.run_in_executor(None, self.get_searcher)
+                response = await self.loop.run_in_executor(
+                    None,
+                    partial(
+                        searcher.search,
+                        query_input.value,
+                        folder=folder_input.value or None,
+                        file=file_input.value or None,
+                        page=int(page_input.value) if page_input.value else None,
+                        model=model_input.value or None,
+                    ),
+                )
+            except Exception as e:
+                status_label.text = f"Search failed: {e}"
+                return
+            results.value = "\n\n".join(
+                f"{hit['metadata'].get('source')} (page {hit['metadata'].get('page')}, distance {hit['distance']:.3f})\n{hit['document']}"
+                for hit in response["hits"]
+            )
+            status_label.text = (
+                f"{len(response['hits'])} results in {response['seconds'] * 1000:.0f} ms"
+                + (" (cached)" if response["cached"] else "")
+            )
+
+        async def do_index(widget):
+            status_label.text = f"Indexing {self.output_folder}..."
+            try:
+                searcher = await self.loop.run_in_executor(None, self.get_searcher)
+                store = import_heavy("fichero.store")
+                stats = await self.loop.run_in_executor(
+                    None,
+                    partial(
+                        store.ingest_folder,
+                        searcher.collection,
+                        Path(self.output_folder),
+                        service=searcher.service,
+                        model=self.model_selection.value.name if self.model_selection.value else None,
+                    ),
+                )
+            except Exception as e:
+                status_label.text = f"Indexing failed: {e}"
+                return
+            searcher.clear()
+            status_label.text = (
+                f"Indexed {stats['ingested']} of {stats['files']} files "
+                f"({stats['skipped']} unchanged), {stats['chunks']} chunks."
+            )
+
+        search_window.content = toga.Box(
+            children=[
+                query_input,
+                toga.Box(children=[folder_input, file_input, page_input, model_input]),
+                toga.Box(children=[
+                    toga.Button("Search", on_press=do_search, style=Pack(flex=1)),
+                    toga.Button("Index Output Folder", on_press=do_index, style=Pack(flex=1)),
+                ]),
+                status_label,
+                results,
+            ],
+            style=Pack(direction=COLUMN, margin=10, flex=1),
+        )
+        search_window.show()
+
     def action_select_model(self, widget):
         # get the selected model from the selection widget
         self.center_label.text = f"✨ Model: {self.model_selection.value.name}\n  Provider: {self.model_selection.value.provider}"
 
     def action_select_output_format(self, widget):
-        self.right_label.text = "💾 Output Format:\n Markdown (that's all you get for now)"
+        # toggle between markdown files alone and markdown plus a Parquet
+        # dataset with a row per page (see fichero.columnar)
+        self.output_format = "parquet" if self.output_format == "markdown" else "markdown"
+        if self.output_format == "parquet":
+            self.right_label.text = f"💾 Output Format:\n Markdown + Parquet\n ({Path(self.output_folder) / 'parquet'})"
+        else:
+            self.right_label.text = "💾 Output Format:\n Markdown"
 
     def action_open_model_config_editor(self, widget):
         # Create a window for editing models_config
@@ -154,8 +441,8 @@ class Fichero(toga.App):
                 current_model_data["url"] = url_input.value
                 # add updated model back to the list
                 self.models_config.append(current_model_data)
-                #save changes to disk 
-                srsly.write_jsonl(self.paths.data / "models_config.jsonl", self.models_config)
+                #save changes to disk, replacing the file atomically
+                save_models_config(self.paths.data, self.models_config)
                 
                 editor_window.close()
 
@@ -194,6 +481,7 @@ class Fichero(toga.App):
         self.on_exit = self.exit_handler
         self.folders = []
         self.output_folder = self.paths.data
+        self.output_format = "markdown"
         # Text Labels to show responses.
         self.label = toga.Label("📁 Folders selected:\n", style=Pack(margin_top=20))
         
@@ -203,7 +491,14 @@ class Fichero(toga.App):
         self.info_label = toga.Label("", style=Pack(margin_top=20))
         self.window_counter = 0
         self.close_attempts = set()
+        self.cancel_event = None
+        self.searcher = None
         self.models_config = get_models_config(self)
+        # remembers converted files so Start only sends new or changed ones
+        self.manifest = Manifest(self.paths.data / "manifest.sqlite3")
+        logging.basicConfig(level=logging.INFO)
+        # per-stage timings of every file, shown in the Logs window
+        instrumentation.configure(self.paths.logs / LOG_NAME)
         # Buttons
         btn_style = Pack(flex=1)
         btn_view_logs = toga.Button(
@@ -211,6 +506,11 @@ class Fichero(toga.App):
             on_press=self.action_open_logs,
             style=btn_style,
         )
+        btn_search = toga.Button(
+            "Search",
+            on_press=self.action_open_search,
+            style=btn_style,
+        )
         btn_select_folders = toga.Button(
             "Select Folders",
             on_press=self.action_select_folders,
@@ -247,16 +547,9 @@ class Fichero(toga.App):
         # )
 
         # Start button
-        def on_start_pressed(widget):
-            if self.folders and self.model_selection.value:
-                self.info_label.text = ""
-                docs = process_folders(self)
-            else:
-                self.info_label.text = "Please select folders\n and a model before starting."
-
         btn_start = toga.Button(
             "Start / Iniciar",
-            on_press=on_start_pressed,
+            on_press=self.action_start,
             # green button 
             style=Pack(
                 background_color="green",
@@ -266,6 +559,19 @@ class Fichero(toga.App):
                 margin_bottom=20,
             ),
         )
+        self.btn_start = btn_start
+        btn_cancel = toga.Button(
+            "Cancel",
+            on_press=self.action_cancel,
+            enabled=False,
+            style=btn_style,
+        )
+        self.btn_cancel = btn_cancel
+        btn_plan = toga.Button(
+            "Dry Run",
+            on_press=self.action_plan,
+            style=btn_style,
+        )
         
         my_image = toga.Image(self.paths.app / "resources"/ "icons" / "fichero-512.png")
         logo = toga.ImageView(
@@ -284,7 +590,10 @@ class Fichero(toga.App):
             children=[
                logo,
                btn_start,
+               btn_plan,
+               btn_cancel,
                self.info_label,
+               btn_search,
                btn_view_logs
                #btn_test_chroma
             ],
@@ -306,6 +615,11 @@ class Fichero(toga.App):
             children=[
                 model_selection,
                 btn_models_config,
+                toga.Button(
+                    "Compare Models",
+                    on_press=self.action_open_compare,
+                    style=btn_style,
+                ),
                 self.center_label
             ],
             style=Pack(flex=1, direction=COLUMN, margin=10),
@@ -332,6 +646,12 @@ class Fichero(toga.App):
         # Show the main window
         self.main_window.show()
 
+    async def on_running(self):
+        # load the conversion stack in the background once the window is up;
+        # set FICHERO_PREWARM=0 to only import it when Start is pressed
+        if os.environ.get("FICHERO_PREWARM", "1") != "0":
+            prewarm()
+
 
 def main():
     return Fichero("Fichero", "co.apjan.fichero")
@@ -0,0 +1,255 @@
+"""
+Running a batch of conversions, apart from how each file is converted.
+
+`fichero.process.convert_folders` converting local folders and
+`fichero.process.queue_worker` converting files leased from a shared queue
+read the same models_config entry the same way (`RunSettings`), so a queue
+worker converts exactly as a local run would. `run_batch` is the local run's
+thread pool: it streams discovered files into the pool, skips files the
+manifest has seen, keeps the run under its memory budget and records every
+outcome. It does not import docling; the conversion itself is passed in.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+
+from .columnar import PARQUET_FOLDER, ParquetSink, markdown_records
+from .discovery import count_files, iter_files
+from .imaging import image_settings
+from .manifest import Manifest, hash_text
+from .memory import PAGES_HELD, MemoryBudget, MemoryMonitor, estimate_footprint, memory_settings
+from .output import OutputWriter, output_path_for
+from .planner import page_count
+from .progress import FileRecord, ProgressTracker, RunSummary
+from .providers import client_settings
+from .quality import tier_settings
+from .timing import instrumentation
+
+# default number of documents in flight per provider, overridden by
+# `max_concurrency` in models_config.jsonl
+provider_concurrency = {
+    "ollama": 2,
+    "dashscope": 4,
+    "sandbox": 4,
+}
+
+# "parquet" writes markdown as well, plus a row per page (see fichero.columnar)
+OUTPUT_FORMATS = ("markdown", "parquet")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunSettings:
+    """
+    What a batch run reads from its models_config entry, with the defaults filled in.
+    """
+    provider: str
+    model: str
+    prompt: str
+    api_key: str = None
+    max_workers: int = 1
+    page_chunk_size: int = 32
+    page_parallelism: int = 1
+    output_format: str = "markdown"
+    client: dict = field(default_factory=dict)
+    images: dict = field(default_factory=dict)
+    tiers: dict = field(default_factory=dict)
+    memory: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, model_config: dict, max_workers: int = None, output_format: str = "markdown") -> "RunSettings":
+        """
+        Args:
+            model_config (dict): The models_config entry to convert with.
+            max_workers (int): Documents in flight at once. Defaults to the
+                model's `max_concurrency` setting, or the provider default.
+            output_format (str): "markdown", or "parquet" to also write a row per page.
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+        provider = model_config['provider']
+        if max_workers is None:
+            max_workers = model_config.get('max_concurrency', provider_concurrency.get(provider, 1))
+        return cls(
+            provider=provider,
+            model=model_config['name'],
+            prompt=model_config.get('prompt', "Extract text to markdown!"),
+            api_key=model_config.get('api_key', None),
+            max_workers=max(1, int(max_workers)),
+            page_chunk_size=model_config.get('page_chunk_size', 32),
+            page_parallelism=model_config.get('page_parallelism', 1),
+            output_format=output_format,
+            client=client_settings(model_config),
+            images=image_settings(model_config),
+            tiers=tier_settings(model_config),
+            memory=memory_settings(model_config),
+        )
+
+    def sink(self, output_folder: Path):
+        """
+        The ParquetSink for "parquet" output to `output_folder`, or None.
+        """
+        if self.output_format == "parquet" and output_folder:
+            return ParquetSink(Path(output_folder) / PARQUET_FOLDER)
+        return None
+
+
+def run_batch(input_folders: list, extensions, convert, settings: RunSettings, output_folder: Path = None, on_progress=None, cancel_event=None, manifest: Manifest = None, writer: OutputWriter = None, sink: ParquetSink = None, budget: MemoryBudget = None) -> RunSummary:
+    """
+    Convert every file below `input_folders` on a thread pool of `settings.max_workers`.
+
+    A file that fails is logged and recorded so that the rest of the batch
+    still runs. Outcomes are recorded as files finish, on the worker (or,
+    once their markdown is written, on the writer thread), so files that
+    finish while the run is interrupted still count as done.
+
+    Args:
+        input_folders (list): Folders to search for files.
+        extensions: Extensions to convert, see `fichero.discovery.iter_files`.
+        convert (callable): `convert(file_path, input_dir, source_hash)` converts
+            and saves one file and returns its FileRecord; a record with a
+            `write` Future is finished once the write is.
+        settings (RunSettings): The provider, model and prompt the manifest
+            records, the workers and the memory settings.
+        output_folder (Path): Where the markdown files are written.
+        on_progress (callable): Called with a `Progress` after each file, from a worker thread.
+        cancel_event (threading.Event): When set, files not yet started are skipped.
+        manifest (Manifest): If given, files already converted with these settings
+            are skipped, and every finished or failed file is recorded. With a
+            `sink`, skipped files' pages are added from their saved markdown.
+        writer (OutputWriter): Closed, so every write is finished, before returning.
+        sink (ParquetSink): Closed before returning.
+        budget (MemoryBudget): If given, discovery waits while the documents in
+            flight would take the process over it (see `fichero.memory`).
+    Returns:
+        RunSummary: Counts and a FileRecord per file.
+    """
+    provider, model, prompt = settings.provider, settings.model, settings.prompt
+    max_workers = settings.max_workers
+    memory = settings.memory
+
+    def footprint(item):
+        # ranges converted in parallel each hold their own batch of pages
+        pages_held = PAGES_HELD * (settings.page_parallelism if settings.page_chunk_size else 1)
+        return estimate_footprint(
+            item.size,
+            page_count(item.path),
+            memory.get("memory_per_page_mb", 64),
+            memory.get("memory_per_file_mb", 4),
+            pages_held,
+        )
+
+    # a cheap counting pass so progress has a total; the files themselves
+    # are streamed into the pool below rather than held in a list
+    instrumentation.reset()
+    with instrumentation.stage(None, "discovery") as info:
+        total = count_files(input_folders, extensions)
+        info["files"] = total
+    tracker = ProgressTracker(total, callback=on_progress)
+    tracker.start()
+    summary = RunSummary(total=total)
+    if cancel_event is None:
+        cancel_event = threading.Event()
+
+    def run(file_path, input_dir, reserved=None):
+        try:
+            record = convert_file(file_path, input_dir)
+        except Exception as e:
+            logger.exception(f"Failed to process {file_path}")
+            failed(file_path, e)
+            return None
+        finally:
+            if reserved is not None:
+                budget.release(reserved)
+        if record is None:
+            return None
+        if record.write is None:
+            finished(record)
+        else:
+            record.write.add_done_callback(partial(finished, record))
+        return record
+
+    def convert_file(file_path, input_dir):
+        if cancel_event.is_set():
+            return None
+        if manifest is None or not output_folder:
+            return convert(file_path, input_dir, None)
+
+        output_path = output_path_for(file_path, input_dir, output_folder)
+        # is_done hashes the file, so the manifest has the hash cached after it
+        done = manifest.is_done(file_path, provider, model, prompt, output_path)
+        source_hash = manifest.file_hash(file_path) if sink is not None else None
+        if done:
+            if sink is not None and not sink.known(file_path, source_hash, model):
+                # converted before Parquet output was turned on
+                sink.add(markdown_records(
+                    output_path,
+                    source=file_path,
+                    folder=str(file_path.parent.relative_to(input_dir)),
+                    model=model,
+                    provider=provider,
+                    prompt_hash=hash_text(prompt),
+                    source_hash=source_hash,
+                ))
+            return FileRecord(path=file_path, status="skipped", output_path=output_path)
+        try:
+            return convert(file_path, input_dir, source_hash)
+        except Exception as e:
+            manifest.mark_failed(file_path, provider, model, prompt, output_path, e)
+            raise
+
+    def failed(file_path, e):
+        logger.error(f"Failed to process {file_path}: {e}")
+        summary.records.append(FileRecord(path=file_path, status="failed", error=str(e)))
+        tracker.update(file_path, error=e)
+        instrumentation.finish(file_path, "failed")
+
+    def finished(record, write=None):
+        # called once the record's markdown (if any) is on disk; files only
+        # count as done in the manifest after that
+        if write is not None and write.exception() is not None:
+            if manifest is not None:
+                manifest.mark_failed(record.path, provider, model, prompt, record.output_path, write.exception())
+            failed(record.path, write.exception())
+            return
+        record.write = None
+        if manifest is not None and record.status == "done" and record.output_path:
+            manifest.mark_done(record.path, provider, model, prompt, record.output_path)
+        summary.records.append(record)
+        instrumentation.finish(record.path, record.status)
+        tracker.update(record.path, skipped=record.status == "skipped")
+
+    monitor = MemoryMonitor()
+    with monitor, writer or nullcontext(), sink or nullcontext(), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            # keep a bounded window of submitted files so discovery never runs
+            # far ahead of conversion
+            pending = set()
+            for item in iter_files(input_folders, extensions):
+                if cancel_event.is_set():
+                    break
+                reserved = None
+                if budget is not None:
+                    # blocks discovery until the documents in flight leave room
+                    reserved = footprint(item)
+                    if not budget.acquire(reserved, cancel_event):
+                        break
+                pending.add(pool.submit(run, item.path, item.input_dir, reserved))
+                if len(pending) >= max_workers * 2:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            wait(pending)
+        except BaseException:
+            # skip the files not yet started before the pool waits for the running ones
+            cancel_event.set()
+            raise
+
+    summary.seconds = time.monotonic() - tracker.started
+    summary.cancelled = cancel_event.is_set()
+    summary.peak_memory = monitor.peak
+    return summary
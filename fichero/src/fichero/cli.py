@@ -0,0 +1,366 @@
+"""
+Headless command line entry point, for running batches without a display.
+
+    python -m fichero convert ~/scans --model granite3.2-vision --output ~/markdown
+
+Nothing here imports Toga, so it runs on servers without GTK.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+
+APP_ID = "co.apjan.fichero"
+APP_NAME = "fichero"
+FORMAL_NAME = "Fichero"
+AUTHOR = "apjanco"
+
+RESOURCES = Path(__file__).parent / "resources"
+
+
+def default_data_dir() -> Path:
+    """
+    The directory the GUI uses as `app.paths.data`, so both share one
+    models_config.jsonl, manifest and page cache.
+    """
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Application Support" / APP_ID
+    if sys.platform == "win32":
+        return Path.home() / "AppData" / "Local" / AUTHOR / FORMAL_NAME / "Data"
+    xdg_data_home = os.environ.get("XDG_DATA_HOME")
+    if xdg_data_home:
+        return Path(xdg_data_home) / APP_NAME
+    return Path.home() / ".local" / "share" / APP_NAME
+
+
+def default_logs_dir() -> Path:
+    """
+    The directory the GUI uses as `app.paths.logs`.
+    """
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Logs" / APP_ID
+    if sys.platform == "win32":
+        return Path.home() / "AppData" / "Local" / AUTHOR / FORMAL_NAME / "Logs"
+    xdg_state_home = os.environ.get("XDG_STATE_HOME")
+    if xdg_state_home:
+        return Path(xdg_state_home) / APP_NAME / "log"
+    return Path.home() / ".local" / "state" / APP_NAME / "log"
+
+
+def resolve_model_config(models_config: list, name: str, api_key: str = None) -> dict:
+    """
+    Find the models_config entry called `name`.
+
+    An `api_key` that names an environment variable (as in the shipped
+    models_config.start.jsonl) is replaced by that variable's value.
+    """
+    matches = [m for m in models_config if m.get("name") == name]
+    if not matches:
+        names = ", ".join(m.get("name", "?") for m in models_config)
+        raise SystemExit(f"Unknown model {name!r}. Configured models: {names}")
+    model_config = dict(matches[0])
+    if api_key:
+        model_config["api_key"] = api_key
+    elif model_config.get("api_key") in os.environ:
+        model_config["api_key"] = os.environ[model_config["api_key"]]
+    return model_config
+
+
+def print_progress(progress):
+    print(f"[{progress.done}/{progress.total}] {progress.current_file or ''}", file=sys.stderr)
+
+
+def cmd_convert(args) -> int:
+    from .manifest import Manifest
+    from .process import convert_folders
+    from .secrets import load_models_config
+    from .timing import LOG_NAME, instrumentation
+
+    data_dir = Path(args.data_dir).expanduser()
+    if args.config:
+        import srsly
+        models_config = list(srsly.read_jsonl(Path(args.config).expanduser()))
+    else:
+        # a dry run only reads; it must not create the config in the data directory
+        models_config = load_models_config(data_dir, RESOURCES / "models_config.start.jsonl", seed=not args.dry_run)
+    model_configs = [resolve_model_config(models_config, name, args.api_key) for name in args.model]
+    if args.dry_run:
+        return dry_run(args, model_configs)
+    model_config = model_configs[0]
+    if args.memory_budget:
+        model_config["memory_budget_mb"] = args.memory_budget
+    output_folder = Path(args.output).expanduser() if args.output else data_dir
+
+    manifest = None if args.no_manifest else Manifest(data_dir / "manifest.sqlite3")
+    page_cache_path = None if args.no_page_cache else data_dir / "page_cache.sqlite3"
+    instrumentation.configure(Path(args.logs_dir).expanduser() / LOG_NAME)
+    cancel_event = threading.Event()
+    if len(model_configs) > 1:
+        return compare_models(args, model_configs, output_folder, page_cache_path, cancel_event)
+    try:
+        summary = convert_folders(
+            [Path(f).expanduser() for f in args.folders],
+            output_folder,
+            model_config,
+            max_workers=args.workers,
+            on_progress=None if args.quiet else print_progress,
+            cancel_event=cancel_event,
+            manifest=manifest,
+            page_cache_path=page_cache_path,
+            output_format=args.output_format,
+        )
+    except KeyboardInterrupt:
+        # convert_folders has already set cancel_event and recorded the
+        # files that finished while it waited for them
+        print("Interrupted; finished files are recorded and will be skipped next run.", file=sys.stderr)
+        return 130
+    for record in summary.records:
+        if record.status == "failed":
+            print(f"FAILED {record.path}: {record.error}", file=sys.stderr)
+    if args.ingest:
+        ingest(output_folder, data_dir, model=model_config["name"])
+    return 1 if summary.failed else 0
+
+
+def dry_run(args, model_configs: list) -> int:
+    from .process import pages_in_flight, plan_run
+    from .timing import LOG_NAME
+
+    log_path = Path(args.logs_dir).expanduser() / LOG_NAME
+    plan = plan_run([Path(f).expanduser() for f in args.folders], model_configs[0], max_workers=args.workers, log_path=log_path)
+    print(f"{'Folder':50} {'Ext':>5} {'Files':>7} {'Pages':>8} {'MB':>9}")
+    for folder, extension, files, pages, megabytes in plan.rows():
+        print(f"{folder[-50:]:50} {extension:>5} {files:>7} {pages:>8} {megabytes:>9.1f}")
+    print(f"Scanned in {plan.scan_seconds:.1f}s.")
+    # the scan is the slow part; other models only need a new estimate
+    for model_config in model_configs:
+        plan.estimate(model_config, pages_in_flight(model_config, args.workers), log_path)
+        print(f"\n{model_config['name']}: {plan}")
+    return 0
+
+
+def compare_models(args, model_configs: list, output_folder: Path, page_cache_path: Path, cancel_event) -> int:
+    from .fanout import fanout_folders
+
+    try:
+        summary, reports = fanout_folders(
+            [Path(f).expanduser() for f in args.folders],
+            output_folder,
+            model_configs,
+            max_workers=args.workers,
+            on_progress=None if args.quiet else print_progress,
+            cancel_event=cancel_event,
+            page_cache_path=page_cache_path,
+        )
+    except KeyboardInterrupt:
+        cancel_event.set()
+        print("Interrupted.", file=sys.stderr)
+        return 130
+    print(f"{'model':30} {'pages':>6} {'mean s':>8} {'p95 s':>8} {'MB sent':>8} {'cost':>8}")
+    for report in reports:
+        print(
+            f"{report['model']:30} {report['pages']:>6} {report['latency_mean']:>8.2f} "
+            f"{report['latency_p95']:>8.2f} {report['bytes_sent'] / 1e6:>8.2f} {report['cost']:>8.4f}"
+        )
+    for record in summary.records:
+        if record.error:
+            print(f"FAILED {record.path}: {record.error}", file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+def cmd_enqueue(args) -> int:
+    from .discovery import iter_files
+    from .workqueue import WorkQueue
+
+    queue = WorkQueue(Path(args.queue).expanduser())
+    if args.retry_failed:
+        print(f"Requeued {queue.retry_failed()} failed files.")
+    if args.folders:
+        if args.extensions:
+            extensions = set(args.extensions.split(","))
+        else:
+            from .process import supported_extensions as extensions
+        added = queue.enqueue(iter_files([Path(f).expanduser() for f in args.folders], extensions))
+        print(f"Queued {added} new files.")
+    print(f"Queue: {queue.stats()}")
+    return 0
+
+
+def cmd_worker(args) -> int:
+    from .process import queue_worker
+    from .secrets import load_models_config
+    from .timing import LOG_NAME, instrumentation
+    from .workqueue import WorkQueue
+
+    data_dir = Path(args.data_dir).expanduser()
+    if args.config:
+        import srsly
+        models_config = list(srsly.read_jsonl(Path(args.config).expanduser()))
+    else:
+        models_config = load_models_config(data_dir, RESOURCES / "models_config.start.jsonl")
+    model_config = resolve_model_config(models_config, args.model, args.api_key)
+    queue = WorkQueue(Path(args.queue).expanduser(), lease_seconds=args.lease, max_attempts=args.max_attempts)
+    instrumentation.configure(Path(args.logs_dir).expanduser() / LOG_NAME)
+    cancel_event = threading.Event()
+    try:
+        summary = queue_worker(
+            queue,
+            Path(args.output).expanduser(),
+            model_config,
+            max_workers=args.workers,
+            cancel_event=cancel_event,
+            page_cache_path=None if args.no_page_cache else data_dir / "page_cache.sqlite3",
+            wait_for_work=args.wait,
+            output_format=args.output_format,
+        )
+    except KeyboardInterrupt:
+        cancel_event.set()
+        print("Interrupted; files in progress will be leased again when their leases expire.", file=sys.stderr)
+        return 130
+    return 1 if summary.failed else 0
+
+
+def ingest(output_folder: Path, data_dir: Path, collection_name: str = None, batch_size: int = 512, processes: int = None, model: str = None) -> dict:
+    from .embeddings import get_embedding_service
+    from .store import COLLECTION_NAME, create_chroma_client, get_collection, ingest_folder
+
+    service = get_embedding_service()
+    if processes is not None:
+        service.processes = processes
+    client = create_chroma_client(data_dir / "chroma_db")
+    collection = get_collection(client, collection_name or COLLECTION_NAME, service=service)
+    try:
+        stats = ingest_folder(collection, output_folder, batch_size=batch_size, service=service, model=model)
+    finally:
+        service.close()
+    print(f"Ingested {stats['ingested']} of {stats['files']} files ({stats['skipped']} unchanged), {stats['chunks']} chunks.")
+    print(f"Embedding: {service.stats()}")
+    return stats
+
+
+def cmd_ingest(args) -> int:
+    ingest(
+        Path(args.folder).expanduser(),
+        Path(args.data_dir).expanduser(),
+        collection_name=args.collection,
+        batch_size=args.batch_size,
+        processes=args.processes,
+        model=args.model,
+    )
+    return 0
+
+
+def cmd_export(args) -> int:
+    from .columnar import export_folder
+
+    folder = Path(args.folder).expanduser()
+    stats = export_folder(folder, Path(args.dataset).expanduser() if args.dataset else None, model=args.model, row_group_size=args.row_group_size)
+    print(f"Exported {stats['rows']} pages of {stats['files']} files to {stats['root']}.")
+    return 0
+
+
+def cmd_search(args) -> int:
+    from .store import COLLECTION_NAME, Searcher, create_chroma_client, get_collection
+
+    client = create_chroma_client(Path(args.data_dir).expanduser() / "chroma_db")
+    searcher = Searcher(get_collection(client, args.collection or COLLECTION_NAME))
+    response = searcher.search(
+        args.query,
+        n_results=args.n,
+        folder=args.folder,
+        file=args.file,
+        page=args.page,
+        model=args.model,
+    )
+    for hit in response["hits"]:
+        metadata = hit["metadata"]
+        print(f"{hit['distance']:.3f}  {metadata.get('source')} p.{metadata.get('page')}")
+        print(f"    {hit['document'][:200]!r}")
+    print(f"{len(response['hits'])} results in {response['seconds'] * 1000:.0f} ms", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m fichero", description="Fichero batch tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert folders of scans to markdown.")
+    convert.add_argument("folders", nargs="+", help="Input folders to convert.")
+    convert.add_argument("--model", required=True, action="append", help="Name of the model in models_config.jsonl. Repeat to compare several models in one pass; each writes to its own subfolder of the output folder.")
+    convert.add_argument("--output", help="Output folder (default: the data directory).")
+    convert.add_argument("--data-dir", default=str(default_data_dir()), help="Where models_config.jsonl, the manifest and caches live.")
+    convert.add_argument("--config", help="Read models from this models_config.jsonl instead.")
+    convert.add_argument("--api-key", help="Override the model's API key.")
+    convert.add_argument("--workers", type=int, help="Documents in flight at once.")
+    convert.add_argument("--no-manifest", action="store_true", help="Reconvert files even if already done.")
+    convert.add_argument("--no-page-cache", action="store_true", help="Do not cache VLM responses per page.")
+    convert.add_argument("--quiet", action="store_true", help="Do not print per-file progress.")
+    convert.add_argument("--ingest", action="store_true", help="Add the markdown to the vector store afterwards.")
+    convert.add_argument("--memory-budget", type=int, help="Keep the run's memory under this many MB by waiting to start large documents.")
+    convert.add_argument("--dry-run", action="store_true", help="Only count files and pages and estimate time and cost from past runs.")
+    convert.add_argument("--output-format", choices=("markdown", "parquet"), default="markdown", help="'parquet' also writes a row per page to a Parquet dataset in the output folder (needs pyarrow).")
+    convert.add_argument("--logs-dir", default=str(default_logs_dir()), help="Where the per-stage timing log is written.")
+    convert.set_defaults(func=cmd_convert)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Add converted markdown to the vector store.")
+    ingest_parser.add_argument("folder", help="Folder of converted markdown files.")
+    ingest_parser.add_argument("--data-dir", default=str(default_data_dir()), help="Where the chroma_db folder lives.")
+    ingest_parser.add_argument("--collection", help="Collection name.")
+    ingest_parser.add_argument("--batch-size", type=int, default=512, help="Chunks embedded per batch.")
+    ingest_parser.add_argument("--processes", type=int, help="CPU worker processes for embedding.")
+    ingest_parser.add_argument("--model", help="Model name to record with each chunk.")
+    ingest_parser.set_defaults(func=cmd_ingest)
+
+    enqueue = subparsers.add_parser("enqueue", help="Add files to a shared work queue for `worker`.")
+    enqueue.add_argument("folders", nargs="*", help="Input folders to queue.")
+    enqueue.add_argument("--queue", required=True, help="Queue file, on storage every worker can reach.")
+    enqueue.add_argument("--extensions", help="Comma-separated extensions to queue (default: all that docling reads).")
+    enqueue.add_argument("--retry-failed", action="store_true", help="Give failed files another set of attempts.")
+    enqueue.set_defaults(func=cmd_enqueue)
+
+    worker = subparsers.add_parser("worker", help="Convert files from a shared work queue.")
+    worker.add_argument("--queue", required=True, help="Queue file created by `enqueue`.")
+    worker.add_argument("--model", required=True, help="Name of the model in models_config.jsonl.")
+    worker.add_argument("--output", required=True, help="Output folder, usually on shared storage.")
+    worker.add_argument("--data-dir", default=str(default_data_dir()), help="Where models_config.jsonl and the page cache live.")
+    worker.add_argument("--config", help="Read models from this models_config.jsonl instead.")
+    worker.add_argument("--api-key", help="Override the model's API key.")
+    worker.add_argument("--workers", type=int, help="Files in flight at once in this worker.")
+    worker.add_argument("--lease", type=float, default=600, help="Seconds a lease lasts without renewal.")
+    worker.add_argument("--max-attempts", type=int, default=3, help="Attempts per file before it is marked failed.")
+    worker.add_argument("--wait", action="store_true", help="Keep polling when the queue is empty.")
+    worker.add_argument("--no-page-cache", action="store_true", help="Do not cache VLM responses per page.")
+    worker.add_argument("--output-format", choices=("markdown", "parquet"), default="markdown", help="'parquet' also writes a row per page to a Parquet dataset in the output folder (needs pyarrow).")
+    worker.add_argument("--logs-dir", default=str(default_logs_dir()), help="Where the per-stage timing log is written.")
+    worker.set_defaults(func=cmd_worker)
+
+    export = subparsers.add_parser("export", help="Write converted markdown to a Parquet dataset, one row per page.")
+    export.add_argument("folder", help="Folder of converted markdown files.")
+    export.add_argument("--dataset", help="Dataset folder (default: FOLDER/parquet).")
+    export.add_argument("--model", help="Model name to record with each page.")
+    export.add_argument("--row-group-size", type=int, default=10_000, help="Pages per Parquet row group.")
+    export.set_defaults(func=cmd_export)
+
+    search = subparsers.add_parser("search", help="Semantic search over ingested markdown.")
+    search.add_argument("query", help="Text to search for.")
+    search.add_argument("-n", type=int, default=10, help="Number of results.")
+    search.add_argument("--data-dir", default=str(default_data_dir()), help="Where the chroma_db folder lives.")
+    search.add_argument("--collection", help="Collection name.")
+    search.add_argument("--folder", help="Only chunks from this folder (relative to the output folder).")
+    search.add_argument("--file", help="Only chunks from this markdown file name.")
+    search.add_argument("--page", type=int, help="Only chunks from this page.")
+    search.add_argument("--model", help="Only chunks converted with this model.")
+    search.set_defaults(func=cmd_search)
+
+    return parser
+
+
+COMMANDS = ("convert", "ingest", "search", "enqueue", "worker", "export")
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    return args.func(args)
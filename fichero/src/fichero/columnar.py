@@ -0,0 +1,237 @@
+"""
+Page-level Parquet output, for analysing a converted corpus without reading
+one markdown file per document.
+
+Each converted page becomes one row:
+
+    source, output, folder, file, page, text, text_hash, source_hash,
+    model, provider, prompt_hash, pages, seconds, converted_at
+
+Rows are written in row groups to Hive-partitioned files, by default one
+folder per model (``parquet/model=granite3.2-vision/part-….parquet``), so
+pyarrow, pandas, polars or DuckDB can memory-map the dataset and filter it
+by partition, folder or page:
+
+    import pyarrow.dataset as ds
+    pages = ds.dataset("output/parquet", partitioning="hive").to_table(filter=ds.field("page") == 1)
+
+Part files are only ever added. A source that is converted again (because
+it changed, or with another prompt) gets new rows while its earlier rows
+stay in older part files, so readers should keep the latest `converted_at`
+per source and model, e.g. in DuckDB:
+
+    SELECT * FROM read_parquet('output/parquet/**/*.parquet', hive_partitioning = true)
+    QUALIFY converted_at = max(converted_at) OVER (PARTITION BY source, model)
+
+Files a run skips because they were converted before are added from their
+saved markdown, unless the dataset already has rows for the same contents
+(`ParquetSink.known`).
+
+pyarrow is optional; it is only imported when Parquet output is used.
+"""
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .discovery import iter_files
+from .output import split_pages
+
+PARQUET_FOLDER = "parquet"
+
+COLUMNS = (
+    ("source", "string"),
+    ("output", "string"),
+    ("folder", "string"),
+    ("file", "string"),
+    ("page", "int32"),
+    ("text", "large_string"),
+    ("text_hash", "string"),
+    ("source_hash", "string"),
+    ("model", "string"),
+    ("provider", "string"),
+    ("prompt_hash", "string"),
+    ("pages", "int32"),
+    ("seconds", "float64"),
+    ("converted_at", "timestamp"),
+)
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def arrow_schema(exclude: tuple = ()):
+    pa = import_pyarrow()
+    types = {
+        "string": pa.string(),
+        "large_string": pa.large_string(),
+        "int32": pa.int32(),
+        "float64": pa.float64(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS if name not in exclude])
+
+
+def page_records(pages: dict, source: Path, output: Path = None, folder: str = "", model: str = None, provider: str = None, prompt_hash: str = None, source_hash: str = None, seconds: float = None) -> list:
+    """
+    Build one row per page from {page number: markdown}.
+    """
+    converted_at = datetime.now(timezone.utc)
+    return [
+        {
+            "source": str(source),
+            "output": str(output) if output else None,
+            "folder": folder,
+            "file": Path(source).name,
+            "page": page_no,
+            "text": text,
+            "text_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "source_hash": source_hash,
+            "model": model,
+            "provider": provider,
+            "prompt_hash": prompt_hash,
+            "pages": len(pages),
+            "seconds": seconds,
+            "converted_at": converted_at,
+        }
+        for page_no, text in sorted(pages.items())
+    ]
+
+
+def markdown_records(markdown_path: Path, source: Path = None, **fields) -> list:
+    """
+    Build one row per page of a saved markdown file, split at its page breaks.
+
+    `source` defaults to the markdown file itself; other `fields` are passed
+    on to `page_records`.
+    """
+    pages = dict(enumerate(split_pages(Path(markdown_path).read_text(encoding="utf-8")), start=1))
+    return page_records(pages, source=source or markdown_path, output=markdown_path, **fields)
+
+
+class ParquetSink:
+    """
+    Buffers page rows and writes them to a partitioned Parquet dataset in row groups.
+
+    Every sink writes new part files, so several runs (or workers) can add
+    to the same dataset. Part files are written under a temporary name and
+    renamed when the sink is closed, so readers never see a partial file.
+
+    Args:
+        root (Path): Dataset folder.
+        partition_by (tuple): Columns that become `column=value` folders.
+        row_group_size (int): Rows buffered per partition before a row group is written.
+    """
+
+    def __init__(self, root: Path, partition_by: tuple = ("model",), row_group_size: int = 10_000):
+        import_pyarrow()
+        self.root = Path(root)
+        self.partition_by = tuple(partition_by)
+        self.row_group_size = row_group_size
+        self.schema = arrow_schema(exclude=self.partition_by)
+        self._buffers = {}
+        self._writers = {}
+        self._lock = threading.Lock()
+        self._known = None
+        self.rows = 0
+        self.row_groups = 0
+
+    def _partition_dir(self, key: tuple) -> Path:
+        folder = self.root
+        for column, value in zip(self.partition_by, key):
+            folder = folder / f"{column}={str(value).replace('/', '_') if value is not None else '__HIVE_DEFAULT_PARTITION__'}"
+        return folder
+
+    def _write(self, key: tuple, rows: list):
+        pa = import_pyarrow()
+        table = pa.Table.from_pylist(rows, schema=self.schema)
+        if key not in self._writers:
+            folder = self._partition_dir(key)
+            folder.mkdir(parents=True, exist_ok=True)
+            final = folder / f"part-{uuid.uuid4().hex}.parquet"
+            tmp = folder / f".{final.name}.tmp"
+            self._writers[key] = (pa.parquet.ParquetWriter(str(tmp), self.schema, compression="zstd"), tmp, final)
+        self._writers[key][0].write_table(table, row_group_size=len(rows))
+        self.row_groups += 1
+
+    def _read_known(self) -> set:
+        if not any(self.root.rglob("*.parquet")):
+            return set()
+        import pyarrow.dataset as ds
+
+        # part files still being written are hidden, so the dataset skips them
+        table = ds.dataset(str(self.root), format="parquet", partitioning="hive").to_table(columns=["source", "source_hash", "model"])
+        return set(zip(*(table.column(name).to_pylist() for name in ("source", "source_hash", "model"))))
+
+    def known(self, source: Path, source_hash: str, model: str = None) -> bool:
+        """
+        Whether earlier runs wrote rows for these contents of `source` with `model`.
+        """
+        with self._lock:
+            if self._known is None:
+                self._known = self._read_known()
+            return (str(source), source_hash, model) in self._known
+
+    def add(self, records: list):
+        """
+        Queue rows, writing a row group for each partition whose buffer is full.
+        """
+        with self._lock:
+            for record in records:
+                key = tuple(record.get(column) for column in self.partition_by)
+                row = {name: value for name, value in record.items() if name not in self.partition_by}
+                buffer = self._buffers.setdefault(key, [])
+                buffer.append(row)
+                self.rows += 1
+                if len(buffer) >= self.row_group_size:
+                    self._write(key, buffer)
+                    self._buffers[key] = []
+
+    def close(self):
+        """
+        Write what is buffered and publish the part files.
+        """
+        with self._lock:
+            for key, buffer in self._buffers.items():
+                if buffer:
+                    self._write(key, buffer)
+            self._buffers = {}
+            for writer, tmp, final in self._writers.values():
+                writer.close()
+                tmp.replace(final)
+            self._writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        return {"rows": self.rows, "row_groups": self.row_groups, "root": str(self.root)}
+
+
+def export_folder(markdown_folder: Path, root: Path = None, model: str = None, row_group_size: int = 10_000) -> dict:
+    """
+    Write an existing folder of converted markdown to a Parquet dataset,
+    one row per page. Defaults to `markdown_folder/parquet`.
+    """
+    markdown_folder = Path(markdown_folder)
+    root = Path(root) if root else markdown_folder / PARQUET_FOLDER
+    with ParquetSink(root, row_group_size=row_group_size) as sink:
+        files = 0
+        for item in iter_files([markdown_folder], {"md"}):
+            sink.add(markdown_records(
+                item.path,
+                folder=str(item.path.relative_to(markdown_folder).parent),
+                model=model,
+            ))
+            files += 1
+    return dict(sink.stats(), files=files)
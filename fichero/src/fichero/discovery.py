@@ -0,0 +1,105 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+# directories that never hold research material worth converting
+IGNORED_DIRS = frozenset({
+    "__pycache__",
+    "node_modules",
+    "$RECYCLE.BIN",
+    "System Volume Information",
+    "lost+found",
+})
+
+# partial downloads, editor backups and office lock files
+TEMP_PREFIXES = ("~$", ".~lock")
+TEMP_SUFFIXES = ("~", ".tmp", ".temp", ".part", ".partial", ".crdownload", ".download")
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    """
+    A file to convert, and the selected folder it was found under.
+    """
+    path: Path
+    input_dir: Path
+    size: int
+
+
+def is_temp_file(name: str) -> bool:
+    lowered = name.lower()
+    return lowered.startswith(TEMP_PREFIXES) or lowered.endswith(TEMP_SUFFIXES)
+
+
+def scan_folder(input_dir: Path, extensions: frozenset, ignored_dirs: frozenset = IGNORED_DIRS, include_hidden: bool = False) -> Iterator[WorkItem]:
+    """
+    Lazily yield the files below `input_dir` whose extension is in `extensions`.
+
+    Uses os.scandir so file types come from the directory listing instead
+    of a stat call per entry. Sizes still take a stat call on POSIX (only on
+    Windows does the listing carry them), so only the files that pass the
+    extension and temporary-file filters are stat'ed. Hidden entries,
+    temporary files and `ignored_dirs` are skipped, and symlinked
+    directories are not followed.
+
+    Args:
+        input_dir (Path): The folder to scan.
+        extensions (frozenset): Lowercase extensions without the leading dot.
+        ignored_dirs (frozenset): Directory names that are not descended into.
+        include_hidden (bool): Also scan dot-files and dot-directories.
+    """
+    input_dir = Path(input_dir)
+    if not input_dir.is_dir():
+        raise ValueError(f"Input path {input_dir} is not a directory.")
+    stack = [str(input_dir)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except (PermissionError, FileNotFoundError):
+            continue
+        with entries:
+            subdirs = []
+            for entry in entries:
+                name = entry.name
+                if not include_hidden and name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in ignored_dirs:
+                            subdirs.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if os.path.splitext(name)[1][1:].lower() not in extensions or is_temp_file(name):
+                    continue
+                try:
+                    size = entry.stat().st_size
+                except OSError:
+                    continue
+                yield WorkItem(Path(entry.path), input_dir, size)
+        # walk subdirectories in listing order, depth first
+        stack.extend(reversed(subdirs))
+
+
+def iter_files(folders: Iterable[Path], extensions: Iterable[str], **kwargs) -> Iterator[WorkItem]:
+    """
+    Lazily yield work items from every folder in `folders`, in order.
+
+    Args:
+        folders: The selected input folders.
+        extensions: Supported extensions, with or without a leading dot.
+        **kwargs: Passed on to `scan_folder`.
+    """
+    extensions = frozenset(e.lower().lstrip(".") for e in extensions)
+    for input_dir in folders:
+        yield from scan_folder(input_dir, extensions, **kwargs)
+
+
+def count_files(folders: Iterable[Path], extensions: Iterable[str], **kwargs) -> int:
+    """
+    Count the files `iter_files` would yield, without keeping them in memory.
+    """
+    return sum(1 for _ in iter_files(folders, extensions, **kwargs))
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+DEFAULT_MODEL = "LaBSE"
+
+
+class EmbeddingService:
+    """
+    Loads a SentenceTransformer model once and embeds text with it in batches.
+
+    The same loaded model is used for embedding, for the token splitter
+    and (through `chroma_embedding_function`) for Chroma's own queries, so
+    LaBSE is read from disk once per process instead of once per use.
+
+    Args:
+        model_name (str): SentenceTransformer model to load.
+        batch_size (int): Texts per encode batch.
+        processes (int): CPU worker processes to spread large batches over;
+            0 or 1 encodes in this process.
+        device (str): Torch device for single-process encoding.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 64, processes: int = 0, device: str = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.processes = processes
+        self.device = device
+        self.texts = 0
+        self.calls = 0
+        self.seconds = 0.0
+        self._model = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    def _multi_process_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.processes)
+            return self._pool
+
+    def embed(self, texts: list) -> list:
+        """
+        Embed `texts`, returning one list of floats per text.
+
+        Batches big enough to keep every worker busy go to the multi-process
+        pool when `processes` is set; smaller ones are encoded in-process.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        started = time.perf_counter()
+        if self.processes > 1 and len(texts) >= self.batch_size * self.processes:
+            embeddings = self.model.encode_multi_process(
+                texts, self._multi_process_pool(), batch_size=self.batch_size
+            )
+        else:
+            embeddings = self.model.encode(
+                texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False
+            )
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.texts += len(texts)
+            self.calls += 1
+            self.seconds += elapsed
+        return [embedding.tolist() for embedding in embeddings]
+
+    def split_text(self, text: str, chunk_overlap: int = 5) -> list:
+        """
+        Split `text` into chunks of at most the model's max sequence length in tokens.
+
+        Matches SentenceTransformersTokenTextSplitter(chunk_overlap=5) but
+        reuses this service's tokenizer instead of loading the model again.
+        """
+        from langchain_text_splitters.base import Tokenizer, split_text_on_tokens
+
+        def encode(text):
+            # drop the start and stop tokens, as the langchain splitter does
+            return self.tokenizer.encode(text, max_length=2**32, truncation="do_not_truncate")[1:-1]
+
+        tokenizer = Tokenizer(
+            chunk_overlap=chunk_overlap,
+            tokens_per_chunk=self.model.max_seq_length,
+            decode=self.tokenizer.decode,
+            encode=encode,
+        )
+        return split_text_on_tokens(text=text, tokenizer=tokenizer)
+
+    def chroma_embedding_function(self):
+        """
+        Chroma's SentenceTransformerEmbeddingFunction, sharing this service's model.
+        """
+        from chromadb.utils import embedding_functions
+
+        ef_class = embedding_functions.SentenceTransformerEmbeddingFunction
+        # the chroma class keeps loaded models in a class-level dict, so
+        # seeding it stops chroma from loading a second copy
+        ef_class.models.setdefault(self.model_name, self.model)
+        return ef_class(model_name=self.model_name)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self.model.stop_multi_process_pool(self._pool)
+                self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "texts": self.texts,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 3),
+            "texts_per_sec": round(self.texts / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name: str = DEFAULT_MODEL, **kwargs) -> EmbeddingService:
+    """
+    Return the process-wide EmbeddingService for `model_name`, creating it on first use.
+
+    `FICHERO_EMBED_PROCESSES` sets the default number of CPU worker processes.
+    """
+    with _services_lock:
+        if model_name not in _services:
+            kwargs.setdefault("processes", int(os.environ.get("FICHERO_EMBED_PROCESSES", "0")))
+            _services[model_name] = EmbeddingService(model_name, **kwargs)
+        return _services[model_name]
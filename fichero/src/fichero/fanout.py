@@ -0,0 +1,354 @@
+"""
+Send one pass over the corpus to several models at once.
+
+Each page is rendered once and the image is sent to every selected model
+concurrently. Each model's markdown is written to its own subfolder of the
+output folder, next to the other models' output:
+
+    output/qwen-vl-max-latest/letters/1901.md
+    output/granite3.2-vision/letters/1901.md
+
+Per-model latency, bytes, tokens and estimated cost are reported at the end.
+Cost uses these optional models_config.jsonl settings:
+
+    cost_per_page             flat cost per request
+    cost_per_1k_input_tokens  cost per 1000 prompt tokens reported by the provider
+    cost_per_1k_output_tokens cost per 1000 completion tokens
+"""
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from .discovery import count_files, iter_files
+from .imaging import image_settings, page_scale, pdfium_lock
+from .output import PAGE_BREAK, atomic_write_text
+from .progress import FileRecord, ProgressTracker, RunSummary
+from .timing import instrumentation
+
+# pages rendered by pypdfium2 or read with Pillow; other formats need the docling pipeline
+FANOUT_EXTENSIONS = frozenset({"pdf", "png", "jpg", "jpeg", "tif", "tiff", "bmp", "webp"})
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def model_folder_name(name: str) -> str:
+    """
+    A folder name for a model, e.g. "qwen/qwen2.5-vl:7b" -> "qwen_qwen2.5-vl_7b".
+    """
+    return re.sub(r"[^\w.\-]+", "_", name).strip("_") or "model"
+
+
+class ModelStats:
+    """
+    Latency, upload size, token use and estimated cost for one model.
+    """
+
+    def __init__(self, name: str, cost_per_page: float = 0.0, cost_per_1k_input_tokens: float = 0.0, cost_per_1k_output_tokens: float = 0.0):
+        self.name = name
+        self.cost_per_page = cost_per_page or 0.0
+        self.cost_per_1k_input_tokens = cost_per_1k_input_tokens or 0.0
+        self.cost_per_1k_output_tokens = cost_per_1k_output_tokens or 0.0
+        self.latencies = []
+        self.bytes_sent = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float, info: dict, error=None):
+        usage = info.get("usage") or {}
+        with self._lock:
+            self.latencies.append(seconds)
+            if error is not None:
+                self.errors += 1
+            # blank and cached pages cost nothing
+            if info.get("bytes") is not None:
+                self.requests += 1
+                self.bytes_sent += info["bytes"]
+            self.input_tokens += usage.get("prompt_tokens", 0) or 0
+            self.output_tokens += usage.get("completion_tokens", 0) or 0
+
+    @property
+    def cost(self) -> float:
+        return (
+            self.requests * self.cost_per_page
+            + self.input_tokens / 1000 * self.cost_per_1k_input_tokens
+            + self.output_tokens / 1000 * self.cost_per_1k_output_tokens
+        )
+
+    def report(self) -> dict:
+        with self._lock:
+            latencies = list(self.latencies)
+        return {
+            "model": self.name,
+            "pages": len(latencies),
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "latency_p50": round(percentile(latencies, 50), 3),
+            "latency_p95": round(percentile(latencies, 95), 3),
+            "bytes_sent": self.bytes_sent,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost": round(self.cost, 4),
+        }
+
+
+class FanoutTarget:
+    """
+    One model of a fan-out run: its page model (cache, client, image
+    settings), output folder and stats.
+    """
+
+    def __init__(self, model_config: dict, vlm_model, output_folder: Path = None):
+        self.name = model_config["name"]
+        self.model_config = model_config
+        self.vlm_model = vlm_model
+        self.output_folder = Path(output_folder) / model_folder_name(self.name) if output_folder else None
+        self.stats = ModelStats(
+            self.name,
+            model_config.get("cost_per_page"),
+            model_config.get("cost_per_1k_input_tokens"),
+            model_config.get("cost_per_1k_output_tokens"),
+        )
+
+    @property
+    def scale(self) -> float:
+        return image_settings(self.model_config).get("scale", self.vlm_model.vlm_options.scale)
+
+    def request_page(self, image, file_path: Path, page_no: int) -> str:
+        started = time.perf_counter()
+        info = {}
+        error = None
+        try:
+            with instrumentation.stage(file_path, "vlm", page=page_no, model=self.name) as info:
+                return self.vlm_model.request_page(self.fit_image(image), info)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.stats.add(time.perf_counter() - started, info, error)
+
+    def fit_image(self, image):
+        """
+        Shrink the shared page image to this model's own scale and size limit.
+        """
+        settings = image_settings(self.model_config)
+        rendered_scale = image.info.get("fichero_scale", self.scale)
+        width, height = image.size
+        wanted = page_scale(
+            width / rendered_scale,
+            height / rendered_scale,
+            self.scale,
+            settings.get("max_image_side"),
+        )
+        if wanted >= rendered_scale:
+            return image
+        ratio = wanted / rendered_scale
+        return image.resize((max(1, round(width * ratio)), max(1, round(height * ratio))))
+
+
+def build_targets(model_configs: list, output_folder: Path = None, page_cache_path: Path = None) -> list:
+    """
+    Create a FanoutTarget for each models_config entry.
+    """
+    # docling is only needed once a fan-out run actually starts
+    from .cache import open_page_cache
+    from .pipeline import FicheroApiVlmModel
+    from .process import provider_vlm_options
+    from .providers import client_settings, get_provider_client
+
+    page_cache = open_page_cache(page_cache_path) if page_cache_path else None
+    targets = []
+    for model_config in model_configs:
+        provider = model_config["provider"]
+        model = model_config["name"]
+        vlm_options = provider_vlm_options(
+            provider, model, model_config.get("prompt", "Extract text to markdown!"), model_config.get("api_key")
+        )
+        if vlm_options is None:
+            raise ValueError(f"Unknown provider {provider!r} for model {model!r}")
+        vlm_model = FicheroApiVlmModel(
+            enabled=True,
+            enable_remote_services=True,
+            vlm_options=vlm_options,
+            page_cache=page_cache,
+            client=get_provider_client(provider, model, client_settings(model_config)),
+            image_settings=image_settings(model_config),
+        )
+        targets.append(FanoutTarget(model_config, vlm_model, output_folder))
+    return targets
+
+
+def iter_page_images(file_path: Path, scale: float = 1.0):
+    """
+    Yield (page number, PIL image) for each page of a PDF or image file, rendering one page at a time.
+    """
+    if file_path.suffix.lower() == ".pdf":
+        import pypdfium2
+
+        # other files and docling backends use pdfium meanwhile, and it is not
+        # thread-safe; the lock is not held while the page is being sent
+        with pdfium_lock():
+            pdf = pypdfium2.PdfDocument(str(file_path))
+            page_count = len(pdf)
+        try:
+            for index in range(page_count):
+                with pdfium_lock():
+                    page = pdf[index]
+                    try:
+                        bitmap = page.render(scale=scale)
+                        image = bitmap.to_pil().convert("RGB")
+                        bitmap.close()
+                    finally:
+                        page.close()
+                image.info["fichero_scale"] = scale
+                yield index + 1, image
+        finally:
+            with pdfium_lock():
+                pdf.close()
+        return
+
+    from PIL import Image, ImageSequence
+
+    with Image.open(file_path) as source:
+        for index, frame in enumerate(ImageSequence.Iterator(source)):
+            # scans carry their own resolution; treat them as rendered at scale 1
+            image = frame.convert("RGB")
+            image.info["fichero_scale"] = 1.0
+            yield index + 1, image
+
+
+def fanout_file(file_path: Path, input_dir: Path, targets: list, pool: ThreadPoolExecutor, max_pages_in_flight: int = 4) -> FileRecord:
+    """
+    Render each page of `file_path` once, send it to every target and write
+    each target's markdown. Returns a FileRecord for the whole file.
+
+    A model that fails on any page gets no output for the file; the file
+    only fails when every model did.
+    """
+    started = time.monotonic()
+    scale = max(target.scale for target in targets)
+    pages = {target.name: {} for target in targets}
+    failed = {}
+    pending = {}
+
+    def collect(future):
+        target, page_no = pending.pop(future)
+        try:
+            pages[target.name][page_no] = future.result()
+        except Exception as e:
+            failed.setdefault(target.name, e)
+
+    page_count = 0
+    images = iter_page_images(file_path, scale)
+    while True:
+        with instrumentation.stage(file_path, "render", page=page_count + 1) as info:
+            item = next(images, None)
+            info["end"] = item is None
+        if item is None:
+            break
+        page_no, image = item
+        page_count = page_no
+        for target in targets:
+            pending[pool.submit(target.request_page, image, file_path, page_no)] = (target, page_no)
+        # bound the rendered pages held in memory
+        while len(pending) >= max_pages_in_flight * len(targets):
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future)
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            collect(future)
+
+    if len(failed) == len(targets):
+        raise next(iter(failed.values()))
+    for name, error in failed.items():
+        logger.error(f"{name} failed on {file_path}: {error}")
+
+    separator = f"\n\n{PAGE_BREAK}\n\n"
+    output_path = None
+    for target in targets:
+        if target.output_folder is None or target.name in failed:
+            continue
+        with instrumentation.stage(file_path, "save", model=target.name) as info:
+            output_path = target.output_folder / file_path.with_suffix(".md").relative_to(input_dir)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            markdown = separator.join(pages[target.name][n] for n in range(1, page_count + 1))
+            info["bytes"] = atomic_write_text(output_path, markdown)
+    return FileRecord(
+        path=file_path,
+        status="done",
+        output_path=output_path,
+        seconds=time.monotonic() - started,
+        pages=page_count,
+        error="; ".join(f"{name}: {error}" for name, error in failed.items()) or None,
+    )
+
+
+def fanout_folders(input_folders: list, output_folder: Path, model_configs: list, max_workers: int = None, on_progress=None, cancel_event=None, page_cache_path: Path = None) -> tuple:
+    """
+    Convert every supported file with several models in one pass.
+
+    Files are read one at a time; their pages go to all models concurrently
+    on a shared pool of `max_workers` threads (default: 4 per model), while
+    each model's ProviderClient keeps its own rate and in-flight limits.
+
+    Args:
+        input_folders (list): Folders to search for PDFs and images.
+        output_folder (Path): Each model writes to a subfolder named after it.
+        model_configs (list): The models_config entries to compare.
+        max_workers (int): Requests in flight across all models.
+        on_progress (callable): Called with a `Progress` after each file.
+        cancel_event (threading.Event): When set, no further files are started.
+        page_cache_path (Path): If given, VLM responses are cached per page and model.
+    Returns:
+        tuple: The RunSummary and a list of per-model reports (see `ModelStats.report`).
+    """
+    targets = build_targets(model_configs, output_folder, page_cache_path)
+    max_workers = max(1, int(max_workers or 4 * len(targets)))
+
+    instrumentation.reset()
+    with instrumentation.stage(None, "discovery") as info:
+        total = count_files(input_folders, FANOUT_EXTENSIONS)
+        info["files"] = total
+    tracker = ProgressTracker(total, callback=on_progress)
+    tracker.start()
+    summary = RunSummary(total=total)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for item in iter_files(input_folders, FANOUT_EXTENSIONS):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            try:
+                record = fanout_file(item.path, item.input_dir, targets, pool)
+            except Exception as e:
+                logger.exception(f"Failed to process {item.path}")
+                summary.records.append(FileRecord(path=item.path, status="failed", error=str(e)))
+                tracker.update(item.path, error=e)
+                instrumentation.finish(item.path, "failed")
+                continue
+            summary.records.append(record)
+            tracker.update(item.path)
+            instrumentation.finish(item.path, record.status)
+
+    summary.seconds = time.monotonic() - tracker.started
+    summary.cancelled = cancel_event is not None and cancel_event.is_set()
+    reports = [target.stats.report() for target in targets]
+    logger.info(summary)
+    for report in reports:
+        logger.info(f"Model {report['model']}: {report}")
+    return summary, reports
@@ -0,0 +1,114 @@
+"""
+Page image preparation before upload to a VLM.
+
+Upload size drives both transfer time on slow links and the provider's
+token cost, so each model can shrink what it sends. These settings can be
+set per entry in models_config.jsonl:
+
+    scale            render scale for pages (1.0 is 72 dpi)
+    max_image_side   longest image side in pixels; large pages render at a lower scale
+    grayscale        send pages as grayscale
+    image_format     "png" (default), "jpeg" or "webp"
+    image_quality    JPEG/WebP quality, 1-100 (default 85)
+    skip_blank_pages do not send pages with (almost) no ink; they convert to nothing
+    blank_ink_ratio  share of ink pixels below which a page is blank (default 0.001)
+"""
+import base64
+import threading
+from io import BytesIO
+
+IMAGE_SETTINGS = (
+    "scale",
+    "max_image_side",
+    "grayscale",
+    "image_format",
+    "image_quality",
+    "skip_blank_pages",
+    "blank_ink_ratio",
+)
+
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+# used for pypdfium2 when docling, and its lock, is not installed
+_pdfium_lock = threading.Lock()
+
+
+def image_settings(model_config: dict) -> dict:
+    """
+    Pick the image settings out of a models_config entry.
+    """
+    settings = {key: model_config[key] for key in IMAGE_SETTINGS if model_config.get(key) is not None}
+    if "image_format" in settings and settings["image_format"].lower() not in IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image_format {settings['image_format']!r}, use one of {', '.join(IMAGE_FORMATS)}")
+    return settings
+
+
+def page_scale(page_width: float, page_height: float, scale: float = 1.0, max_image_side: int = None) -> float:
+    """
+    Render scale for a page of the given size in points, lowered so that
+    the longest side is at most `max_image_side` pixels.
+    """
+    if max_image_side:
+        longest = max(page_width, page_height)
+        if longest * scale > max_image_side:
+            return max_image_side / longest
+    return scale
+
+
+def ink_ratio(image, thumbnail_side: int = 512) -> float:
+    """
+    Share of pixels that clearly differ from the page background, measured on a thumbnail.
+
+    The background is the most common brightness. Ink is anything at least
+    64 levels darker or lighter than it, so light text on dark pages
+    (microfilm negatives, dark covers) counts as well.
+    """
+    gray = image.convert("L")
+    gray.thumbnail((thumbnail_side, thumbnail_side))
+    histogram = gray.histogram()
+    pixels = sum(histogram)
+    background = max(range(256), key=histogram.__getitem__)
+    darker = sum(histogram[:max(0, background - 64)])
+    lighter = sum(histogram[min(256, background + 65):])
+    return (darker + lighter) / pixels if pixels else 0.0
+
+
+def is_blank(image, threshold: float = 0.001) -> bool:
+    """
+    True when a page image has (almost) no ink on it.
+    """
+    return ink_ratio(image) < threshold
+
+
+def encode_image(image, image_format: str = "png", quality: int = 85, grayscale: bool = False) -> tuple:
+    """
+    Encode a PIL image for upload, returning (mime type, base64 text).
+    """
+    pil_format, mime = IMAGE_FORMATS[image_format.lower()]
+    if grayscale and image.mode != "L":
+        image = image.convert("L")
+    elif pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    img_io = BytesIO()
+    if pil_format == "PNG":
+        image.save(img_io, pil_format, optimize=True)
+    else:
+        image.save(img_io, pil_format, quality=quality)
+    return mime, base64.b64encode(img_io.getvalue()).decode("utf-8")
+
+
+def pdfium_lock():
+    """
+    The lock to hold around every pypdfium2 call. pdfium is not thread-safe,
+    so this is docling's own lock when docling is installed.
+    """
+    try:
+        from docling.utils.locks import pypdfium2_lock
+    except ImportError:
+        return _pdfium_lock
+    return pypdfium2_lock
@@ -0,0 +1,41 @@
+import importlib
+import logging
+import threading
+import time
+
+# modules that pull in docling, torch, chromadb or sentence-transformers;
+# the GUI imports these only when they are first needed
+HEAVY_MODULES = (
+    "fichero.process",
+    "fichero.store",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def import_heavy(name: str):
+    """
+    Import `name`, logging how long it took.
+    """
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    logger.info(f"Imported {name} in {time.perf_counter() - started:.2f}s")
+    return module
+
+
+def prewarm(modules=HEAVY_MODULES) -> threading.Thread:
+    """
+    Import `modules` on a daemon thread, so they are usually loaded by the
+    time the user presses Start. Failures are logged and left for the real
+    import to report.
+    """
+    def run():
+        for name in modules:
+            try:
+                import_heavy(name)
+            except Exception:
+                logger.exception(f"Pre-warming {name} failed")
+
+    thread = threading.Thread(target=run, name="fichero-prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,125 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversions (
+    content_hash TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (content_hash, provider, model, prompt_hash, output_path)
+);
+"""
+
+
+def hash_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Return the sha256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    A persistent record of which files have been converted with which
+    provider, model and prompt, so later runs can skip them.
+
+    Rows are committed as soon as each file finishes, so a run that is
+    interrupted picks up where it stopped. File hashes are cached by path,
+    size and mtime so unchanged files are not re-read on every run.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def file_hash(self, path: Path) -> str:
+        path = Path(path)
+        stat = path.stat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, content_hash FROM files WHERE path = ?",
+                (str(path),),
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        content_hash = hash_file(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                (str(path), stat.st_size, stat.st_mtime_ns, content_hash),
+            )
+            self._conn.commit()
+        return content_hash
+
+    def _key(self, path, provider, model, prompt, output_path):
+        return (self.file_hash(path), provider, model, hash_text(prompt), str(output_path))
+
+    def is_done(self, path: Path, provider: str, model: str, prompt: str, output_path: Path) -> bool:
+        """
+        True if this file's current contents were already converted with the
+        same provider, model and prompt and the output file is still there.
+        """
+        if not Path(output_path).is_file():
+            return False
+        key = self._key(path, provider, model, prompt, output_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM conversions WHERE content_hash = ? AND provider = ? "
+                "AND model = ? AND prompt_hash = ? AND output_path = ?",
+                key,
+            ).fetchone()
+        return row is not None and row[0] == "done"
+
+    def _record(self, path, provider, model, prompt, output_path, status, error=None):
+        key = self._key(path, provider, model, prompt, output_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO conversions (content_hash, provider, model, prompt_hash, "
+                "output_path, source, status, error, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (str(path), status, error, time.time()),
+            )
+            self._conn.commit()
+
+    def mark_done(self, path: Path, provider: str, model: str, prompt: str, output_path: Path):
+        self._record(path, provider, model, prompt, output_path, "done")
+
+    def mark_failed(self, path: Path, provider: str, model: str, prompt: str, output_path: Path, error: Exception):
+        self._record(path, provider, model, prompt, output_path, "failed", str(error))
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM conversions GROUP BY status"
+            ).fetchall()
+        return dict(rows)
@@ -0,0 +1,193 @@
+"""
+Keeping a batch's memory under a budget.
+
+docling holds a document's backend and a batch of rendered page images in
+memory while it converts, which for large TIFFs and high-DPI PDFs can be
+gigabytes per document. With a budget set, each document's footprint is
+estimated from its size and page count before it is started, and discovery
+waits until the estimated total and the process's measured RSS leave room
+for it. One document is always admitted when nothing else is running, so a
+document larger than the budget still converts, on its own.
+
+These settings can be set per entry in models_config.jsonl (or with
+`--memory-budget` on the command line):
+
+    memory_budget_mb     RSS budget for the whole run; no budget when unset
+    memory_per_page_mb   memory per page held at once (default 64)
+    memory_per_file_mb   memory per MB of input file, for the backend (default 4)
+
+Peak RSS is measured with psutil when it is installed, and from /proc on
+Linux otherwise.
+"""
+import logging
+import os
+import threading
+import time
+
+MEMORY_SETTINGS = (
+    "memory_budget_mb",
+    "memory_per_page_mb",
+    "memory_per_file_mb",
+)
+
+MB = 1024 * 1024
+
+# pages docling renders and holds at once, per document (settings.perf.page_batch_size)
+PAGES_HELD = 4
+
+logger = logging.getLogger(__name__)
+
+
+def memory_settings(model_config: dict) -> dict:
+    """
+    Pick the memory settings out of a models_config entry.
+    """
+    return {key: model_config[key] for key in MEMORY_SETTINGS if model_config.get(key) is not None}
+
+
+def current_rss():
+    """
+    This process's resident set size in bytes, or None if it cannot be measured.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def estimate_footprint(size: int, pages: int = None, memory_per_page_mb: float = 64, memory_per_file_mb: float = 4, pages_held: int = PAGES_HELD) -> int:
+    """
+    Estimate the bytes converting one document takes at its peak.
+
+    Args:
+        size (int): The input file's size in bytes.
+        pages (int): Its page count, if known (see `fichero.planner.page_count`).
+        memory_per_page_mb (float): Memory per rendered page held at once.
+        memory_per_file_mb (float): Memory per MB of input, for the parsed document.
+        pages_held (int): Pages rendered and held at once, e.g. times `page_parallelism`.
+    """
+    held = min(pages or 1, pages_held)
+    return int(size * memory_per_file_mb + held * memory_per_page_mb * MB)
+
+
+class MemoryMonitor:
+    """
+    Samples RSS on a background thread while a run is going, keeping the peak.
+
+    Args:
+        interval (float): Seconds between samples.
+        rss (callable): Returns the current RSS in bytes, or None.
+    """
+
+    def __init__(self, interval: float = 0.5, rss=current_rss):
+        self.interval = interval
+        self.rss = rss
+        self.peak = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = self.rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return rss
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="fichero-memory-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class MemoryBudget:
+    """
+    Admits documents while their estimated footprints, on top of the RSS the
+    process had when the budget was created, and the measured RSS stay under `budget`.
+
+    `acquire` blocks the caller (discovery) until there is room, and
+    `release` is called from the worker once a document is done with.
+
+    Args:
+        budget (int): RSS budget in bytes.
+        poll_interval (float): Seconds between RSS checks while waiting.
+        rss (callable): Returns the current RSS in bytes, or None.
+    """
+
+    def __init__(self, budget: int, poll_interval: float = 0.5, rss=current_rss):
+        self.budget = int(budget)
+        self.poll_interval = poll_interval
+        self.rss = rss
+        self.baseline = rss() or 0
+        self.reserved = 0
+        self.in_flight = 0
+        self.peak_reserved = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._condition = threading.Condition()
+
+    def fits(self, n: int) -> bool:
+        if self.in_flight == 0:
+            return True
+        if self.baseline + self.reserved + n > self.budget:
+            return False
+        rss = self.rss()
+        return rss is None or rss + n <= self.budget
+
+    def acquire(self, n: int, cancel_event=None) -> bool:
+        """
+        Wait for room for `n` bytes and reserve it. False if cancelled while waiting.
+        """
+        started = None
+        with self._condition:
+            while not self.fits(n):
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                if started is None:
+                    started = time.monotonic()
+                    self.waits += 1
+                self._condition.wait(self.poll_interval)
+            if started is not None:
+                self.wait_seconds += time.monotonic() - started
+            self.reserved += n
+            self.in_flight += 1
+            self.peak_reserved = max(self.peak_reserved, self.reserved)
+        return True
+
+    def release(self, n: int):
+        with self._condition:
+            self.reserved -= n
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "budget_mb": round(self.budget / MB),
+                "baseline_mb": round(self.baseline / MB),
+                "peak_reserved_mb": round(self.peak_reserved / MB),
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 1),
+            }
@@ -0,0 +1,181 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from .timing import instrumentation
+
+# written between pages of the markdown output, so later stages can
+# tell which page a piece of text came from
+PAGE_BREAK = "<!-- page break -->"
+
+# read once at import, since setting the umask to read it is process-wide
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def split_pages(markdown: str) -> list:
+    """
+    Split markdown saved with PAGE_BREAK placeholders into one string per page.
+    """
+    return [page.strip() for page in markdown.split(PAGE_BREAK)]
+
+
+def page_markdown(result) -> dict:
+    """
+    Return {page number: markdown} for a ConversionResult, numbering pages from 1.
+
+    VLM results keep each page's response, since docling merges markdown
+    responses into one document without page provenance; other results
+    are exported page by page. Formats docling converts without pages
+    (DOCX, PPTX, HTML, markdown, spreadsheets, ...) come out as one page.
+    """
+    if not result.pages:
+        return {1: result.document.export_to_markdown()} if result.document is not None else {}
+    if any(page.predictions.vlm_response for page in result.pages):
+        return {
+            page.page_no + 1: page.predictions.vlm_response.text if page.predictions.vlm_response else ""
+            for page in result.pages
+        }
+    return {
+        page.page_no + 1: result.document.export_to_markdown(page_no=page.page_no + 1)
+        for page in result.pages
+    }
+
+
+def merged_page_markdown(results: list) -> dict:
+    """
+    Return {page number: markdown} for one or more ConversionResults of one file.
+
+    Results may cover different page ranges; where they overlap, a later
+    result's page replaces an earlier one (see `fichero.process.process_file_tiered`).
+    """
+    pages = {}
+    for result in results:
+        pages.update(page_markdown(result))
+    return pages
+
+
+def document_markdown(results: list) -> str:
+    """
+    Export one or more ConversionResults of one file as markdown, with PAGE_BREAK between pages.
+    """
+    return join_pages(merged_page_markdown(results))
+
+
+def join_pages(pages: dict) -> str:
+    """
+    Join {page number: markdown} in page order, with PAGE_BREAK between pages.
+    """
+    separator = f"\n\n{PAGE_BREAK}\n\n"
+    return separator.join(pages[page_no].strip() for page_no in sorted(pages))
+
+
+def output_path_for(file_path: Path, input_dir: Path, output_folder: Path) -> Path:
+    """
+    Return where the markdown for `file_path` goes, mirroring its location below `input_dir`.
+    """
+    return Path(output_folder) / file_path.with_suffix('.md').relative_to(input_dir)
+
+
+def atomic_write_text(path: Path, text: str, encoding: str = "utf-8") -> int:
+    """
+    Write `text` to `path` so that readers see either the old file or the
+    complete new one, never a partial write. Returns the bytes written.
+
+    The text goes to a hidden temporary file in the same folder, which is
+    flushed to disk and then renamed over `path`. The file keeps the mode
+    of the file it replaces, or gets the usual mode for a new file, rather
+    than the owner-only mode of a temporary file.
+    """
+    path = Path(path)
+    data = text.encode(encoding)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return len(data)
+
+
+class OutputWriter:
+    """
+    Writes output files on a background thread, so saving one document
+    overlaps with the VLM requests for the next.
+
+    Each write is atomic (see `atomic_write_text`). At most `max_pending`
+    writes are queued; `submit` blocks beyond that, so a slow disk holds
+    back conversion instead of piling documents up in memory.
+
+    Args:
+        max_pending (int): Writes queued or in progress at once.
+        workers (int): Writer threads.
+    """
+
+    def __init__(self, max_pending: int = 16, workers: int = 1):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fichero-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def _write(self, path: Path, text: str, source=None) -> Path:
+        try:
+            with instrumentation.stage(source or path, "save") as info:
+                started = time.perf_counter()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                if path.is_dir():
+                    raise IsADirectoryError(f"Output path {path} is a directory, not a file.")
+                info["bytes"] = atomic_write_text(path, text)
+            with self._lock:
+                self.files += 1
+                self.bytes += info["bytes"]
+                self.seconds += time.perf_counter() - started
+            return path
+        finally:
+            self._slots.release()
+
+    def submit(self, path: Path, text: str, source=None) -> Future:
+        """
+        Queue `text` to be written to `path`. The returned Future resolves
+        to `path` once the file is on disk, or raises the write error.
+        `source` is the input file the output belongs to, for the timing log.
+        """
+        self._slots.acquire()
+        try:
+            return self._pool.submit(self._write, Path(path), text, source)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def close(self):
+        """
+        Wait for every queued write to finish.
+        """
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"files": self.files, "bytes": self.bytes, "seconds": round(self.seconds, 3)}
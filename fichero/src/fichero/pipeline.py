@@ -0,0 +1,169 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from docling.datamodel.base_models import Page, VlmPrediction
+from docling.datamodel.document import ConversionResult
+from docling.datamodel.pipeline_options import ApiVlmOptions, VlmPipelineOptions
+from docling.models.api_vlm_model import ApiVlmModel
+from docling.pipeline.vlm_pipeline import VlmPipeline
+from docling.utils.api_image_request import api_image_request
+from docling.utils.profiling import TimeRecorder
+
+from .cache import open_page_cache
+from .imaging import is_blank, page_scale
+from .providers import get_provider_client
+from .timing import instrumentation
+
+
+class FicheroVlmPipelineOptions(VlmPipelineOptions):
+    # where per-page VLM responses are cached; no caching when unset
+    page_cache_path: Optional[str] = None
+    page_cache_max_bytes: int = 512 * 1024 * 1024
+    # requests go through the shared ProviderClient for this provider/model
+    provider: Optional[str] = None
+    vlm_model: Optional[str] = None
+    client_settings: Dict[str, Any] = {}
+    # render scale, recompression and blank-page settings, see fichero.imaging
+    image_settings: Dict[str, Any] = {}
+
+
+def page_image_hash(image) -> str:
+    """
+    Hash a rendered page image by its size, mode and pixel data.
+    """
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode("utf-8"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class FicheroApiVlmModel(ApiVlmModel):
+    """
+    docling's ApiVlmModel, checking the page cache before calling the VLM
+    and sending requests through a ProviderClient when one is given.
+
+    `image_settings` (see `fichero.imaging`) cap the render size, recompress
+    the upload and skip blank pages.
+    """
+
+    def __init__(self, enabled: bool, enable_remote_services: bool, vlm_options: ApiVlmOptions, page_cache=None, client=None, image_settings: dict = None):
+        super().__init__(enabled, enable_remote_services, vlm_options)
+        self.page_cache = page_cache
+        self.client = client
+        self.image_settings = dict(image_settings or {})
+        # the encode_image arguments, also part of the page cache key
+        self.image_options = {
+            option: self.image_settings[key]
+            for key, option in (("image_format", "image_format"), ("image_quality", "quality"), ("grayscale", "grayscale"))
+            if key in self.image_settings
+        }
+
+    def page_scale(self, page) -> float:
+        return page_scale(
+            page.size.width,
+            page.size.height,
+            self.image_settings.get("scale", self.vlm_options.scale),
+            self.image_settings.get("max_image_side"),
+        )
+
+    def request_page(self, image, info: dict = None) -> str:
+        """
+        Return the VLM text for a page image. `info`, when given, is filled
+        with what happened: "blank", "cached" and "bytes" sent.
+        """
+        info = {} if info is None else info
+        if self.image_settings.get("skip_blank_pages") and is_blank(image, self.image_settings.get("blank_ink_ratio", 0.001)):
+            if self.client is not None:
+                self.client.record_blank_page()
+            info["blank"] = True
+            return ""
+        if self.page_cache is None:
+            return self.send_request(image, info)
+        key = self.page_cache.make_key(
+            page_image_hash(image),
+            str(self.vlm_options.url),
+            self.params,
+            self.prompt_content,
+            self.image_options,
+        )
+        page_tags = self.page_cache.get(key)
+        info["cached"] = page_tags is not None
+        if page_tags is None:
+            page_tags = self.send_request(image, info)
+            self.page_cache.put(key, page_tags)
+        return page_tags
+
+    def send_request(self, image, info: dict = None) -> str:
+        if self.client is not None:
+            return self.client.request_image(
+                image,
+                prompt=self.prompt_content,
+                url=str(self.vlm_options.url),
+                timeout=self.timeout,
+                headers=self.vlm_options.headers,
+                image_options=self.image_options,
+                sent=info,
+                **self.params,
+            )
+        return api_image_request(
+            image=image,
+            prompt=self.prompt_content,
+            url=self.vlm_options.url,
+            timeout=self.timeout,
+            headers=self.vlm_options.headers,
+            **self.params,
+        )
+
+    def __call__(self, conv_res: ConversionResult, page_batch: Iterable[Page]) -> Iterable[Page]:
+        def _vlm_request(page):
+            assert page._backend is not None
+            if not page._backend.is_valid():
+                return page
+            file_path = conv_res.input.file
+            with TimeRecorder(conv_res, "vlm"):
+                assert page.size is not None
+                with instrumentation.stage(file_path, "render", page=page.page_no + 1):
+                    hi_res_image = page.get_image(scale=self.page_scale(page))
+                    assert hi_res_image is not None
+                    if hi_res_image.mode != "RGB":
+                        hi_res_image = hi_res_image.convert("RGB")
+                with instrumentation.stage(file_path, "vlm", page=page.page_no + 1, model=self.params.get("model")) as info:
+                    text = self.request_page(hi_res_image, info)
+                page.predictions.vlm_response = VlmPrediction(text=text)
+            return page
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            yield from executor.map(_vlm_request, page_batch)
+
+
+class FicheroVlmPipeline(VlmPipeline):
+    """
+    VlmPipeline that sends API requests through FicheroApiVlmModel.
+    """
+
+    def __init__(self, pipeline_options: VlmPipelineOptions):
+        super().__init__(pipeline_options)
+        if isinstance(pipeline_options.vlm_options, ApiVlmOptions):
+            page_cache = None
+            if getattr(pipeline_options, "page_cache_path", None):
+                page_cache = open_page_cache(
+                    pipeline_options.page_cache_path,
+                    max_bytes=pipeline_options.page_cache_max_bytes,
+                )
+            client = None
+            if getattr(pipeline_options, "provider", None):
+                client = get_provider_client(
+                    pipeline_options.provider,
+                    pipeline_options.vlm_model,
+                    pipeline_options.client_settings,
+                )
+            self.build_pipe = [
+                FicheroApiVlmModel(
+                    enabled=True,
+                    enable_remote_services=pipeline_options.enable_remote_services,
+                    vlm_options=pipeline_options.vlm_options,
+                    page_cache=page_cache,
+                    client=client,
+                    image_settings=getattr(pipeline_options, "image_settings", None),
+                ),
+            ]
@@ -0,0 +1,244 @@
+"""
+A dry run of a batch: how many files and pages it will convert, and an
+estimate of how long it will take and what it will cost.
+
+Files are found with the same discovery as a real run. PDF page counts
+come from the document's page tree through pypdfium2 and multi-page TIFFs
+from their frame count, so no page is rendered. Other formats count as one
+page and are reported as estimated.
+
+The time estimate uses the per-page render and VLM durations recorded for
+the model in timings.jsonl (see `fichero.timing`); cached and blank pages
+are left out. The cost estimate uses the same models_config.jsonl settings
+as model comparison (see `fichero.fanout`):
+
+    cost_per_page             flat cost per request
+    cost_per_1k_input_tokens  cost per 1000 prompt tokens, averaged from past requests
+    cost_per_1k_output_tokens cost per 1000 completion tokens
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+
+from .discovery import iter_files
+from .imaging import pdfium_lock
+
+# extensions whose page count can be read without rendering
+PDF_EXTENSIONS = frozenset({"pdf"})
+TIFF_EXTENSIONS = frozenset({"tif", "tiff"})
+IMAGE_EXTENSIONS = frozenset({"png", "jpg", "jpeg", "bmp", "webp", "gif"})
+
+logger = logging.getLogger(__name__)
+
+
+def page_count(path: Path):
+    """
+    Return the number of pages in `path` without rendering it, or None when
+    the format has no page count or the file cannot be read.
+    """
+    extension = Path(path).suffix.lower().lstrip(".")
+    try:
+        if extension in PDF_EXTENSIONS:
+            import pypdfium2
+
+            # called from discovery while documents convert; pdfium is not thread-safe
+            with pdfium_lock():
+                pdf = pypdfium2.PdfDocument(str(path))
+                try:
+                    return len(pdf)
+                finally:
+                    pdf.close()
+        if extension in TIFF_EXTENSIONS:
+            from PIL import Image
+
+            # opening reads the header only; n_frames walks the IFD chain
+            with Image.open(path) as image:
+                return getattr(image, "n_frames", 1)
+        if extension in IMAGE_EXTENSIONS:
+            return 1
+    except ImportError:
+        logger.warning(f"Cannot count pages of {path}: pypdfium2 or Pillow is not installed")
+    except Exception as e:
+        logger.warning(f"Cannot count pages of {path}: {e}")
+    return None
+
+
+def history_files(log_path: Path) -> list:
+    """
+    The timings log and its rotated backups, oldest first.
+    """
+    log_path = Path(log_path)
+    backups = sorted(log_path.parent.glob(f"{log_path.name}.*"), key=lambda p: p.stat().st_mtime)
+    return backups + ([log_path] if log_path.exists() else [])
+
+
+def latency_history(log_path: Path, model: str, limit: int = 5000) -> dict:
+    """
+    Average per-page durations and token use for `model` from a timings log.
+
+    Only the most recent `limit` VLM requests are used, since latency drifts
+    with endpoint load and settings.
+
+    Returns:
+        dict: "pages" measured, "vlm_seconds" and "render_seconds" per page,
+        and mean "input_tokens" and "output_tokens" per request.
+    """
+    requests = []
+    renders = []
+    for path in history_files(log_path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("error"):
+                    continue
+                if entry.get("stage") == "render":
+                    renders.append(entry["seconds"])
+                elif entry.get("stage") == "vlm" and entry.get("model") == model:
+                    # cached and blank pages never reached the endpoint
+                    if entry.get("cached") or entry.get("blank"):
+                        continue
+                    requests.append(entry)
+    requests = requests[-limit:]
+    renders = renders[-limit:]
+    usage = [entry.get("usage") or {} for entry in requests]
+    return {
+        "pages": len(requests),
+        "vlm_seconds": sum(entry["seconds"] for entry in requests) / len(requests) if requests else None,
+        "render_seconds": sum(renders) / len(renders) if renders else 0.0,
+        "input_tokens": sum(u.get("prompt_tokens", 0) or 0 for u in usage) / len(usage) if usage else 0.0,
+        "output_tokens": sum(u.get("completion_tokens", 0) or 0 for u in usage) / len(usage) if usage else 0.0,
+    }
+
+
+@dataclass
+class Totals:
+    """
+    Files, pages and bytes for one folder and extension, or for the whole batch.
+    """
+    files: int = 0
+    pages: int = 0
+    bytes: int = 0
+    # files counted as one page because their page count is unknown
+    estimated: int = 0
+
+    def add(self, size: int, pages):
+        self.files += 1
+        self.bytes += size
+        self.pages += pages or 1
+        self.estimated += int(pages is None)
+
+
+@dataclass
+class Plan:
+    """
+    What a batch would convert, and how long and how much it is expected to take.
+    """
+    model: str = None
+    total: Totals = field(default_factory=Totals)
+    # {folder: {extension: Totals}}
+    folders: dict = field(default_factory=dict)
+    concurrency: int = 1
+    history: dict = field(default_factory=dict)
+    seconds: float = None
+    cost: float = None
+    scan_seconds: float = 0.0
+
+    def estimate(self, model_config: dict, concurrency: int = 1, log_path: Path = None) -> "Plan":
+        """
+        Estimate duration and cost of converting the scanned pages with
+        `model_config`, replacing any earlier estimate. Returns the plan.
+        """
+        self.model = model_config["name"]
+        self.concurrency = max(1, int(concurrency))
+        self.history = latency_history(log_path, self.model) if log_path is not None else {}
+        self.seconds = None
+        self.cost = None
+        if self.history.get("vlm_seconds") is not None:
+            per_page = self.history["vlm_seconds"] + self.history["render_seconds"]
+            self.seconds = self.total.pages * per_page / self.concurrency
+            self.cost = estimate_cost(self.total.pages, model_config, self.history)
+        elif model_config.get("cost_per_page"):
+            self.cost = estimate_cost(self.total.pages, model_config, {})
+        return self
+
+    def rows(self) -> list:
+        """
+        (folder, extension, files, pages, MB) rows, for a table.
+        """
+        return [
+            (folder, extension, totals.files, totals.pages, round(totals.bytes / 1e6, 1))
+            for folder, extensions in self.folders.items()
+            for extension, totals in sorted(extensions.items())
+        ]
+
+    def __str__(self):
+        text = f"{self.total.files} files, {self.total.pages} pages, {self.total.bytes / 1e6:.1f} MB"
+        if self.total.estimated:
+            text += f"\n{self.total.estimated} files without a page count, counted as one page"
+        if self.seconds is None:
+            text += f"\nNo timing history for {self.model} yet, so no time estimate"
+        else:
+            text += f"\nEstimated {timedelta(seconds=round(self.seconds))} with {self.concurrency} in flight"
+            text += f" (from {self.history['pages']} measured pages)"
+        if self.cost:
+            text += f"\nEstimated cost {self.cost:.2f}"
+        return text
+
+
+def folder_key(path: Path, input_dir: Path) -> str:
+    """
+    Group files by the selected folder and its first level of subfolders.
+    """
+    relative = path.relative_to(input_dir)
+    if len(relative.parts) > 1:
+        return str(input_dir / relative.parts[0])
+    return str(input_dir)
+
+
+def estimate_cost(pages: int, model_config: dict, history: dict) -> float:
+    return (
+        pages * (model_config.get("cost_per_page") or 0.0)
+        + pages * history.get("input_tokens", 0.0) / 1000 * (model_config.get("cost_per_1k_input_tokens") or 0.0)
+        + pages * history.get("output_tokens", 0.0) / 1000 * (model_config.get("cost_per_1k_output_tokens") or 0.0)
+    )
+
+
+def scan_folders(input_folders: list, extensions, cancel_event=None) -> Plan:
+    """
+    Count the files, pages and bytes below `input_folders`, per folder and extension.
+    """
+    started = time.monotonic()
+    plan = Plan()
+    for item in iter_files(input_folders, extensions):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        pages = page_count(item.path)
+        extension = item.path.suffix.lower().lstrip(".")
+        plan.total.add(item.size, pages)
+        plan.folders.setdefault(folder_key(item.path, item.input_dir), {}).setdefault(extension, Totals()).add(item.size, pages)
+    plan.scan_seconds = time.monotonic() - started
+    return plan
+
+
+def plan_folders(input_folders: list, model_config: dict, extensions, concurrency: int = 1, log_path: Path = None, cancel_event=None) -> Plan:
+    """
+    Count the files and pages a run over `input_folders` would convert and
+    estimate its duration and cost.
+
+    Args:
+        input_folders (list): Folders to search, as for `convert_folders`.
+        model_config (dict): The models_config entry the run would use.
+        extensions: The extensions a run converts.
+        concurrency (int): Pages in flight at once during the run.
+        log_path (Path): The timings log to read latency history from.
+        cancel_event (threading.Event): When set, the scan stops early.
+    Returns:
+        Plan: Totals per folder and extension, and the estimates.
+    """
+    return scan_folders(input_folders, extensions, cancel_event).estimate(model_config, concurrency, log_path)
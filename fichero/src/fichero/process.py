@@ -1,24 +1,55 @@
-import toga
+import json
 import logging
+import os
+import time
+from contextlib import nullcontext
 from pathlib import Path
+from typing import TYPE_CHECKING
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import (
     ApiVlmOptions,
+    PdfPipelineOptions,
     ResponseFormat,
     InferenceFramework,
-    VlmPipelineOptions,
     HuggingFaceVlmOptions
 )
 from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.pipeline.vlm_pipeline import VlmPipeline
 from docling.datamodel.base_models import FormatToExtensions
+from .cache import LRUCache, open_page_cache
+from .pipeline import FicheroVlmPipeline, FicheroVlmPipelineOptions
+from .progress import FileRecord, RunSummary
+from .manifest import Manifest, hash_file, hash_text
+from .output import OutputWriter, atomic_write_text, document_markdown, join_pages, merged_page_markdown, output_path_for, page_markdown
+from .columnar import ParquetSink, page_records
+from .secrets import selected_model_config
+from .quality import is_hard_page
+from .ranges import contiguous_ranges, convert_in_ranges, page_ranges
+from .providers import get_provider_client
+from .timing import instrumentation
+from .workqueue import WorkQueue, run_worker
+from .planner import Plan, page_count, plan_folders
+from .batch import RunSettings, run_batch
+from .memory import MB, MemoryBudget
 
-# get a list of Docling supported file extensions
-supported_extensions = [a for b in FormatToExtensions.values() for a in b]
+if TYPE_CHECKING:
+    import toga
+
+# get the set of Docling supported file extensions
+supported_extensions = frozenset(a for b in FormatToExtensions.values() for a in b)
+
+# converters are expensive to set up, so keep the most recently used ones
+# around keyed by (provider, model, prompt, api_key, page cache, client settings)
+converter_cache = LRUCache(maxsize=4)
+
+logger = logging.getLogger(__name__)
 
 def ollama_vlm_options(model: str, prompt: str):
+    # OLLAMA_HOST is the variable Ollama itself uses to point at another server
+    ollama_host = os.environ.get("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+    if "://" not in ollama_host:
+        ollama_host = "http://" + ollama_host
     options = ApiVlmOptions(
-        url="http://localhost:11434/v1/chat/completions",  # the default Ollama endpoint
+        url=ollama_host + "/v1/chat/completions",  # the default Ollama endpoint
         params=dict(
             model=model,
         ),
@@ -75,83 +106,393 @@ def sandbox_vlm_options(model: str, prompt: str, api_key: str = None):
     )
     return options
 
-def process_folders(app:toga.App) -> list:
+def provider_vlm_options(provider: str, model: str, prompt: str, api_key: str = None):
     """
-    Process all files in a directory using the specified VLM type, model, and prompt.
-    
-    Args:
-        app: The application instance containing configuration and state.
-        models_config (list): A list of model configurations (not used in this function).
-        provider_config (dict): A dictionary containing provider-specific configurations.
-    Returns:
-        list: A list of processed documents.
+    Return the ApiVlmOptions for a provider, or None for an unknown one.
     """
-    input_folders = app.folders
-    output_folder = app.output_folder
-    provider = app.model_selection.value.provider 
-    model = app.model_selection.value.name 
-    model_config = [a for a in app.models_config if a['name'] == model] 
-    if model_config:
-        model_config = model_config[0]    
-        api_key = model_config.get('api_key', None)
-        prompt = model_config.get('prompt', "Extract text to markdown!")
-        
-        docs = []
-        for input_dir in input_folders:
-            if input_dir.is_dir():
-                for file_path in input_dir.glob('**/*'):
-                    if file_path.suffix.lower().replace('.','') in supported_extensions:
-                        print(f"Processing file 105: {file_path}")
-                        doc = process_file(file_path, provider, model, prompt, api_key)
-                        if doc:
-                            docs.append(doc)
-                        if doc and output_folder:
-                            # Save the processed document to the output folder
-                            output_path = output_folder / file_path.with_suffix('.md').relative_to(input_dir)
-                            output_path.parent.mkdir(parents=True, exist_ok=True)
-                            if not output_path.is_dir():
-                                doc.document.save_as_markdown(str(output_path))  # using str because of IsADirectoryError
-                            else:
-                                raise IsADirectoryError(f"Output path {output_path} is a directory, not a file.")
-                    return docs
-            else:
-                raise ValueError(f"Input path {input_dir} is not a directory.")
-
-
-def process_file(input_doc_path: Path, provider: str = "dashscope", model: str = "qwen-vl-max-latest", prompt: str = "Extract text to markdown.", api_key: str = None):
-    logging.basicConfig(level=logging.INFO)
-
-    pipeline_options = VlmPipelineOptions(
-        enable_remote_services=True
-    )
-
     if provider == "ollama":
-        pipeline_options.vlm_options = ollama_vlm_options(
+        return ollama_vlm_options(
             model=model,
             prompt=prompt,
         )
 
     if provider == "dashscope":
-        pipeline_options.vlm_options = dashscope_vlm_options(
+        return dashscope_vlm_options(
             model=model, prompt=prompt, api_key=api_key
         )
 
     if provider == "sandbox":
-        pipeline_options.vlm_options = sandbox_vlm_options(
+        return sandbox_vlm_options(
             model=model, prompt=prompt, api_key=api_key
         )
+    return None
+
+
+def save_markdown(doc, file_path: Path, input_dir: Path, output_folder: Path, writer: OutputWriter = None, markdown: str = None):
+    """
+    Save a converted document as markdown, mirroring its location below `input_dir`.
+
+    `doc` is a ConversionResult, or a list of them for a file converted in page ranges.
+    The file is replaced atomically, so an interrupted run never leaves a
+    partial markdown file behind. Returns the output path, or with a
+    `writer`, a Future that resolves to it once the file is written.
+    `markdown` is the document's markdown, if it has been exported already.
+    """
+    output_path = output_path_for(file_path, input_dir, output_folder)
+    if markdown is None:
+        markdown = document_markdown(doc if isinstance(doc, list) else [doc])
+    if writer is not None:
+        return writer.submit(output_path, markdown, source=file_path)
+    with instrumentation.stage(file_path, "save") as info:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if output_path.is_dir():
+            raise IsADirectoryError(f"Output path {output_path} is a directory, not a file.")
+        info["bytes"] = atomic_write_text(output_path, markdown)
+    return output_path
+
+
+def convert_and_save(file_path: Path, input_dir: Path, output_folder: Path, provider: str, model: str, prompt: str, api_key: str = None, converter: DocumentConverter = None, page_chunk_size: int = None, page_parallelism: int = 1, writer: OutputWriter = None, tier_settings: dict = None, sink: ParquetSink = None, source_hash: str = None) -> FileRecord:
+    """
+    Convert a single file and, if an output folder is set, write its markdown.
+
+    PDFs longer than `page_chunk_size` pages are converted in page ranges,
+    `page_parallelism` ranges at a time, when `page_parallelism` is above 1.
+    The ConversionResult is dropped once it is saved; only a FileRecord is returned.
+    With a `writer`, the markdown is written in the background and the
+    record's `write` Future tells when it is on disk. `tier_settings` with
+    "tiered" set convert with the CPU pipeline first, see `process_file_tiered`.
+    With a `sink`, every page is also added as a row to its Parquet dataset;
+    `source_hash` saves hashing the file again when the manifest already has.
+    """
+    logger.info(f"Processing file: {file_path}")
+    started = time.monotonic()
+    if tier_settings and tier_settings.get("tiered"):
+        doc = process_file(file_path, provider, model, prompt, api_key, converter=converter, tier_settings=tier_settings)
+    elif page_parallelism > 1 and page_chunk_size and file_path.suffix.lower() == ".pdf":
+        if converter is None:
+            converter = get_converter(provider, model, prompt, api_key)
+        doc = process_file_in_ranges(file_path, converter, page_chunk_size, page_parallelism)
+    else:
+        doc = process_file(file_path, provider, model, prompt, api_key, converter=converter)
+    results = doc if isinstance(doc, list) else [doc] if doc else []
+    # exported once, for the markdown file and the Parquet rows
+    pages = merged_page_markdown(results)
+    output_path = None
+    write = None
+    if doc and output_folder:
+        markdown = join_pages(pages)
+        if writer is not None:
+            output_path = output_path_for(file_path, input_dir, output_folder)
+            write = save_markdown(doc, file_path, input_dir, output_folder, writer, markdown)
+        else:
+            output_path = save_markdown(doc, file_path, input_dir, output_folder, markdown=markdown)
+    seconds = time.monotonic() - started
+    if sink is not None and results:
+        sink.add(page_records(
+            pages,
+            source=file_path,
+            output=output_path,
+            folder=str(file_path.parent.relative_to(input_dir)),
+            model=model,
+            provider=provider,
+            prompt_hash=hash_text(prompt),
+            source_hash=source_hash or hash_file(file_path),
+            seconds=seconds,
+        ))
+    return FileRecord(
+        path=file_path,
+        status="done",
+        output_path=output_path,
+        seconds=seconds,
+        pages=len(pages),
+        write=write,
+    )
+
+
+def process_folders(app:"toga.App", **kwargs) -> RunSummary:
+    """
+    Process all files in the app's selected folders with the selected model.
+
+    Args:
+        app: The application instance containing configuration and state.
+        **kwargs: Passed on to `convert_folders`.
+    Returns:
+        RunSummary: Counts and a FileRecord per file.
+    """
+    model_config = selected_model_config(app)
+    if model_config:
+        return convert_folders(list(app.folders), app.output_folder, model_config, **kwargs)
+
+
+def convert_folders(input_folders: list, output_folder: Path, model_config: dict, max_workers: int = None, on_progress=None, cancel_event=None, manifest: Manifest = None, page_cache_path: Path = None, output_format: str = "markdown") -> RunSummary:
+    """
+    Process all files in a directory using the specified VLM type, model, and prompt.
+
+    Files are converted concurrently on a thread pool (see `fichero.batch.run_batch`),
+    since each conversion mostly waits on the VLM endpoint. A file that fails is logged and skipped
+    so that the rest of the batch still runs. Each document is written to
+    `output_folder` and released as soon as it is converted, so memory stays
+    flat however large the batch is.
+
+    Args:
+        input_folders (list): Folders to search for supported files.
+        output_folder (Path): Where the markdown files are written.
+        model_config (dict): The models_config entry to convert with.
+        max_workers (int): Number of documents in flight at once. Defaults to the
+            model's `max_concurrency` setting, or the provider default.
+        on_progress (callable): Called with a `Progress` after each file, from a worker thread.
+        cancel_event (threading.Event): When set, files not yet started are skipped.
+        manifest (Manifest): If given, files whose contents were already converted with
+            this provider, model and prompt (and whose output still exists) are skipped,
+            and every finished file is recorded so an interrupted run can resume.
+        page_cache_path (Path): If given, VLM responses are cached per rendered page in
+            this file, so identical pages are only sent once.
+        output_format (str): "markdown", or "parquet" to also add every page to a
+            Parquet dataset in `output_folder/parquet` (see `fichero.columnar`).
+
+    With `memory_budget_mb` set in `model_config`, discovery waits while the
+    documents in flight would take the process over that budget (see `fichero.memory`).
+
+    Returns:
+        RunSummary: Counts and a FileRecord per file.
+    """
+    run_settings = RunSettings.from_config(model_config, max_workers, output_format)
+    converter = get_converter(run_settings.provider, run_settings.model, run_settings.prompt, run_settings.api_key, page_cache_path, run_settings.client, run_settings.images)
+    memory = run_settings.memory
+    budget = MemoryBudget(memory["memory_budget_mb"] * MB) if memory.get("memory_budget_mb") else None
+    # markdown is written on a background thread while the next files convert
+    writer = OutputWriter(max_pending=run_settings.max_workers * 2)
+    sink = run_settings.sink(output_folder)
+
+    def convert(file_path, input_dir, source_hash=None):
+        return convert_and_save(
+            file_path, input_dir, output_folder,
+            run_settings.provider, run_settings.model, run_settings.prompt, run_settings.api_key,
+            converter, run_settings.page_chunk_size, run_settings.page_parallelism,
+            writer, run_settings.tiers, sink, source_hash,
+        )
+
+    summary = run_batch(input_folders, supported_extensions, convert, run_settings, output_folder, on_progress, cancel_event, manifest, writer, sink, budget)
+    logger.info(summary)
+    if budget is not None:
+        logger.info(f"Memory budget: {budget.stats()}")
+    logger.info(f"Stage timings: {instrumentation.summary()}")
+    logger.info(f"Output writer: {writer.stats()}")
+    if sink is not None:
+        logger.info(f"Parquet dataset: {sink.stats()}")
+    logger.info(f"Converter cache: {converter_cache.stats()}")
+    if page_cache_path:
+        logger.info(f"Page cache: {open_page_cache(page_cache_path).stats()}")
+    logger.info(f"Provider client: {get_provider_client(run_settings.provider, run_settings.model, run_settings.client).stats()}")
+    return summary
+
+
+def plan_run(input_folders: list, model_config: dict, max_workers: int = None, log_path: Path = None, cancel_event=None) -> Plan:
+    """
+    Dry run of `convert_folders`: count the files and pages it would convert
+    and estimate its duration and cost, without converting anything.
+
+    Args:
+        input_folders (list): Folders to search for supported files.
+        model_config (dict): The models_config entry to convert with.
+        max_workers (int): Documents in flight at once, defaulting as in `convert_folders`.
+        log_path (Path): The timings log with this model's latency history.
+        cancel_event (threading.Event): When set, the scan stops early.
+    Returns:
+        Plan: Totals per folder and extension, and the estimates.
+    """
+    plan = plan_folders(input_folders, model_config, supported_extensions, pages_in_flight(model_config, max_workers), log_path, cancel_event)
+    logger.info(plan)
+    return plan
+
 
-    # Create the DocumentConverter and launch the conversion.
-    doc_converter = DocumentConverter(
+def pages_in_flight(model_config: dict, max_workers: int = None) -> int:
+    """
+    Pages converted at once by `convert_folders`: documents in flight, times
+    page ranges in flight per document.
+    """
+    run_settings = RunSettings.from_config(model_config, max_workers)
+    return run_settings.max_workers * max(1, int(run_settings.page_parallelism))
+
+
+def queue_worker(queue: WorkQueue, output_folder: Path, model_config: dict, max_workers: int = None, cancel_event=None, page_cache_path: Path = None, worker_id: str = None, wait_for_work: bool = False, output_format: str = "markdown") -> RunSummary:
+    """
+    Convert files leased from a shared WorkQueue until it is drained.
+
+    Run one of these per machine (or per process) against the same queue
+    file; see `fichero.workqueue`.
+
+    Args:
+        queue (WorkQueue): The shared queue.
+        output_folder (Path): Where the markdown files are written, usually shared storage.
+        model_config (dict): The models_config entry to convert with.
+        max_workers (int): Files in flight at once in this worker. Defaults as in `convert_folders`.
+        cancel_event (threading.Event): When set, no more files are leased.
+        page_cache_path (Path): If given, VLM responses are cached per rendered page.
+        worker_id (str): Identifies this worker's leases.
+        wait_for_work (bool): Keep polling an empty queue instead of returning.
+        output_format (str): As in `convert_folders`; each worker adds its own part files.
+    Returns:
+        RunSummary: A FileRecord per file this worker converted.
+    """
+    run_settings = RunSettings.from_config(model_config, max_workers, output_format)
+    provider, model, prompt, api_key = run_settings.provider, run_settings.model, run_settings.prompt, run_settings.api_key
+    page_chunk_size, page_parallelism = run_settings.page_chunk_size, run_settings.page_parallelism
+    settings, tiers = run_settings.client, run_settings.tiers
+    converter = get_converter(provider, model, prompt, api_key, page_cache_path, settings, run_settings.images)
+    sink = run_settings.sink(output_folder)
+
+    def handle(item):
+        try:
+            record = convert_and_save(item.path, item.input_dir, output_folder, provider, model, prompt, api_key, converter, page_chunk_size, page_parallelism, tier_settings=tiers, sink=sink)
+        except Exception:
+            instrumentation.finish(item.path, "failed")
+            raise
+        instrumentation.finish(item.path, record.status)
+        return record
+
+    with sink or nullcontext():
+        summary = run_worker(queue, handle, worker_id=worker_id, max_workers=run_settings.max_workers, cancel_event=cancel_event, wait_for_work=wait_for_work)
+    logger.info(summary)
+    logger.info(f"Queue: {queue.stats()}")
+    logger.info(f"Provider client: {get_provider_client(provider, model, settings).stats()}")
+    return summary
+
+
+def build_converter(provider: str, model: str, prompt: str, api_key: str = None, page_cache_path: Path = None, settings: dict = None, image_settings: dict = None) -> DocumentConverter:
+    """
+    Build a DocumentConverter that sends pages to the given VLM provider.
+
+    When `page_cache_path` is set, per-page VLM responses are cached there.
+    `settings` are the provider client settings from the model's config
+    (rate limit, retries, ...), see `fichero.providers`. `image_settings`
+    set the render scale and upload format, see `fichero.imaging`.
+    """
+    pipeline_options = FicheroVlmPipelineOptions(
+        enable_remote_services=True,
+        page_cache_path=str(page_cache_path) if page_cache_path else None,
+        provider=provider,
+        vlm_model=model,
+        client_settings=settings or {},
+        image_settings=image_settings or {},
+    )
+
+    vlm_options = provider_vlm_options(provider, model, prompt, api_key)
+    if vlm_options is not None:
+        pipeline_options.vlm_options = vlm_options
+
+    return DocumentConverter(
         format_options={
             InputFormat.PDF: PdfFormatOption(
                 pipeline_options=pipeline_options,
-                pipeline_cls=VlmPipeline,
+                pipeline_cls=FicheroVlmPipeline,
             ),
             InputFormat.IMAGE: PdfFormatOption(
                 pipeline_options=pipeline_options,
-                pipeline_cls=VlmPipeline,
+                pipeline_cls=FicheroVlmPipeline,
             )
         }
     )
-    return doc_converter.convert(input_doc_path)
+
+
+def get_converter(provider: str, model: str, prompt: str, api_key: str = None, page_cache_path: Path = None, settings: dict = None, image_settings: dict = None) -> DocumentConverter:
+    """
+    Return a DocumentConverter for the provider/model/prompt, reusing a cached one when possible.
+    """
+    return converter_cache.get_or_create(
+        (provider, model, prompt, api_key, page_cache_path, json.dumps(settings or {}, sort_keys=True), json.dumps(image_settings or {}, sort_keys=True)),
+        lambda: build_converter(provider, model, prompt, api_key, page_cache_path, settings, image_settings),
+    )
+
+
+def process_file(input_doc_path: Path, provider: str = "dashscope", model: str = "qwen-vl-max-latest", prompt: str = "Extract text to markdown.", api_key: str = None, converter: DocumentConverter = None, tier_settings: dict = None):
+    """
+    Convert one file with the VLM.
+
+    With `tier_settings` (see `fichero.quality`) that set "tiered", returns
+    the list of results from `process_file_tiered` instead of a single one.
+    """
+    if converter is None:
+        converter = get_converter(provider, model, prompt, api_key)
+    if tier_settings and tier_settings.get("tiered"):
+        return process_file_tiered(
+            input_doc_path,
+            converter,
+            get_standard_converter(tier_settings.get("tiered_ocr", False)),
+            min_page_score=tier_settings.get("min_page_score", 0.8),
+            min_text_quality=tier_settings.get("min_text_quality", 0.7),
+            min_page_chars=tier_settings.get("min_page_chars", 20),
+        )
+    return converter.convert(input_doc_path)
+
+
+def build_standard_converter(do_ocr: bool = False) -> DocumentConverter:
+    """
+    A DocumentConverter running docling's standard CPU pipeline: the PDF
+    text layer, layout and tables, and local OCR when `do_ocr` is set.
+    """
+    pipeline_options = PdfPipelineOptions(do_ocr=do_ocr, do_table_structure=True)
+    return DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options),
+            InputFormat.IMAGE: PdfFormatOption(pipeline_options=pipeline_options),
+        }
+    )
+
+
+def get_standard_converter(do_ocr: bool = False) -> DocumentConverter:
+    return converter_cache.get_or_create(("standard", do_ocr), lambda: build_standard_converter(do_ocr))
+
+
+def process_file_tiered(input_doc_path: Path, converter: DocumentConverter, standard_converter: DocumentConverter, min_page_score: float = 0.8, min_text_quality: float = 0.7, min_page_chars: int = 20) -> list:
+    """
+    Convert a file with the CPU pipeline, then send only its hard pages to the VLM.
+
+    A page is hard when docling's confidence for it, or the quality of its
+    text, falls below the thresholds (see `fichero.quality.is_hard_page`).
+    Born-digital PDFs and clean typed pages never reach the VLM, and a
+    scanned page without OCR has no text, so it always does.
+
+    Returns:
+        list: The CPU-pipeline result followed by one VLM result per run of
+            consecutive hard pages; `document_markdown` merges them.
+    """
+    with instrumentation.stage(input_doc_path, "local") as info:
+        standard = standard_converter.convert(input_doc_path, raises_on_error=False)
+        texts = page_markdown(standard) if standard.pages else {}
+        hard = [
+            page_no
+            for page_no, text in sorted(texts.items())
+            if is_hard_page(
+                text,
+                standard.confidence.pages[page_no - 1].mean_score if page_no - 1 in standard.confidence.pages else None,
+                min_page_score,
+                min_text_quality,
+                min_page_chars,
+            )
+        ]
+        info["pages"] = len(texts)
+        info["hard_pages"] = len(hard)
+    if not texts:
+        # the CPU pipeline could not read the file at all
+        return [converter.convert(input_doc_path)]
+    logger.info(f"{input_doc_path}: {len(hard)} of {len(texts)} pages sent to the VLM")
+    results = [standard]
+    for start, end in contiguous_ranges(hard):
+        results.append(converter.convert(input_doc_path, page_range=(start, end)))
+    return results
+
+
+def process_file_in_ranges(input_doc_path: Path, converter: DocumentConverter, chunk_size: int = 32, parallelism: int = 4) -> list:
+    """
+    Convert a PDF in page ranges of `chunk_size` pages, `parallelism` ranges at a time.
+
+    A bound volume otherwise goes through the VLM one page batch after another;
+    converting ranges side by side keeps several of its pages in flight.
+    Returns the ConversionResults in page order.
+    """
+    # a PDF pdfium cannot count is left to docling to convert, or to report
+    ranges = page_ranges(page_count(input_doc_path) or 1, chunk_size)
+    if len(ranges) <= 1:
+        return [converter.convert(input_doc_path)]
+    return convert_in_ranges(lambda page_range: converter.convert(input_doc_path, page_range=page_range), ranges, parallelism)
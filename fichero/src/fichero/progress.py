@@ -0,0 +1,141 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+
+
+@dataclass
+class Progress:
+    """
+    A snapshot of a running batch, sent to the GUI after every file.
+    """
+    done: int
+    total: int
+    failed: int = 0
+    skipped: int = 0
+    files_per_sec: float = 0.0
+    eta: float = None
+    current_file: str = None
+    last_error: str = None
+
+    def __str__(self):
+        text = f"{self.done}/{self.total} files, {self.files_per_sec:.2f} files/s"
+        if self.eta is not None:
+            text += f"\nETA {timedelta(seconds=round(self.eta))}"
+        if self.skipped:
+            text += f"\n{self.skipped} already converted"
+        if self.failed:
+            text += f"\n{self.failed} failed"
+        if self.last_error:
+            text += f"\nLast error: {self.last_error}"
+        return text
+
+
+@dataclass
+class FileRecord:
+    """
+    What happened to one file in a batch. Kept instead of the full
+    ConversionResult so memory does not grow with the size of the corpus.
+    """
+    path: Path
+    status: str  # "done", "skipped" or "failed"
+    output_path: Path = None
+    seconds: float = 0.0
+    pages: int = 0
+    error: str = None
+    # Future of a write still queued on an OutputWriter
+    write: object = field(default=None, repr=False, compare=False)
+
+
+@dataclass
+class RunSummary:
+    """
+    The outcome of a batch: counts, wall time and one FileRecord per file.
+    """
+    total: int
+    records: list = field(default_factory=list)
+    seconds: float = 0.0
+    cancelled: bool = False
+    # highest RSS in bytes during the run, when it could be measured
+    peak_memory: int = None
+
+    def count(self, status: str) -> int:
+        return sum(1 for r in self.records if r.status == status)
+
+    @property
+    def done(self) -> int:
+        return self.count("done")
+
+    @property
+    def skipped(self) -> int:
+        return self.count("skipped")
+
+    @property
+    def failed(self) -> int:
+        return self.count("failed")
+
+    def __str__(self):
+        text = (
+            f"Processed {self.done} of {self.total} files, {self.skipped} skipped, "
+            f"{self.failed} failed in {timedelta(seconds=round(self.seconds))}."
+        )
+        if self.peak_memory:
+            text += f" Peak memory {self.peak_memory / (1024 * 1024):.0f} MB."
+        return text
+
+
+class ProgressTracker:
+    """
+    Counts finished files and reports a Progress snapshot to `callback`.
+
+    `update` may be called from worker threads; the callback runs on the
+    calling thread, so GUI callers must hand the event to their own loop.
+    """
+
+    def __init__(self, total: int, callback=None, clock=time.monotonic):
+        self.total = total
+        self.callback = callback
+        self.clock = clock
+        self.started = clock()
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, current_file=None) -> Progress:
+        # skipped files cost next to nothing, so leave them out of the rate
+        elapsed = self.clock() - self.started
+        converted = self.done - self.skipped
+        rate = converted / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else None
+        return Progress(
+            done=self.done,
+            total=self.total,
+            failed=self.failed,
+            skipped=self.skipped,
+            files_per_sec=rate,
+            eta=eta,
+            current_file=current_file,
+            last_error=self.last_error,
+        )
+
+    def start(self) -> Progress:
+        progress = self.snapshot()
+        if self.callback:
+            self.callback(progress)
+        return progress
+
+    def update(self, file_path=None, error: Exception = None, skipped: bool = False) -> Progress:
+        with self._lock:
+            self.done += 1
+            if skipped:
+                self.skipped += 1
+            if error is not None:
+                self.failed += 1
+                self.last_error = f"{file_path}: {error}" if file_path else str(error)
+            progress = self.snapshot(current_file=str(file_path) if file_path else None)
+        if self.callback:
+            self.callback(progress)
+        return progress
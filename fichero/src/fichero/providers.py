@@ -0,0 +1,214 @@
+"""
+HTTP clients for the VLM providers.
+
+Each provider/model pair gets one ProviderClient per process, shared by all
+converters and worker threads. It keeps a pooled keep-alive session, a
+token-bucket rate limit, an adaptive cap on requests in flight, and retries
+throttled or failed requests with exponential backoff.
+
+These settings can be set per entry in models_config.jsonl:
+
+    rate_limit              requests per second (default: unlimited)
+    burst                   requests allowed at once above the rate
+    max_requests_in_flight  upper cap on concurrent requests
+    min_requests_in_flight  the adaptive cap never drops below this
+    retries                 attempts after the first one
+    backoff                 first backoff delay in seconds, doubled per retry
+    max_backoff             longest backoff delay in seconds
+    timeout                 per-request timeout in seconds
+"""
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .imaging import encode_image
+from .ratelimit import AdaptiveLimiter, TokenBucket, backoff_delay
+
+CLIENT_SETTINGS = (
+    "rate_limit",
+    "burst",
+    "max_requests_in_flight",
+    "min_requests_in_flight",
+    "retries",
+    "backoff",
+    "max_backoff",
+    "timeout",
+)
+
+PROVIDER_DEFAULTS = {
+    # a local Ollama serves one request at a time unless OLLAMA_NUM_PARALLEL is raised
+    "ollama": {"max_requests_in_flight": 2, "retries": 2, "backoff": 2.0},
+    "dashscope": {"max_requests_in_flight": 8, "retries": 5, "backoff": 1.0},
+    "sandbox": {"max_requests_in_flight": 4, "retries": 5, "backoff": 1.0},
+}
+
+# responses worth retrying; 429 and 503 also mean "slow down"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+logger = logging.getLogger(__name__)
+
+
+def client_settings(model_config: dict) -> dict:
+    """
+    Pick the client settings out of a models_config entry.
+    """
+    return {key: model_config[key] for key in CLIENT_SETTINGS if model_config.get(key) is not None}
+
+
+class ProviderClient:
+    """
+    Sends page images to one provider's OpenAI-compatible chat endpoint.
+    """
+
+    def __init__(self, name: str, rate_limit: float = None, burst: int = None, max_requests_in_flight: int = 4, min_requests_in_flight: int = 1, retries: int = 3, backoff: float = 1.0, max_backoff: float = 60.0, timeout: float = None):
+        self.name = name
+        self.bucket = TokenBucket(rate_limit, burst)
+        self.limiter = AdaptiveLimiter(max_requests_in_flight, min_requests_in_flight)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, max_requests_in_flight))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.requests = 0
+        self.retried = 0
+        self.throttled = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.images = 0
+        self.bytes_sent = 0
+        self.blank_pages = 0
+        self._lock = threading.Lock()
+
+    def _count(self, **counts):
+        with self._lock:
+            for key, value in counts.items():
+                setattr(self, key, getattr(self, key) + value)
+
+    def post(self, url: str, payload: dict, headers: dict = None, timeout: float = 60) -> dict:
+        """
+        POST `payload` as JSON, retrying throttled, failed or timed out requests.
+        """
+        timeout = self.timeout or timeout
+        attempt = 0
+        while True:
+            attempt += 1
+            self.bucket.acquire()
+            self.limiter.acquire()
+            throttled = False
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                response = self.session.post(str(url), headers=headers or {}, json=payload, timeout=timeout)
+                if response.status_code in RETRY_STATUS:
+                    throttled = response.status_code in THROTTLE_STATUS
+                    retry_after = response.headers.get("Retry-After")
+                    error = requests.HTTPError(f"{response.status_code} from {self.name}: {response.text[:200]}", response=response)
+                else:
+                    if not response.ok:
+                        # not worth retrying, but still a failed request
+                        logger.error(f"Error calling {self.name}. Response was {response.text}")
+                        self._count(errors=1)
+                    response.raise_for_status()
+                    return response.json()
+            except (requests.Timeout, requests.ConnectionError) as e:
+                # an overloaded server tends to show up as timeouts too
+                throttled = isinstance(e, requests.Timeout)
+                error = e
+            finally:
+                self.limiter.release(throttled=throttled)
+                self._count(requests=1, throttled=int(throttled), seconds=time.perf_counter() - started)
+
+            if attempt > self.retries:
+                self._count(errors=1)
+                raise error
+            try:
+                retry_after = float(retry_after) if retry_after is not None else None
+            except ValueError:
+                retry_after = None
+            delay = backoff_delay(attempt, self.backoff, self.max_backoff, retry_after)
+            logger.warning(f"{self.name}: {error}; retry {attempt}/{self.retries} in {delay:.1f}s")
+            self._count(retried=1)
+            time.sleep(delay)
+
+    def record_blank_page(self):
+        """
+        Count a page that was skipped as blank instead of being sent.
+        """
+        self._count(blank_pages=1)
+
+    def request_image(self, image, prompt: str, url: str, timeout: float = 60, headers: dict = None, image_options: dict = None, sent: dict = None, **params) -> str:
+        """
+        Send a page image and prompt, returning the generated text.
+
+        `image_options` are passed to `encode_image` (format, quality, grayscale).
+        If `sent` is a dict, the image's size in bytes is stored in it as
+        "bytes", and the provider's token counts, if any, as "usage".
+        """
+        mime, image_base64 = encode_image(image, **(image_options or {}))
+        image_bytes = len(image_base64) * 3 // 4
+        self._count(images=1, bytes_sent=image_bytes)
+        if sent is not None:
+            sent["bytes"] = image_bytes
+        logger.debug(f"{self.name}: sending {image.size[0]}x{image.size[1]} {mime} page, {image_bytes} bytes")
+        messages = [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image_url",
+                        "image_url": {"url": f"data:{mime};base64,{image_base64}"},
+                    },
+                    {
+                        "type": "text",
+                        "text": prompt,
+                    },
+                ],
+            }
+        ]
+        response = self.post(url, {"messages": messages, **params}, headers=headers, timeout=timeout)
+        if sent is not None and response.get("usage"):
+            sent["usage"] = response["usage"]
+        return response["choices"][0]["message"]["content"].strip()
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "retried": self.retried,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "in_flight_limit": self.limiter.limit,
+            "seconds": round(self.seconds, 3),
+            "images": self.images,
+            "bytes_sent": self.bytes_sent,
+            "bytes_per_page": self.bytes_sent // self.images if self.images else 0,
+            "blank_pages": self.blank_pages,
+        }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_provider_client(provider: str, model: str, settings: dict = None) -> ProviderClient:
+    """
+    Return the shared ProviderClient for a provider/model pair and its
+    settings, creating it on first use.
+
+    `settings` (see `client_settings`) override the provider defaults. They
+    are part of the key, so edited limits take effect with a new client.
+    """
+    key = (provider, model, tuple(sorted((settings or {}).items())))
+    with _clients_lock:
+        if key not in _clients:
+            options = dict(PROVIDER_DEFAULTS.get(provider, {}))
+            options.update(settings or {})
+            _clients[key] = ProviderClient(f"{provider}/{model}", **options)
+        return _clients[key]
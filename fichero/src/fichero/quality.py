@@ -0,0 +1,74 @@
+"""
+Checks for the tiered conversion mode.
+
+In tiered mode every file first goes through docling's standard CPU
+pipeline (text layer, plus local OCR when `tiered_ocr` is set). Only the
+pages that fail these checks are sent to the VLM. These settings can be
+set per entry in models_config.jsonl:
+
+    tiered            convert with the CPU pipeline first, VLM only for hard pages
+    tiered_ocr        run local OCR in the CPU pipeline (default: text layer only)
+    min_page_score    docling's per-page confidence below which a page is hard (default 0.8)
+    min_text_quality  share of clean characters and words below which a page is hard (default 0.7)
+    min_page_chars    pages with fewer characters of text are hard (default 20)
+"""
+import math
+import re
+import unicodedata
+
+TIER_SETTINGS = (
+    "tiered",
+    "tiered_ocr",
+    "min_page_score",
+    "min_text_quality",
+    "min_page_chars",
+)
+
+# broken font encodings in text layers come out as "(cid:123)" or U+FFFD
+GLYPH_ARTIFACTS = re.compile(r"\(cid:\d+\)|�")
+MARKUP = re.compile(r"[#*_`|>\-]{2,}|^\s*[#>*\-]\s", re.MULTILINE)
+WORD = re.compile(r"^[\W_]*(?:[^\W\d_]+(?:['’\-][^\W\d_]+)*|\d+(?:[.,:/\-]\d+)*)[\W_]*$")
+
+
+def tier_settings(model_config: dict) -> dict:
+    """
+    Pick the tiered-mode settings out of a models_config entry.
+    """
+    return {key: model_config[key] for key in TIER_SETTINGS if model_config.get(key) is not None}
+
+
+def text_quality(text: str) -> float:
+    """
+    Score extracted text from 0 (garbage) to 1 (clean prose).
+
+    The score is the lower of the share of ordinary characters (letters,
+    digits, spaces, punctuation) and the share of whitespace-separated
+    tokens that look like words or numbers, minus a penalty for glyph
+    artifacts from broken text layers.
+    """
+    text = MARKUP.sub(" ", text or "")
+    characters = [c for c in text if not c.isspace()]
+    if not characters:
+        return 0.0
+    ordinary = sum(1 for c in characters if unicodedata.category(c)[0] in "LNP")
+    tokens = text.split()
+    words = sum(1 for token in tokens if WORD.match(token))
+    artifacts = len(GLYPH_ARTIFACTS.findall(text))
+    score = min(ordinary / len(characters), words / len(tokens)) - artifacts / len(tokens)
+    return max(0.0, score)
+
+
+def is_hard_page(text: str, page_score: float = None, min_page_score: float = 0.8, min_text_quality: float = 0.7, min_page_chars: int = 20) -> bool:
+    """
+    True when a page's CPU-pipeline text should not be trusted and the page
+    should go to the VLM instead.
+
+    Args:
+        text (str): The page's markdown from the CPU pipeline.
+        page_score (float): docling's mean confidence for the page, if known.
+    """
+    if len((text or "").strip()) < min_page_chars:
+        return True
+    if page_score is not None and not math.isnan(page_score) and page_score < min_page_score:
+        return True
+    return text_quality(text) < min_text_quality
@@ -0,0 +1,42 @@
+"""
+Page ranges for converting parts of a document.
+
+Long PDFs are converted in fixed-size page ranges side by side (see
+`fichero.process.process_file_in_ranges`), and in tiered mode only the runs
+of hard pages go to the VLM (see `fichero.process.process_file_tiered`).
+Both pass inclusive, 1-based (start, end) ranges to docling's `page_range`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+
+def contiguous_ranges(page_numbers: list) -> list:
+    """
+    Group sorted page numbers into inclusive (start, end) ranges, e.g. [1, 2, 5] -> [(1, 2), (5, 5)].
+    """
+    ranges = []
+    for page_no in page_numbers:
+        if ranges and page_no == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], page_no)
+        else:
+            ranges.append((page_no, page_no))
+    return ranges
+
+
+def page_ranges(page_count: int, chunk_size: int) -> list:
+    """
+    Split pages 1..page_count into inclusive (start, end) ranges of at most `chunk_size` pages.
+    """
+    return [
+        (start, min(start + chunk_size - 1, page_count))
+        for start in range(1, page_count + 1, chunk_size)
+    ]
+
+
+def convert_in_ranges(convert, ranges: list, parallelism: int = 4) -> list:
+    """
+    Call `convert(page_range)` for each range, `parallelism` at a time.
+
+    Returns the results in the order of `ranges`, however the conversions finish.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(parallelism, len(ranges)))) as pool:
+        return list(pool.map(convert, ranges))
@@ -0,0 +1,97 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to `burst`.
+
+    Args:
+        rate (float): Tokens added per second; None or 0 disables the limit.
+        burst (int): Bucket size. Defaults to one second's worth of tokens.
+    """
+
+    def __init__(self, rate: float = None, burst: int = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate or 1))
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping until one is available. Returns seconds waited.
+        """
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+
+class AdaptiveLimiter:
+    """
+    Caps requests in flight, shrinking the cap when the provider pushes back
+    and growing it again while requests succeed (additive increase,
+    multiplicative decrease).
+
+    Args:
+        max_limit (int): Highest number of requests in flight.
+        min_limit (int): The cap never drops below this.
+    """
+
+    def __init__(self, max_limit: int = 4, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                # one step up after a full window of successes
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0, retry_after: float = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (starting at 1).
+
+    Uses exponential backoff with full jitter, but never less than a
+    server-supplied Retry-After.
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+    if retry_after is not None:
+        delay = max(delay, min(cap, retry_after))
+    return delay
@@ -1,20 +1,81 @@
-import toga
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING
 import srsly
 
-def get_models_config(app:toga.App) -> dict:
+from .output import atomic_write_text
+
+if TYPE_CHECKING:
+    import toga
+
+
+# parsed models_config.jsonl files, keyed by path, with the (mtime, size)
+# they were read at so edits made outside the app are still picked up
+_config_cache = {}
+_config_lock = threading.RLock()
+
+
+def _file_version(path: Path) -> tuple:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_models_config(data_dir: Path, defaults_path: Path, seed: bool = True) -> list:
+    """
+    Returns the models config stored in `data_dir`, creating it from `defaults_path` on first use.
+    With `seed` False, the defaults are returned without creating the file.
+
+    The parsed file is cached and only read again once its modification
+    time or size changes. Each call returns fresh copies of the entries,
+    so callers may edit them.
+    """
+    config_data_path = Path(data_dir) / "models_config.jsonl"
+    with _config_lock:
+        if not config_data_path.exists():
+            # If it does not exist, create a default configuration
+            models_config = list(srsly.read_jsonl(defaults_path))
+            if not seed:
+                return models_config
+            save_models_config(data_dir, models_config)
+        else:
+            version = _file_version(config_data_path)
+            cached = _config_cache.get(config_data_path)
+            if cached is None or cached[0] != version:
+                _config_cache[config_data_path] = (version, list(srsly.read_jsonl(config_data_path)))
+        return [dict(entry) for entry in _config_cache[config_data_path][1]]
+
+
+def save_models_config(data_dir: Path, models_config: list) -> Path:
+    """
+    Atomically replace models_config.jsonl in `data_dir`, so a crash while
+    saving never leaves a truncated config behind.
+    """
+    config_data_path = Path(data_dir) / "models_config.jsonl"
+    # if directory does not exist, create it
+    config_data_path.parent.mkdir(parents=True, exist_ok=True)
+    models_config = [dict(entry) for entry in models_config]
+    with _config_lock:
+        atomic_write_text(config_data_path, "".join(srsly.json_dumps(entry) + "\n" for entry in models_config))
+        _config_cache[config_data_path] = (_file_version(config_data_path), models_config)
+    return config_data_path
+
+
+def get_models_config(app:"toga.App") -> list:
     """
     Returns the configuration for the models.
     """
     # check if the models_config.json file exists
     #https://toga.readthedocs.io/en/stable/reference/api/resources/app_paths.html#toga.paths.Paths.data
-    config_data_path = (app.paths.data / "models_config.jsonl") 
-    if not config_data_path.exists():
-        # If it does not exist, create a default configuration
-        models_config = list(srsly.read_jsonl(app.paths.app / "resources"/ "models_config.start.jsonl"))
-        # if directory does not exist, create it
-        if not app.paths.data.exists():
-            app.paths.data.mkdir(parents=True, exist_ok=True)   
-        # Save the default configuration to the file
-        srsly.write_jsonl(app.paths.data / "models_config.jsonl", models_config)
-    return list(srsly.read_jsonl(app.paths.data / "models_config.jsonl"))
+    return load_models_config(app.paths.data, app.paths.app / "resources" / "models_config.start.jsonl")
+
 
+def selected_model_config(app:"toga.App") -> dict:
+    """
+    Return the models_config entry for the model currently selected in the app.
+    """
+    provider = app.model_selection.value.provider
+    model = app.model_selection.value.name
+    model_config = [a for a in app.models_config if a['name'] == model]
+    if model_config:
+        return dict(model_config[0], provider=provider)
+    return None
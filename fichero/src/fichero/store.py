@@ -1,16 +1,230 @@
-import chromadb
-import pandas as pd
-from tqdm import tqdm
-from langchain.text_splitter import SentenceTransformersTokenTextSplitter
-from chromadb.utils import embedding_functions
-import random 
+import hashlib
+import time
+from pathlib import Path
+from .discovery import iter_files
+from .embeddings import EmbeddingService, get_embedding_service
+from .output import split_pages
+from .cache import LRUCache
+from .timing import instrumentation
 
 
-def create_chroma_client():
+COLLECTION_NAME = "fichero"
+
+
+def create_chroma_client(path="chroma_db"):
     """
     Create a ChromaDB client with a persistent storage path.
     """
-    return chromadb.PersistentClient(path="chroma_db")
+    import chromadb
+
+    return chromadb.PersistentClient(path=str(path))
+
+
+def get_splitter():
+    """
+    The token splitter used to chunk converted documents for embedding.
+
+    This is the shared LaBSE EmbeddingService, whose `split_text` matches
+    SentenceTransformersTokenTextSplitter(chunk_overlap=5, model_name="LaBSE")
+    without loading a second copy of the model.
+    """
+    return get_embedding_service()
+
+
+def get_collection(client, name: str = COLLECTION_NAME, service: EmbeddingService = None):
+    """
+    Get or create the collection holding converted document chunks.
+    """
+    service = service or get_embedding_service()
+    return client.get_or_create_collection(name=name, embedding_function=service.chroma_embedding_function())
+
+
+def chunk_id(source: str, index: int) -> str:
+    """
+    A stable ID for chunk `index` of `source`, so re-ingesting a file replaces its chunks.
+    """
+    return f"{hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]}:{index:05d}"
+
+
+def stored_hash(collection, source: str):
+    """
+    Return the content hash recorded for `source` in the collection, if all
+    of its chunks are there.
+
+    Every chunk records how many chunks its file has, so a file whose
+    upserts were interrupted (its last chunk is missing) counts as not stored.
+    """
+    found = collection.get(where={"source": source}, limit=1, include=["metadatas"])
+    if not found["metadatas"]:
+        return None
+    metadata = found["metadatas"][0]
+    if not metadata.get("chunks"):
+        return None
+    last = collection.get(ids=[chunk_id(source, metadata["chunks"] - 1)], include=["metadatas"])
+    if not last["metadatas"] or last["metadatas"][0].get("content_hash") != metadata.get("content_hash"):
+        return None
+    return metadata.get("content_hash")
+
+
+def ingest_folder(collection, output_folder: Path, splitter=None, batch_size: int = 512, service: EmbeddingService = None, model: str = None) -> dict:
+    """
+    Chunk every markdown file below `output_folder` and upsert the chunks.
+
+    Files whose content hash matches what is already stored, with all of
+    their chunks, are skipped. Any other file has its old chunks deleted
+    before the new ones are added, so a document that shrinks, or whose
+    ingest was interrupted, leaves no stale chunks behind. Chunks from
+    many files are queued, embedded by the shared EmbeddingService and
+    upserted `batch_size` at a time. Pages are split on the PAGE_BREAK
+    placeholders written by `save_markdown` and chunked separately, so
+    every chunk records the page it came from.
+
+    Args:
+        collection: A Chroma collection, see `get_collection`.
+        output_folder (Path): The folder the markdown was written to.
+        splitter: Text splitter, defaults to `get_splitter()`.
+        batch_size (int): Chunks per upsert call.
+        service (EmbeddingService): Defaults to the process-wide LaBSE service.
+        model (str): Name of the model that produced the markdown, stored with each chunk.
+    Returns:
+        dict: Counts of files seen, skipped and ingested, and chunks written.
+    """
+    service = service or get_embedding_service()
+    splitter = splitter or service
+    output_folder = Path(output_folder)
+    stats = {"files": 0, "skipped": 0, "ingested": 0, "chunks": 0}
+    ids, documents, metadatas = [], [], []
+
+    def flush():
+        if ids:
+            collection.upsert(
+                ids=list(ids),
+                documents=list(documents),
+                metadatas=list(metadatas),
+                embeddings=service.embed(documents),
+            )
+            stats["chunks"] += len(ids)
+            ids.clear()
+            documents.clear()
+            metadatas.clear()
+
+    for item in iter_files([output_folder], {"md"}):
+        stats["files"] += 1
+        with instrumentation.stage(item.path, "ingest") as info:
+            source = str(item.path)
+            text = item.path.read_text(encoding="utf-8")
+            info["bytes"] = item.size
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if stored_hash(collection, source) == content_hash:
+                stats["skipped"] += 1
+                info["skipped"] = True
+                continue
+            collection.delete(where={"source": source})
+
+            relative = item.path.relative_to(output_folder)
+            chunks = [
+                (page_no, chunk)
+                for page_no, page_text in enumerate(split_pages(text), start=1)
+                for chunk in splitter.split_text(page_text)
+            ]
+            for index, (page_no, chunk) in enumerate(chunks):
+                metadata = {
+                    "source": source,
+                    "file": item.path.name,
+                    "folder": str(relative.parent),
+                    "page": page_no,
+                    "chunk": index,
+                    "chunks": len(chunks),
+                    "content_hash": content_hash,
+                }
+                if model:
+                    metadata["model"] = model
+                ids.append(chunk_id(source, index))
+                documents.append(chunk)
+                metadatas.append(metadata)
+                if len(ids) >= batch_size:
+                    flush()
+            info["chunks"] = len(chunks)
+            stats["ingested"] += 1
+    with instrumentation.stage(None, "ingest", flush=True):
+        flush()
+    return stats
+
+def build_where(folder: str = None, file: str = None, page: int = None, model: str = None) -> dict:
+    """
+    Build a Chroma `where` filter from the metadata fields that are set.
+    """
+    conditions = [
+        {key: value}
+        for key, value in (("folder", folder), ("file", file), ("page", page), ("model", model))
+        if value not in (None, "")
+    ]
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+class Searcher:
+    """
+    Semantic search over the chunk collection, with cached query embeddings
+    and cached results.
+
+    Result cache keys include the collection's size, so results are
+    recomputed once new chunks have been ingested.
+    """
+
+    def __init__(self, collection, service: EmbeddingService = None, cache_size: int = 256):
+        self.collection = collection
+        self.service = service or get_embedding_service()
+        self.query_embeddings = LRUCache(maxsize=cache_size)
+        self.results = LRUCache(maxsize=cache_size)
+        self.last_seconds = 0.0
+
+    def embed_query(self, query: str) -> list:
+        return self.query_embeddings.get_or_create(query, lambda: self.service.embed([query])[0])
+
+    def search(self, query: str, n_results: int = 10, folder: str = None, file: str = None, page: int = None, model: str = None) -> dict:
+        """
+        Return the `n_results` chunks closest to `query`, optionally filtered by metadata.
+
+        Returns:
+            dict: `hits` (id, document, metadata and distance for each chunk),
+                `seconds` taken and whether the result came from the `cached` results.
+        """
+        started = time.perf_counter()
+        where = build_where(folder=folder, file=file, page=page, model=model)
+        key = (query, n_results, repr(where), self.collection.count())
+        hits = self.results.get(key)
+        cached = hits is not None
+        if not cached:
+            found = self.collection.query(
+                query_embeddings=[self.embed_query(query)],
+                n_results=n_results,
+                where=where,
+                include=["documents", "metadatas", "distances"],
+            )
+            hits = [
+                {"id": id_, "document": document, "metadata": metadata, "distance": distance}
+                for id_, document, metadata, distance in zip(
+                    found["ids"][0], found["documents"][0], found["metadatas"][0], found["distances"][0]
+                )
+            ]
+            self.results.put(key, hits)
+        self.last_seconds = time.perf_counter() - started
+        return {"hits": hits, "seconds": self.last_seconds, "cached": cached}
+
+    def clear(self):
+        self.results.clear()
+
+    def stats(self) -> dict:
+        return {
+            "query_embeddings": self.query_embeddings.stats(),
+            "results": self.results.stats(),
+            "last_seconds": round(self.last_seconds, 4),
+        }
+
 
 def test_chroma_client(self):
     """
@@ -18,10 +232,7 @@ def test_chroma_client(self):
     """
     client = create_chroma_client()
     
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name="LaBSE")
-    collection = client.get_or_create_collection(name="testing",embedding_function=sentence_transformer_ef)
-
-    splitter = SentenceTransformersTokenTextSplitter(chunk_overlap=5,model_name="LaBSE")
+    collection = get_collection(client, name="testing")
 
 
     collection.add(
@@ -0,0 +1,146 @@
+"""
+Per-file, per-stage timing for conversion runs.
+
+Every stage of every file (discovery, "local" for the CPU pipeline in
+tiered mode, render, vlm, save, ingest) is recorded with its duration,
+bytes and error, kept as running totals for the Logs window and, once
+`configure` has been called, appended as one JSON object per line to a
+rotating log file.
+"""
+import heapq
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+STAGES = ("discovery", "local", "render", "vlm", "save", "ingest")
+
+LOG_NAME = "timings.jsonl"
+
+
+class Instrumentation:
+    """
+    Collects stage timings and writes them to a JSONL log.
+
+    Args:
+        slowest (int): How many of the slowest finished files to keep.
+    """
+
+    def __init__(self, slowest: int = 20):
+        self.slowest_kept = slowest
+        self.log_path = None
+        self._handler = None
+        self._log = logging.getLogger(f"{__name__}.jsonl.{id(self)}")
+        self._log.propagate = False
+        self._log.setLevel(logging.INFO)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the totals, e.g. at the start of a run.
+        """
+        with self._lock:
+            self.totals = {stage: {"count": 0, "seconds": 0.0, "bytes": 0, "errors": 0} for stage in STAGES}
+            self.files = {}
+            self._slowest = []
+            self.finished = 0
+
+    def configure(self, log_path: Path, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 3):
+        """
+        Append records to `log_path`, rotating it at `max_bytes`.
+        """
+        log_path = Path(log_path)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            if self._handler is not None:
+                self._log.removeHandler(self._handler)
+                self._handler.close()
+            self._handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            self._handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log.addHandler(self._handler)
+            self.log_path = log_path
+
+    def record(self, file_path, stage: str, seconds: float, bytes: int = None, error=None, **fields):
+        """
+        Record one stage of one file. `file_path` is None for run-level stages.
+        """
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "file": str(file_path) if file_path is not None else None,
+            "stage": stage,
+            "seconds": round(seconds, 4),
+        }
+        if bytes is not None:
+            entry["bytes"] = bytes
+        if error is not None:
+            entry["error"] = str(error)
+        entry.update(fields)
+        with self._lock:
+            totals = self.totals.setdefault(stage, {"count": 0, "seconds": 0.0, "bytes": 0, "errors": 0})
+            totals["count"] += 1
+            totals["seconds"] += seconds
+            totals["bytes"] += bytes or 0
+            totals["errors"] += int(error is not None)
+            if file_path is not None:
+                self.files[str(file_path)] = self.files.get(str(file_path), 0.0) + seconds
+        if self._handler is not None:
+            self._log.info(json.dumps(entry, default=str))
+
+    @contextmanager
+    def stage(self, file_path, stage: str, **fields):
+        """
+        Time the enclosed block as `stage` of `file_path`.
+
+        Yields a dict the block can add fields to, such as "bytes". An
+        exception is recorded as the stage's error and re-raised.
+        """
+        info = dict(fields)
+        started = time.perf_counter()
+        error = None
+        try:
+            yield info
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.record(file_path, stage, time.perf_counter() - started, error=error, **info)
+
+    def finish(self, file_path, status: str = "done"):
+        """
+        Mark a file as finished, moving its total into the slowest-files list.
+        """
+        with self._lock:
+            seconds = self.files.pop(str(file_path), 0.0)
+            self.finished += 1
+            item = (seconds, str(file_path))
+            if len(self._slowest) < self.slowest_kept:
+                heapq.heappush(self._slowest, item)
+            else:
+                heapq.heappushpop(self._slowest, item)
+        if self._handler is not None:
+            self._log.info(json.dumps({"file": str(file_path), "stage": "file", "status": status, "seconds": round(seconds, 4)}))
+
+    def slowest(self, n: int = None) -> list:
+        """
+        The slowest finished files as (path, seconds), slowest first.
+        """
+        with self._lock:
+            items = sorted(self._slowest, reverse=True)
+        return [(path, seconds) for seconds, path in items[:n]]
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "files": self.finished,
+                "stages": {stage: dict(totals, seconds=round(totals["seconds"], 3)) for stage, totals in self.totals.items()},
+            }
+
+
+instrumentation = Instrumentation()
@@ -0,0 +1,299 @@
+"""
+A work queue in a SQLite file, so several processes or machines can share
+one corpus without a broker.
+
+    python -m fichero enqueue /mnt/archive/scans --queue /mnt/archive/queue.sqlite3
+    python -m fichero worker --queue /mnt/archive/queue.sqlite3 --model granite3.2-vision --output /mnt/archive/markdown
+
+Workers lease files for a limited time and renew their leases while they
+work. A file whose worker died is leased again once its lease expires, and
+a file that keeps failing is given up on after `max_attempts`.
+
+The queue file can live on shared storage. It uses SQLite's rollback
+journal rather than WAL, since WAL needs shared memory that network file
+systems do not provide; every lease is a short `BEGIN IMMEDIATE` transaction.
+"""
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+
+from .discovery import WorkItem
+from .progress import FileRecord, RunSummary
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    path TEXT PRIMARY KEY,
+    input_dir TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+# job states
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class WorkQueue:
+    """
+    Files to convert, with their lease and status, in a SQLite file.
+
+    Args:
+        path (Path): The queue file, shared by every worker.
+        lease_seconds (float): How long a lease lasts without being renewed.
+        max_attempts (int): Leases per file before it is marked failed.
+        timeout (float): Seconds to wait for another process's lock.
+    """
+
+    def __init__(self, path: Path, lease_seconds: float = 600, max_attempts: int = 3, timeout: float = 60, clock=time.time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        # autocommit, so each transaction below is explicit
+        self._conn = sqlite3.connect(str(self.path), timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=DELETE")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never select the same pending rows
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, items, batch_size: int = 1000) -> int:
+        """
+        Add WorkItems (see `fichero.discovery.iter_files`) to the queue.
+        Files already queued are left as they are. Returns the number added.
+        """
+        added = 0
+        batch = []
+
+        def flush():
+            nonlocal added
+            with self._transaction() as conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (path, input_dir, size, status, updated) VALUES (?, ?, ?, ?, ?)",
+                    batch,
+                )
+                added += conn.total_changes - before
+            batch.clear()
+
+        for item in items:
+            batch.append((str(item.path), str(item.input_dir), item.size, PENDING, self.clock()))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return added
+
+    def lease(self, worker: str, n: int = 1) -> list:
+        """
+        Lease up to `n` files for `worker`: pending ones first, then ones
+        whose lease has expired. Returns a list of WorkItems.
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                """
+                SELECT path, input_dir, size FROM jobs
+                WHERE (status = ? OR (status = ? AND lease_expires < ?)) AND attempts < ?
+                ORDER BY status DESC, path
+                LIMIT ?
+                """,
+                (PENDING, LEASED, now, self.max_attempts, n),
+            ).fetchall()
+            conn.executemany(
+                """
+                UPDATE jobs SET status = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ?
+                WHERE path = ?
+                """,
+                [(LEASED, worker, now + self.lease_seconds, now, row[0]) for row in rows],
+            )
+        return [WorkItem(path=Path(path), input_dir=Path(input_dir), size=size) for path, input_dir, size in rows]
+
+    def renew(self, worker: str) -> int:
+        """
+        Extend every lease `worker` holds. Returns the number renewed.
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE status = ? AND worker = ?",
+                (now + self.lease_seconds, now, LEASED, worker),
+            )
+            return cursor.rowcount
+
+    def complete(self, path: Path, worker: str) -> bool:
+        """
+        Mark a leased file done. False if the lease was lost to another worker.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, lease_expires = NULL, error = NULL, updated = ? WHERE path = ? AND worker = ? AND status = ?",
+                (DONE, self.clock(), str(path), worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, path: Path, worker: str, error) -> bool:
+        """
+        Return a leased file to the queue after an error, or mark it failed
+        once it has used up its attempts.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                    lease_expires = NULL, error = ?, updated = ?
+                WHERE path = ? AND worker = ? AND status = ?
+                """,
+                (self.max_attempts, FAILED, PENDING, str(error), self.clock(), str(path), worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def recover_expired(self) -> int:
+        """
+        Put files with expired leases back to pending (or failed, when out
+        of attempts). `lease` already picks these up; this tidies the counts.
+        """
+        now = self.clock()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                    error = COALESCE(error, 'lease expired'), updated = ?
+                WHERE status = ? AND lease_expires < ?
+                """,
+                (self.max_attempts, FAILED, PENDING, now, LEASED, now),
+            )
+            return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        """
+        Give failed files a fresh set of attempts.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, updated = ? WHERE status = ?",
+                (PENDING, self.clock(), FAILED),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+
+def run_worker(queue: WorkQueue, handler, worker_id: str = None, max_workers: int = 1, cancel_event=None, wait_for_work: bool = False, poll_interval: float = 5.0) -> RunSummary:
+    """
+    Lease files from `queue` and call `handler(item)` on each until the queue is drained.
+
+    `handler` takes a WorkItem and returns a FileRecord (or raises). Up to
+    `max_workers` files are converted at once, and a background thread
+    renews this worker's leases while they run.
+
+    Args:
+        queue (WorkQueue): The shared queue.
+        handler (callable): Converts one WorkItem.
+        worker_id (str): Identifies this worker's leases; defaults to host:pid:random.
+        max_workers (int): Files in flight at once.
+        cancel_event (threading.Event): When set, no more files are leased.
+        wait_for_work (bool): Keep polling an empty queue instead of returning.
+        poll_interval (float): Seconds between polls of an empty queue.
+    Returns:
+        RunSummary: A FileRecord per file this worker handled.
+    """
+    worker_id = worker_id or default_worker_id()
+    max_workers = max(1, int(max_workers))
+    summary = RunSummary(total=0)
+    started = time.monotonic()
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(queue.lease_seconds / 3):
+            try:
+                queue.renew(worker_id)
+            except Exception as e:
+                # e.g. the queue file is briefly locked or the share dropped;
+                # the lease has two more renewals before it expires
+                logger.warning(f"Could not renew leases of {worker_id}, retrying: {e}")
+
+    def run(item):
+        try:
+            record = handler(item)
+        except Exception as e:
+            logger.exception(f"Failed to process {item.path}")
+            queue.fail(item.path, worker_id, e)
+            return FileRecord(path=item.path, status="failed", error=str(e))
+        if not queue.complete(item.path, worker_id):
+            logger.warning(f"Lease on {item.path} was lost before it finished")
+        return record
+
+    queue.recover_expired()
+    renewer = threading.Thread(target=heartbeat, name="fichero-lease-renewer", daemon=True)
+    renewer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = set()
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                items = queue.lease(worker_id, max_workers - len(pending)) if len(pending) < max_workers else []
+                pending.update(pool.submit(run, item) for item in items)
+                if not pending:
+                    if not wait_for_work:
+                        break
+                    if cancel_event is not None:
+                        cancel_event.wait(poll_interval)
+                    else:
+                        time.sleep(poll_interval)
+                    continue
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    summary.records.append(future.result())
+            for future in pending:
+                summary.records.append(future.result())
+    finally:
+        stopped.set()
+    summary.total = len(summary.records)
+    summary.seconds = time.monotonic() - started
+    summary.cancelled = cancel_event is not None and cancel_event.is_set()
+    return summary
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+from fichero.batch import RunSettings, run_batch  # noqa: E402
+from fichero.manifest import Manifest  # noqa: E402
+from fichero.memory import MB, MemoryBudget  # noqa: E402
+from fichero.output import OutputWriter, output_path_for  # noqa: E402
+from fichero.progress import FileRecord  # noqa: E402
+
+
+def test_run_settings_defaults():
+    settings = RunSettings.from_config({"name": "granite3.2-vision", "provider": "ollama", "rate_limit": 2, "scale": 1.5})
+    assert (settings.model, settings.prompt, settings.max_workers) == ("granite3.2-vision", "Extract text to markdown!", 2)
+    assert settings.client == {"rate_limit": 2}
+    assert settings.images == {"scale": 1.5}
+    assert settings.sink("out") is None
+
+    settings = RunSettings.from_config({"name": "qwen-vl-max-latest", "provider": "dashscope", "max_concurrency": 8}, max_workers=0)
+    assert settings.max_workers == 1
+    assert RunSettings.from_config({"name": "x", "provider": "dashscope", "max_concurrency": 8}).max_workers == 8
+
+
+def test_run_settings_reject_unknown_output_format():
+    with pytest.raises(ValueError):
+        RunSettings.from_config({"name": "x", "provider": "ollama"}, output_format="csv")
+
+
+SETTINGS = {"name": "granite3.2-vision", "provider": "ollama", "prompt": "Extract text to markdown."}
+
+
+def make_scans(folder, n):
+    folder.mkdir()
+    for i in range(n):
+        (folder / f"scan_{i}.png").write_bytes(b"scan %d" % i)
+    return folder
+
+
+class Converter:
+    """
+    Stands in for convert_and_save: writes the markdown right away, or through `writer`.
+    """
+
+    def __init__(self, output_folder, writer=None, before=None):
+        self.output_folder = output_folder
+        self.writer = writer
+        self.before = before
+        self.converted = []
+        self._lock = threading.Lock()
+
+    def __call__(self, file_path, input_dir, source_hash=None):
+        with self._lock:
+            self.converted.append(file_path.name)
+        if self.before is not None:
+            self.before(file_path)
+        output_path = output_path_for(file_path, input_dir, self.output_folder)
+        if self.writer is not None:
+            write = self.writer.submit(output_path, f"# {file_path.name}", source=file_path)
+            return FileRecord(path=file_path, status="done", output_path=output_path, write=write)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(f"# {file_path.name}")
+        return FileRecord(path=file_path, status="done", output_path=output_path)
+
+
+def test_manifest_skips_converted_files(tmp_path):
+    scans = make_scans(tmp_path / "scans", 3)
+    output = tmp_path / "markdown"
+    settings = RunSettings.from_config(SETTINGS, max_workers=2)
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+
+    first = Converter(output)
+    summary = run_batch([scans], {"png"}, first, settings, output, manifest=manifest)
+    assert (summary.done, summary.skipped) == (3, 0)
+
+    second = Converter(output)
+    summary = run_batch([scans], {"png"}, second, settings, output, manifest=manifest)
+    assert (summary.done, summary.skipped) == (0, 3)
+    assert second.converted == []
+
+    # a changed file is converted again
+    (scans / "scan_1.png").write_bytes(b"rescanned")
+    third = Converter(output)
+    summary = run_batch([scans], {"png"}, third, settings, output, manifest=manifest)
+    assert third.converted == ["scan_1.png"]
+
+
+def test_failed_writes_are_not_marked_done(tmp_path):
+    scans = make_scans(tmp_path / "scans", 2)
+    output = tmp_path / "markdown"
+    # the output path of scan_0 is taken by a folder
+    (output / "scan_0.md").mkdir(parents=True)
+    settings = RunSettings.from_config(SETTINGS, max_workers=2)
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+    writer = OutputWriter()
+
+    summary = run_batch([scans], {"png"}, Converter(output, writer), settings, output, manifest=manifest, writer=writer)
+    assert (summary.done, summary.failed) == (1, 1)
+    assert not manifest.is_done(scans / "scan_0.png", "ollama", "granite3.2-vision", "Extract text to markdown.", output / "scan_0.md")
+    assert manifest.is_done(scans / "scan_1.png", "ollama", "granite3.2-vision", "Extract text to markdown.", output / "scan_1.md")
+
+
+def test_failed_conversions_are_recorded(tmp_path):
+    scans = make_scans(tmp_path / "scans", 2)
+    output = tmp_path / "markdown"
+    settings = RunSettings.from_config(SETTINGS, max_workers=1)
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+
+    def bad_scan(file_path):
+        if file_path.name == "scan_0.png":
+            raise ValueError("bad scan")
+
+    summary = run_batch([scans], {"png"}, Converter(output, before=bad_scan), settings, output, manifest=manifest)
+    assert (summary.done, summary.failed) == (1, 1)
+    assert manifest.stats()["failed"] == 1
+
+
+class InterruptedBudget(MemoryBudget):
+    """
+    Raises KeyboardInterrupt in discovery while the first file converts.
+    """
+
+    def __init__(self):
+        super().__init__(1 << 40, rss=lambda: 0)
+        self.interrupted = threading.Event()
+
+    def acquire(self, n, cancel_event=None):
+        if self.in_flight:
+            self.interrupted.set()
+            raise KeyboardInterrupt
+        return super().acquire(n, cancel_event)
+
+
+def test_files_finishing_during_an_interrupt_are_recorded(tmp_path):
+    scans = make_scans(tmp_path / "scans", 3)
+    output = tmp_path / "markdown"
+    settings = RunSettings.from_config(SETTINGS, max_workers=2)
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+    budget = InterruptedBudget()
+    cancel_event = threading.Event()
+    writer = OutputWriter()
+    converter = Converter(output, writer, before=lambda file_path: budget.interrupted.wait(5))
+
+    with pytest.raises(KeyboardInterrupt):
+        run_batch([scans], {"png"}, converter, settings, output, cancel_event=cancel_event, manifest=manifest, writer=writer, budget=budget)
+    assert cancel_event.is_set()
+    # the file in flight finished and was recorded; the others never started
+    [name] = converter.converted
+    assert manifest.is_done(scans / name, "ollama", "granite3.2-vision", "Extract text to markdown.", output_path_for(scans / name, scans, output))
+    assert budget.in_flight == 0
+
+
+def test_cancel_while_waiting_for_memory(tmp_path):
+    scans = make_scans(tmp_path / "scans", 3)
+    output = tmp_path / "markdown"
+    # room for one page-sized document at a time
+    settings = RunSettings.from_config(dict(SETTINGS, memory_per_page_mb=64), max_workers=2)
+    budget = MemoryBudget(100 * MB, poll_interval=0.01, rss=lambda: 0)
+    cancel_event = threading.Event()
+
+    def cancel(file_path):
+        cancel_event.set()
+        # still holding its reservation while discovery waits
+        time.sleep(0.2)
+
+    converter = Converter(output, before=cancel)
+    summary = run_batch([scans], {"png"}, converter, settings, output, cancel_event=cancel_event, budget=budget)
+    assert summary.cancelled
+    assert len(converter.converted) == 1
+    assert (summary.total, summary.done) == (3, 1)
+    assert budget.in_flight == 0
+
+
+def test_skipped_files_are_added_to_the_parquet_dataset(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    scans = make_scans(tmp_path / "scans", 2)
+    output = tmp_path / "markdown"
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+    run_batch([scans], {"png"}, Converter(output), RunSettings.from_config(SETTINGS), output, manifest=manifest)
+
+    # Parquet output turned on for a corpus converted before
+    settings = RunSettings.from_config(SETTINGS, output_format="parquet")
+    for _ in range(2):
+        summary = run_batch([scans], {"png"}, Converter(output), settings, output, manifest=manifest, sink=settings.sink(output))
+        assert summary.skipped == 2
+
+    # the second run found the rows already there
+    table = ds.dataset(output / "parquet", partitioning="hive").to_table()
+    assert sorted(table.column("text").to_pylist()) == ["# scan_0.png", "# scan_1.png"]
+    assert set(table.column("source").to_pylist()) == {str(scans / "scan_0.png"), str(scans / "scan_1.png")}
+    assert set(table.column("model").to_pylist()) == {"granite3.2-vision"}
@@ -0,0 +1,56 @@
+from fichero.cache import LRUCache, PageCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_cache_get_or_create_counts_hits_and_misses():
+    cache = LRUCache(maxsize=4)
+    built = []
+
+    def factory():
+        built.append(1)
+        return object()
+
+    first = cache.get_or_create(("ollama", "granite"), factory)
+    second = cache.get_or_create(("ollama", "granite"), factory)
+    assert first is second
+    assert len(built) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_page_cache_round_trip_and_persistence(tmp_path):
+    cache = PageCache(tmp_path / "pages.sqlite3")
+    key = PageCache.make_key("abc123", "http://localhost:11434", {"model": "granite"}, "Extract")
+    assert cache.get(key) is None
+    cache.put(key, "# Page one")
+    assert cache.get(key) == "# Page one"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    cache.close()
+
+    reopened = PageCache(tmp_path / "pages.sqlite3")
+    assert reopened.get(key) == "# Page one"
+    assert PageCache.make_key("abc123", "http://localhost:11434", {"model": "granite"}, "Other") != key
+
+
+def test_page_cache_evicts_least_recently_used_over_budget(tmp_path):
+    cache = PageCache(tmp_path / "pages.sqlite3", max_bytes=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    assert cache.get("a") == "12345"
+    cache.put("c", "12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 10
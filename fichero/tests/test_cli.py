@@ -0,0 +1,39 @@
+import pytest
+
+from fichero.cli import build_parser, resolve_model_config
+
+MODELS = [
+    {"name": "qwen-vl-max-latest", "provider": "dashscope", "api_key": "DASHSCOPE_API_KEY"},
+    {"name": "granite3.2-vision", "provider": "ollama", "api_key": "OLLAMA_NEEDS_NO_KEY"},
+]
+
+
+def test_convert_arguments():
+    args = build_parser().parse_args(
+        ["convert", "scans", "more_scans", "--model", "granite3.2-vision", "--workers", "3"]
+    )
+    assert args.folders == ["scans", "more_scans"]
+    assert args.model == ["granite3.2-vision"]
+    assert args.workers == 3
+    assert not args.no_manifest
+    assert args.output_format == "markdown"
+
+
+def test_convert_accepts_several_models():
+    args = build_parser().parse_args(
+        ["convert", "scans", "--model", "granite3.2-vision", "--model", "qwen-vl-max-latest"]
+    )
+    assert args.model == ["granite3.2-vision", "qwen-vl-max-latest"]
+
+
+def test_resolve_model_config_reads_key_from_environment(monkeypatch):
+    monkeypatch.setenv("DASHSCOPE_API_KEY", "sk-test")
+    config = resolve_model_config(MODELS, "qwen-vl-max-latest")
+    assert config["api_key"] == "sk-test"
+    assert MODELS[0]["api_key"] == "DASHSCOPE_API_KEY"
+    assert resolve_model_config(MODELS, "qwen-vl-max-latest", api_key="sk-cli")["api_key"] == "sk-cli"
+
+
+def test_resolve_model_config_unknown_model():
+    with pytest.raises(SystemExit):
+        resolve_model_config(MODELS, "llava")
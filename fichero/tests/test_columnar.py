@@ -0,0 +1,67 @@
+import pytest
+
+from fichero.columnar import page_records
+
+
+def test_page_records_one_row_per_page():
+    rows = page_records({2: "two", 1: "one"}, source="scans/box1/letter.pdf", folder="box1", model="granite3.2-vision")
+    assert [row["page"] for row in rows] == [1, 2]
+    assert rows[0]["file"] == "letter.pdf"
+    assert rows[0]["pages"] == 2
+    assert rows[0]["text_hash"] != rows[1]["text_hash"]
+    assert rows[0]["converted_at"] == rows[1]["converted_at"]
+
+
+def test_sink_writes_partitioned_row_groups(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    from fichero.columnar import ParquetSink
+
+    with ParquetSink(tmp_path / "parquet", row_group_size=2) as sink:
+        for i in range(5):
+            sink.add(page_records({1: f"page {i}"}, source=f"doc{i}.pdf", model="a"))
+        sink.add(page_records({1: "other", 2: "model"}, source="doc.pdf", model="b"))
+        # nothing is published until the sink is closed
+        assert not list((tmp_path / "parquet").rglob("*.parquet"))
+
+    parts = sorted((tmp_path / "parquet").rglob("*.parquet"))
+    assert [part.parent.name for part in parts] == ["model=a", "model=b"]
+    assert pq.ParquetFile(parts[0]).num_row_groups == 3
+    assert not list((tmp_path / "parquet").rglob("*.tmp"))
+
+    table = ds.dataset(tmp_path / "parquet", partitioning="hive").to_table(filter=ds.field("model") == "b")
+    assert sorted(table.column("text").to_pylist()) == ["model", "other"]
+    assert sink.stats()["rows"] == 7
+
+
+def test_export_folder(tmp_path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.dataset as ds
+
+    from fichero.columnar import export_folder
+
+    (tmp_path / "box1").mkdir()
+    (tmp_path / "box1" / "letter.md").write_text("one\n\n<!-- page break -->\n\ntwo")
+    stats = export_folder(tmp_path, model="granite3.2-vision")
+    assert stats["files"] == 1 and stats["rows"] == 2
+
+    table = ds.dataset(tmp_path / "parquet", partitioning="hive").to_table()
+    assert table.column("page").to_pylist() == [1, 2]
+    assert table.column("folder").to_pylist() == ["box1", "box1"]
+
+
+def test_sink_knows_earlier_rows(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    from fichero.columnar import ParquetSink
+
+    with ParquetSink(tmp_path / "parquet") as sink:
+        assert not sink.known("letter.pdf", "abc", "a")
+        sink.add(page_records({1: "one"}, source="letter.pdf", source_hash="abc", model="a"))
+
+    sink = ParquetSink(tmp_path / "parquet")
+    assert sink.known("letter.pdf", "abc", "a")
+    assert not sink.known("letter.pdf", "changed", "a")
+    assert not sink.known("letter.pdf", "abc", "b")
@@ -0,0 +1,37 @@
+import pytest
+
+from fichero.discovery import count_files, iter_files
+
+
+def make_tree(root):
+    files = [
+        "a/scan1.pdf",
+        "a/scan2.PNG",
+        "a/notes.txt",
+        "a/b/scan3.jpg",
+        "a/.hidden/scan4.pdf",
+        "a/__pycache__/scan5.pdf",
+        "a/~$draft.docx",
+        "a/partial.pdf.part",
+        "c/scan6.tiff",
+    ]
+    for name in files:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+
+
+def test_iter_files_walks_every_folder_and_skips_noise(tmp_path):
+    make_tree(tmp_path)
+    extensions = {"pdf", "png", "jpg", ".tiff", "docx"}
+    items = list(iter_files([tmp_path / "a", tmp_path / "c"], extensions))
+    found = sorted(str(i.path.relative_to(tmp_path)) for i in items)
+    assert found == ["a/b/scan3.jpg", "a/scan1.pdf", "a/scan2.PNG", "c/scan6.tiff"]
+    assert {i.input_dir for i in items} == {tmp_path / "a", tmp_path / "c"}
+    assert all(i.size == 1 for i in items)
+    assert count_files([tmp_path / "a", tmp_path / "c"], extensions) == 4
+
+
+def test_iter_files_rejects_missing_folder(tmp_path):
+    with pytest.raises(ValueError):
+        list(iter_files([tmp_path / "missing"], {"pdf"}))
@@ -0,0 +1,39 @@
+import pytest
+
+from fichero.embeddings import EmbeddingService
+
+SMALL_MODEL = "sentence-transformers/paraphrase-MiniLM-L3-v2"
+
+
+def small_model():
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    try:
+        return sentence_transformers.SentenceTransformer(SMALL_MODEL)
+    except OSError:
+        pytest.skip(f"{SMALL_MODEL} is not available")
+
+
+def test_split_text_matches_langchain_splitter():
+    splitters = pytest.importorskip("langchain_text_splitters")
+    model = small_model()
+    service = EmbeddingService(SMALL_MODEL)
+    service._model = model
+    text = "\n\n".join(f"Folio {n}. Carta de la hacienda sobre la cosecha de caña y el pago de los jornaleros." for n in range(60))
+
+    expected = splitters.SentenceTransformersTokenTextSplitter(model_name=SMALL_MODEL, chunk_overlap=5).split_text(text)
+    assert len(expected) > 1
+    assert service.split_text(text) == expected
+
+
+def test_chroma_embedding_function_reuses_the_model(monkeypatch):
+    pytest.importorskip("sentence_transformers")
+    embedding_functions = pytest.importorskip("chromadb.utils.embedding_functions")
+    ef_class = embedding_functions.SentenceTransformerEmbeddingFunction
+    monkeypatch.setattr(ef_class, "models", {})
+    service = EmbeddingService("fichero-test-model")
+    # a stand-in for the loaded model; chroma would try to download a real one
+    service._model = object()
+
+    ef = service.chroma_embedding_function()
+    assert ef_class.models["fichero-test-model"] is service._model
+    assert ef._model is service._model
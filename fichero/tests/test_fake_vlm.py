@@ -0,0 +1,19 @@
+import json
+import urllib.request
+
+from benchmarks.fake_vlm import FakeVlmServer
+
+
+def test_fake_vlm_answers_like_an_openai_endpoint():
+    with FakeVlmServer(latency=0) as server:
+        request = urllib.request.Request(
+            server.url + "/v1/chat/completions",
+            data=json.dumps({"model": "granite3.2-vision", "messages": []}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            body = json.loads(response.read())
+    assert body["model"] == "granite3.2-vision"
+    assert body["choices"][0]["message"]["content"].startswith("# Page")
+    assert server.requests == 1
+
@@ -0,0 +1,30 @@
+from fichero.fanout import ModelStats, model_folder_name, percentile
+
+
+def test_model_folder_name():
+    assert model_folder_name("qwen/qwen2.5-vl:7b") == "qwen_qwen2.5-vl_7b"
+    assert model_folder_name("gpt-4o") == "gpt-4o"
+
+
+def test_model_stats_report_latency_and_cost():
+    stats = ModelStats("gpt-4o", cost_per_page=0.01, cost_per_1k_input_tokens=0.5, cost_per_1k_output_tokens=1.0)
+    stats.add(1.0, {"bytes": 1000, "usage": {"prompt_tokens": 1000, "completion_tokens": 500}})
+    stats.add(3.0, {"bytes": 2000, "usage": {"prompt_tokens": 1000, "completion_tokens": 500}})
+    # a cached page is neither sent nor billed
+    stats.add(0.0, {"cached": True})
+    stats.add(2.0, {}, error=RuntimeError("timeout"))
+
+    report = stats.report()
+    assert report["pages"] == 4
+    assert report["requests"] == 2
+    assert report["errors"] == 1
+    assert report["bytes_sent"] == 3000
+    assert report["latency_mean"] == 1.5
+    assert report["cost"] == round(2 * 0.01 + 2 * 0.5 + 1.0, 4)
+
+
+def test_percentile():
+    values = [0.1 * i for i in range(1, 21)]
+    assert percentile(values, 50) == values[10]
+    assert percentile(values, 95) == values[18]
+    assert percentile([], 95) == 0.0
@@ -0,0 +1,52 @@
+import base64
+from io import BytesIO
+
+import pytest
+
+from fichero.imaging import encode_image, image_settings, is_blank, page_scale
+
+
+def test_page_scale_caps_longest_side():
+    # an A4 page at 2x would be 1684 px tall
+    assert page_scale(595, 842, scale=2.0, max_image_side=1000) == pytest.approx(1000 / 842)
+    assert page_scale(595, 842, scale=1.0, max_image_side=1000) == 1.0
+    assert page_scale(595, 842, scale=2.0) == 2.0
+
+
+def test_image_settings_rejects_unknown_format():
+    assert image_settings({"name": "m", "image_format": "webp", "grayscale": True}) == {"image_format": "webp", "grayscale": True}
+    with pytest.raises(ValueError):
+        image_settings({"image_format": "tiff"})
+
+
+def test_blank_pages_and_compression():
+    Image = pytest.importorskip("PIL.Image")
+    ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+    blank = Image.new("RGB", (600, 800), "white")
+    assert is_blank(blank)
+
+    page = blank.copy()
+    draw = ImageDraw.Draw(page)
+    for y in range(50, 750, 20):
+        draw.rectangle((50, y, 550, y + 8), fill="black")
+    assert not is_blank(page)
+
+    negative = Image.new("RGB", (600, 800), "black")
+    assert is_blank(negative)
+    draw = ImageDraw.Draw(negative)
+    for y in range(50, 750, 20):
+        draw.rectangle((50, y, 550, y + 8), fill="white")
+    assert not is_blank(negative)
+
+    mime, png = encode_image(page)
+    assert mime == "image/png"
+    mime, jpeg = encode_image(page, "jpeg", quality=50, grayscale=True)
+    assert mime == "image/jpeg"
+    assert Image.open(BytesIO(base64.b64decode(jpeg))).mode == "L"
+
+
+def test_pdfium_lock_is_shared():
+    from fichero.imaging import pdfium_lock
+
+    assert pdfium_lock() is pdfium_lock()
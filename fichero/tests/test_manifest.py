@@ -0,0 +1,48 @@
+from fichero.manifest import Manifest
+
+
+def test_manifest_skips_unchanged_converted_files(tmp_path):
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"page one")
+    output = tmp_path / "out" / "scan.md"
+
+    assert not manifest.is_done(source, "ollama", "granite", "Extract", output)
+    output.parent.mkdir()
+    output.write_text("# scan")
+    manifest.mark_done(source, "ollama", "granite", "Extract", output)
+
+    assert manifest.is_done(source, "ollama", "granite", "Extract", output)
+    # a different prompt or model needs a fresh conversion
+    assert not manifest.is_done(source, "ollama", "granite", "Other prompt", output)
+    assert not manifest.is_done(source, "ollama", "llava", "Extract", output)
+
+
+def test_manifest_reconverts_changed_or_missing_outputs(tmp_path):
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"page one")
+    output = tmp_path / "scan.md"
+    output.write_text("# scan")
+    manifest.mark_done(source, "ollama", "granite", "Extract", output)
+
+    source.write_bytes(b"page one, rescanned")
+    assert not manifest.is_done(source, "ollama", "granite", "Extract", output)
+
+    manifest.mark_done(source, "ollama", "granite", "Extract", output)
+    output.unlink()
+    assert not manifest.is_done(source, "ollama", "granite", "Extract", output)
+
+
+def test_manifest_persists_between_runs(tmp_path):
+    source = tmp_path / "scan.pdf"
+    source.write_bytes(b"page one")
+    output = tmp_path / "scan.md"
+    output.write_text("# scan")
+    manifest = Manifest(tmp_path / "manifest.sqlite3")
+    manifest.mark_done(source, "ollama", "granite", "Extract", output)
+    manifest.close()
+
+    reopened = Manifest(tmp_path / "manifest.sqlite3")
+    assert reopened.is_done(source, "ollama", "granite", "Extract", output)
+    assert reopened.stats() == {"done": 1}
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from fichero.memory import MB, MemoryBudget, MemoryMonitor, current_rss, estimate_footprint, memory_settings
+from fichero.progress import RunSummary
+
+
+def test_memory_settings_and_footprint():
+    assert memory_settings({"name": "x", "memory_budget_mb": 4096, "memory_per_page_mb": None}) == {"memory_budget_mb": 4096}
+    # a 200-page PDF holds one batch of pages at a time
+    assert estimate_footprint(10 * MB, pages=200, memory_per_page_mb=50) == 40 * MB + 4 * 50 * MB
+    assert estimate_footprint(MB, pages=None, memory_per_page_mb=50) == 4 * MB + 50 * MB
+
+
+def test_budget_waits_for_room():
+    budget = MemoryBudget(1000, poll_interval=0.01, rss=lambda: 100)
+    assert budget.acquire(600)
+    admitted = threading.Event()
+
+    def second():
+        budget.acquire(600)
+        admitted.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not admitted.wait(0.1)
+    budget.release(600)
+    assert admitted.wait(1)
+    thread.join()
+    assert budget.stats()["waits"] == 1
+
+
+def test_budget_admits_one_oversized_document_alone():
+    budget = MemoryBudget(1000, poll_interval=0.01, rss=lambda: 100)
+    assert budget.acquire(5000)
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert not budget.acquire(10, cancel_event)
+    budget.release(5000)
+    assert budget.acquire(10, cancel_event)
+
+
+def test_budget_respects_measured_rss():
+    rss = [100]
+    budget = MemoryBudget(1000, poll_interval=0.01, rss=lambda: rss[0])
+    assert budget.acquire(100)
+    # the document in flight grew well past its estimate
+    rss[0] = 950
+    cancel_event = threading.Event()
+    threading.Timer(0.1, cancel_event.set).start()
+    assert not budget.acquire(100, cancel_event)
+
+
+def test_monitor_keeps_peak():
+    samples = iter([100, 300, 200])
+    with MemoryMonitor(interval=0.01, rss=lambda: next(samples, 200)) as monitor:
+        time.sleep(0.05)
+    assert monitor.peak == 300
+    assert current_rss() is None or current_rss() > 0
+
+
+def test_summary_reports_peak_memory():
+    assert "Peak memory 512 MB" in str(RunSummary(total=0, peak_memory=512 * MB))
+    assert "Peak memory" not in str(RunSummary(total=0))
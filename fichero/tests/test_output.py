@@ -0,0 +1,83 @@
+import os
+import stat
+from types import SimpleNamespace
+
+import pytest
+
+from fichero.output import UMASK, OutputWriter, atomic_write_text, document_markdown, merged_page_markdown, split_pages
+
+
+def test_split_pages():
+    assert split_pages("one\n\n<!-- page break -->\n\ntwo") == ["one", "two"]
+
+
+def test_atomic_write_replaces_without_leftovers(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("old")
+    assert atomic_write_text(path, "new ✓") == len("new ✓".encode("utf-8"))
+    assert path.read_text(encoding="utf-8") == "new ✓"
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.md"]
+
+
+def test_atomic_write_keeps_file_mode(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("old")
+    os.chmod(path, 0o644)
+    atomic_write_text(path, "new")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+    new_path = tmp_path / "new.md"
+    atomic_write_text(new_path, "new")
+    assert stat.S_IMODE(os.stat(new_path).st_mode) == 0o666 & ~UMASK
+
+
+def test_atomic_write_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / "doc.md"
+    path.write_text("old")
+    with pytest.raises(UnicodeEncodeError):
+        atomic_write_text(path, "new ✓", encoding="ascii")
+    assert path.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.md"]
+
+
+def test_output_writer_writes_in_background(tmp_path):
+    with OutputWriter(max_pending=2) as writer:
+        futures = [writer.submit(tmp_path / "out" / f"{i}.md", f"page {i}") for i in range(5)]
+        assert futures[0].result() == tmp_path / "out" / "0.md"
+    assert all(future.done() for future in futures)
+    assert (tmp_path / "out" / "4.md").read_text() == "page 4"
+    assert writer.stats()["files"] == 5
+
+
+def test_output_writer_reports_errors(tmp_path):
+    (tmp_path / "doc.md").mkdir()
+    with OutputWriter() as writer:
+        future = writer.submit(tmp_path / "doc.md", "text")
+    with pytest.raises(IsADirectoryError):
+        future.result()
+
+
+def vlm_result(*texts):
+    # a ConversionResult from the VLM pipeline, as far as page_markdown reads it
+    pages = [
+        SimpleNamespace(page_no=page_no, predictions=SimpleNamespace(vlm_response=SimpleNamespace(text=text)))
+        for page_no, text in texts
+    ]
+    return SimpleNamespace(pages=pages, document=None)
+
+
+def test_vlm_pages_are_separated_by_page_breaks():
+    markdown = document_markdown([vlm_result((0, "first page"), (1, "second page"))])
+    assert split_pages(markdown) == ["first page", "second page"]
+
+
+def test_later_results_replace_pages():
+    pages = merged_page_markdown([vlm_result((0, "one"), (1, "bad")), vlm_result((1, "two"))])
+    assert pages == {1: "one", 2: "two"}
+
+
+def test_results_without_pages_export_the_whole_document():
+    # docling's SimplePipeline (DOCX, HTML, spreadsheets, ...) produces no pages
+    docx = SimpleNamespace(pages=[], document=SimpleNamespace(export_to_markdown=lambda: "# Memo\n\nBody"))
+    assert merged_page_markdown([docx]) == {1: "# Memo\n\nBody"}
+    assert document_markdown([docx]) == "# Memo\n\nBody"
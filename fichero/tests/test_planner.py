@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from fichero.planner import latency_history, page_count, plan_folders, scan_folders
+
+
+def write_history(path, entries):
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries))
+
+
+def test_latency_history_uses_requests_for_the_model(tmp_path):
+    log_path = tmp_path / "timings.jsonl"
+    write_history(tmp_path / "timings.jsonl.1", [
+        {"stage": "vlm", "model": "granite3.2-vision", "seconds": 4.0, "usage": {"prompt_tokens": 1000, "completion_tokens": 300}},
+    ])
+    write_history(log_path, [
+        {"stage": "render", "seconds": 0.5},
+        {"stage": "vlm", "model": "granite3.2-vision", "seconds": 2.0, "usage": {"prompt_tokens": 600, "completion_tokens": 100}},
+        {"stage": "vlm", "model": "granite3.2-vision", "seconds": 0.0, "cached": True},
+        {"stage": "vlm", "model": "granite3.2-vision", "seconds": 30.0, "error": "timeout"},
+        {"stage": "vlm", "model": "qwen-vl-max-latest", "seconds": 9.0},
+    ])
+    history = latency_history(log_path, "granite3.2-vision")
+    assert history["pages"] == 2
+    assert history["vlm_seconds"] == 3.0
+    assert history["render_seconds"] == 0.5
+    assert history["input_tokens"] == 800
+    assert latency_history(log_path, "llava")["vlm_seconds"] is None
+
+
+def test_scan_counts_per_folder_and_extension(tmp_path):
+    (tmp_path / "box1").mkdir()
+    (tmp_path / "box1" / "a.png").write_bytes(b"x" * 10)
+    (tmp_path / "box1" / "b.png").write_bytes(b"x" * 10)
+    (tmp_path / "letter.docx").write_bytes(b"x" * 5)
+    assert page_count(tmp_path / "letter.docx") is None
+
+    plan = scan_folders([tmp_path], {"png", "docx"})
+    assert (plan.total.files, plan.total.pages, plan.total.bytes, plan.total.estimated) == (3, 3, 25, 1)
+    assert sorted(plan.rows()) == [
+        (str(tmp_path), "docx", 1, 1, 0.0),
+        (str(tmp_path / "box1"), "png", 2, 2, 0.0),
+    ]
+
+
+def test_plan_estimates_time_and_cost(tmp_path):
+    scans = tmp_path / "scans"
+    scans.mkdir()
+    for i in range(8):
+        (scans / f"{i}.png").write_bytes(b"x")
+    log_path = tmp_path / "timings.jsonl"
+    write_history(log_path, [{"stage": "vlm", "model": "qwen-vl-max-latest", "seconds": 3.0, "usage": {"prompt_tokens": 1000, "completion_tokens": 500}}])
+
+    model_config = {"name": "qwen-vl-max-latest", "cost_per_1k_input_tokens": 0.01, "cost_per_1k_output_tokens": 0.02}
+    plan = plan_folders([scans], model_config, {"png"}, concurrency=4, log_path=log_path)
+    assert plan.seconds == 6.0
+    assert plan.cost == pytest.approx(8 * (0.01 + 0.01))
+
+    plan.estimate({"name": "granite3.2-vision"}, log_path=log_path)
+    assert plan.seconds is None and "No timing history" in str(plan)
+
+
+def test_pdf_page_count_from_metadata(tmp_path):
+    pdfium = pytest.importorskip("pypdfium2")
+    pdf = pdfium.PdfDocument.new()
+    for _ in range(3):
+        pdf.new_page(612, 792)
+    pdf.save(str(tmp_path / "doc.pdf"))
+    pdf.close()
+    assert page_count(tmp_path / "doc.pdf") == 3
@@ -0,0 +1,29 @@
+from fichero.progress import FileRecord, ProgressTracker, RunSummary
+
+
+def test_progress_tracker_reports_rate_eta_and_errors():
+    now = [0.0]
+    events = []
+    tracker = ProgressTracker(4, callback=events.append, clock=lambda: now[0])
+    tracker.start()
+    now[0] = 2.0
+    tracker.update("a.pdf")
+    now[0] = 4.0
+    progress = tracker.update("b.pdf", error=RuntimeError("timeout"))
+
+    assert len(events) == 3
+    assert progress.done == 2
+    assert progress.failed == 1
+    assert progress.files_per_sec == 0.5
+    assert progress.eta == 4.0
+    assert progress.last_error == "b.pdf: timeout"
+    assert "2/4 files" in str(progress)
+
+
+def test_run_summary_counts_records_by_status():
+    summary = RunSummary(total=3, seconds=61)
+    summary.records.append(FileRecord(path="a.pdf", status="done", pages=2))
+    summary.records.append(FileRecord(path="b.pdf", status="skipped"))
+    summary.records.append(FileRecord(path="c.pdf", status="failed", error="timeout"))
+    assert (summary.done, summary.skipped, summary.failed) == (1, 1, 1)
+    assert str(summary) == "Processed 1 of 3 files, 1 skipped, 1 failed in 0:01:01."
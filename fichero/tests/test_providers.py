@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from benchmarks.fake_vlm import FakeVlmServer
+
+requests = pytest.importorskip("requests")
+
+from fichero.providers import ProviderClient, get_provider_client  # noqa: E402
+
+PAYLOAD = {"model": "granite3.2-vision", "messages": []}
+
+
+def test_post_retries_throttled_and_failed_requests():
+    with FakeVlmServer(latency=0, statuses=[429, 503, 500]) as server:
+        client = ProviderClient("fake", retries=3, backoff=0.01)
+        response = client.post(server.url + "/v1/chat/completions", PAYLOAD)
+    assert response["choices"][0]["message"]["content"].startswith("# Page")
+    assert server.requests == 4
+    stats = client.stats()
+    assert (stats["requests"], stats["retried"], stats["throttled"], stats["errors"]) == (4, 3, 2, 0)
+
+
+def test_post_honours_retry_after():
+    with FakeVlmServer(latency=0, statuses=[429], retry_after=0.3) as server:
+        client = ProviderClient("fake", retries=1, backoff=0.001)
+        started = time.monotonic()
+        client.post(server.url + "/v1/chat/completions", PAYLOAD)
+    assert time.monotonic() - started >= 0.3
+
+
+def test_post_gives_up_after_retries():
+    with FakeVlmServer(latency=0, statuses=[500, 500, 500]) as server:
+        client = ProviderClient("fake", retries=2, backoff=0.001)
+        with pytest.raises(requests.HTTPError):
+            client.post(server.url + "/v1/chat/completions", PAYLOAD)
+    assert server.requests == 3
+    assert client.stats()["errors"] == 1
+
+
+def test_client_errors_are_not_retried_but_counted():
+    with FakeVlmServer(latency=0, statuses=[400]) as server:
+        client = ProviderClient("fake", retries=3, backoff=0.001)
+        with pytest.raises(requests.HTTPError):
+            client.post(server.url + "/v1/chat/completions", PAYLOAD)
+    assert server.requests == 1
+    assert client.stats()["errors"] == 1
+
+
+def test_clients_are_shared_per_settings():
+    first = get_provider_client("ollama", "granite3.2-vision", {"rate_limit": 2})
+    assert get_provider_client("ollama", "granite3.2-vision", {"rate_limit": 2}) is first
+    edited = get_provider_client("ollama", "granite3.2-vision", {"rate_limit": 5})
+    assert edited is not first
+    assert edited.bucket.rate == 5
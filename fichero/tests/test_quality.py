@@ -0,0 +1,31 @@
+from fichero.quality import is_hard_page, text_quality, tier_settings
+
+
+CLEAN = (
+    "The committee met on 12 March 1931 to discuss the new reading room. "
+    "Members agreed that the catalogue should be typed and bound by June."
+)
+
+
+def test_clean_text_scores_high():
+    assert text_quality(CLEAN) > 0.9
+    assert text_quality("## Minutes\n\n- item one\n- item two, with 3.5% growth") > 0.9
+
+
+def test_garbled_text_scores_low():
+    assert text_quality("(cid:12)(cid:45) (cid:3)(cid:77) ﬁ§§ ¶¶¶ ~~~ ^^^") < 0.3
+    assert text_quality("") == 0.0
+
+
+def test_hard_pages():
+    assert not is_hard_page(CLEAN, page_score=0.95)
+    # too little text, e.g. a scan without OCR
+    assert is_hard_page("  12 ")
+    # docling was not confident about the page
+    assert is_hard_page(CLEAN, page_score=0.4)
+    # an unknown score falls back to the text check
+    assert not is_hard_page(CLEAN, page_score=float("nan"))
+
+
+def test_tier_settings():
+    assert tier_settings({"name": "m", "tiered": True, "min_page_chars": 50}) == {"tiered": True, "min_page_chars": 50}
@@ -0,0 +1,39 @@
+import time
+from types import SimpleNamespace
+
+from fichero.output import document_markdown, split_pages
+from fichero.ranges import contiguous_ranges, convert_in_ranges, page_ranges
+
+
+def test_page_ranges():
+    # the last chunk is partial
+    assert page_ranges(70, 32) == [(1, 32), (33, 64), (65, 70)]
+    assert page_ranges(64, 32) == [(1, 32), (33, 64)]
+    # a chunk larger than the document, and a one-page PDF
+    assert page_ranges(10, 32) == [(1, 10)]
+    assert page_ranges(1, 32) == [(1, 1)]
+    assert page_ranges(0, 32) == []
+
+
+def test_contiguous_ranges():
+    assert contiguous_ranges([1, 2, 5]) == [(1, 2), (5, 5)]
+    assert contiguous_ranges([3]) == [(3, 3)]
+    assert contiguous_ranges([]) == []
+
+
+def test_ranges_merge_in_page_order():
+    ranges = page_ranges(7, 2)
+
+    def convert(page_range):
+        start, end = page_range
+        # earlier ranges finish last
+        time.sleep(0.02 * (len(ranges) - start // 2))
+        pages = [
+            SimpleNamespace(page_no=page_no - 1, predictions=SimpleNamespace(vlm_response=SimpleNamespace(text=f"page {page_no}")))
+            for page_no in range(start, end + 1)
+        ]
+        return SimpleNamespace(pages=pages, document=None)
+
+    results = convert_in_ranges(convert, ranges, parallelism=4)
+    assert [result.pages[0].page_no + 1 for result in results] == [start for start, _ in ranges]
+    assert split_pages(document_markdown(results)) == [f"page {n}" for n in range(1, 8)]
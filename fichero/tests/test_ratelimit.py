@@ -0,0 +1,42 @@
+from fichero.ratelimit import AdaptiveLimiter, TokenBucket, backoff_delay
+
+
+def test_token_bucket_waits_once_burst_is_spent():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0], sleep=sleep)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.5
+    assert sleeps == [0.5]
+
+
+def test_token_bucket_without_rate_never_waits():
+    bucket = TokenBucket(rate=None)
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
+
+
+def test_adaptive_limiter_halves_on_throttle_and_recovers():
+    limiter = AdaptiveLimiter(max_limit=8, min_limit=1)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 2
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 3
+    assert limiter.in_flight == 0
+
+
+def test_backoff_delay_respects_cap_and_retry_after():
+    for attempt in range(1, 10):
+        assert 0 <= backoff_delay(attempt, base=1.0, cap=8.0) <= 8.0
+    assert backoff_delay(1, base=0.1, cap=60, retry_after=5) >= 5
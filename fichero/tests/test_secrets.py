@@ -0,0 +1,31 @@
+import pytest
+
+srsly = pytest.importorskip("srsly")
+
+from fichero.secrets import load_models_config, save_models_config  # noqa: E402
+
+
+def test_models_config_is_cached_until_the_file_changes(tmp_path):
+    defaults = tmp_path / "defaults.jsonl"
+    srsly.write_jsonl(defaults, [{"name": "granite3.2-vision", "provider": "ollama"}])
+    data_dir = tmp_path / "data"
+
+    config = load_models_config(data_dir, defaults)
+    assert config == [{"name": "granite3.2-vision", "provider": "ollama"}]
+    # callers get copies, so editing one does not touch the cache
+    config[0]["name"] = "edited"
+    assert load_models_config(data_dir, defaults)[0]["name"] == "granite3.2-vision"
+
+    save_models_config(data_dir, config)
+    assert load_models_config(data_dir, defaults)[0]["name"] == "edited"
+
+    srsly.write_jsonl(data_dir / "models_config.jsonl", [{"name": "gpt-4o", "provider": "sandbox"}, {"name": "x", "provider": "ollama"}])
+    assert [entry["name"] for entry in load_models_config(data_dir, defaults)] == ["gpt-4o", "x"]
+
+
+def test_models_config_without_seeding(tmp_path):
+    defaults = tmp_path / "defaults.jsonl"
+    srsly.write_jsonl(defaults, [{"name": "granite3.2-vision", "provider": "ollama"}])
+    data_dir = tmp_path / "data"
+    assert load_models_config(data_dir, defaults, seed=False)[0]["name"] == "granite3.2-vision"
+    assert not data_dir.exists()
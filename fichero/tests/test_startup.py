@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+from benchmarks.import_time import HEAVY_PACKAGES, parse_importtime, report
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | fichero.secrets
+import time:      5000 |       5000 |     docling.datamodel
+import time:       200 |       5200 |   docling
+import time:       100 |       5300 | fichero.process
+"""
+
+
+def test_report_flags_heavy_packages():
+    rows = parse_importtime(SAMPLE)
+    assert rows[1] == ("fichero.secrets", 300, 420, 0)
+    result = report("fichero.process", rows)
+    assert result["heavy_packages"] == ["docling"]
+    assert result["total_seconds"] == round((420 + 5300) / 1e6, 3)
+    assert result["slowest"][0]["module"] == "fichero.process"
+
+
+def test_light_modules_do_not_import_heavy_packages():
+    code = (
+        "import sys, fichero.cli, fichero.discovery, fichero.manifest, fichero.progress, fichero.lazy;"
+        f"print(','.join(p for p in {HEAVY_PACKAGES!r} if p in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,150 @@
+import pytest
+
+from fichero.store import Searcher, build_where, chunk_id, ingest_folder, stored_hash
+
+
+def matches(metadata: dict, where: dict) -> bool:
+    if where is None:
+        return True
+    if "$and" in where:
+        return all(matches(metadata, condition) for condition in where["$and"])
+    return all(metadata.get(key) == value for key, value in where.items())
+
+
+class FakeCollection:
+    """
+    The parts of a Chroma collection that ingest and search use, in memory.
+    """
+
+    def __init__(self, fail_after_upserts: int = None):
+        self.rows = {}
+        self.upserts = 0
+        self.fail_after_upserts = fail_after_upserts
+        self.queries = 0
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        if self.fail_after_upserts is not None and self.upserts >= self.fail_after_upserts:
+            raise RuntimeError("interrupted")
+        self.upserts += 1
+        for id_, document, metadata in zip(ids, documents, metadatas):
+            self.rows[id_] = (document, metadata)
+
+    def get(self, ids=None, where=None, limit=None, include=None):
+        found = [
+            (id_, row) for id_, row in sorted(self.rows.items())
+            if (ids is None or id_ in ids) and matches(row[1], where)
+        ][:limit]
+        return {"ids": [id_ for id_, _ in found], "metadatas": [row[1] for _, row in found]}
+
+    def delete(self, where=None):
+        for id_ in [id_ for id_, row in self.rows.items() if matches(row[1], where)]:
+            del self.rows[id_]
+
+    def count(self):
+        return len(self.rows)
+
+    def query(self, query_embeddings, n_results, where=None, include=None):
+        self.queries += 1
+        found = [(id_, row) for id_, row in sorted(self.rows.items()) if matches(row[1], where)][:n_results]
+        return {
+            "ids": [[id_ for id_, _ in found]],
+            "documents": [[row[0] for _, row in found]],
+            "metadatas": [[row[1] for _, row in found]],
+            "distances": [[0.0 for _ in found]],
+        }
+
+
+class FakeService:
+    """
+    Splits on blank lines and embeds each text as its length.
+    """
+
+    def __init__(self):
+        self.embedded = []
+
+    def split_text(self, text: str) -> list:
+        return [part for part in text.split("\n\n") if part.strip()]
+
+    def embed(self, texts: list) -> list:
+        self.embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+
+def write_doc(folder, name, pages):
+    path = folder / name
+    path.write_text("\n\n<!-- page break -->\n\n".join(pages), encoding="utf-8")
+    return path
+
+
+def test_ingest_skips_unchanged_files(tmp_path):
+    collection = FakeCollection()
+    service = FakeService()
+    path = write_doc(tmp_path, "letter.md", ["one\n\ntwo", "three"])
+
+    stats = ingest_folder(collection, tmp_path, service=service, batch_size=2, model="granite3.2-vision")
+    assert (stats["ingested"], stats["chunks"]) == (1, 3)
+    pages = [collection.rows[chunk_id(str(path), i)][1]["page"] for i in range(3)]
+    assert pages == [1, 1, 2]
+    assert stored_hash(collection, str(path)) is not None
+
+    stats = ingest_folder(collection, tmp_path, service=service)
+    assert (stats["skipped"], stats["ingested"]) == (1, 0)
+
+
+def test_changed_file_replaces_stale_chunks(tmp_path):
+    collection = FakeCollection()
+    service = FakeService()
+    path = write_doc(tmp_path, "letter.md", ["one\n\ntwo\n\nthree"])
+    ingest_folder(collection, tmp_path, service=service)
+
+    write_doc(tmp_path, "letter.md", ["only one"])
+    stats = ingest_folder(collection, tmp_path, service=service)
+    assert stats["ingested"] == 1
+    assert [row[0] for row in collection.rows.values()] == ["only one"]
+    assert stored_hash(collection, str(path)) is not None
+
+
+def test_interrupted_ingest_is_redone(tmp_path):
+    path = write_doc(tmp_path, "letter.md", ["one\n\ntwo\n\nthree"])
+    collection = FakeCollection(fail_after_upserts=1)
+    with pytest.raises(RuntimeError):
+        ingest_folder(collection, tmp_path, service=FakeService(), batch_size=2)
+    # the first batch made it in, the last chunk did not
+    assert collection.count() == 2
+    assert stored_hash(collection, str(path)) is None
+
+    collection.fail_after_upserts = None
+    stats = ingest_folder(collection, tmp_path, service=FakeService(), batch_size=2)
+    assert stats["ingested"] == 1
+    assert collection.count() == 3
+    assert stored_hash(collection, str(path)) is not None
+
+
+def test_build_where():
+    assert build_where() is None
+    assert build_where(folder="", page=None) is None
+    assert build_where(page=3) == {"page": 3}
+    assert build_where(folder="box1", model="granite3.2-vision") == {"$and": [{"folder": "box1"}, {"model": "granite3.2-vision"}]}
+
+
+def test_searcher_caches_until_the_collection_changes(tmp_path):
+    collection = FakeCollection()
+    service = FakeService()
+    write_doc(tmp_path, "letter.md", ["one", "two"])
+    ingest_folder(collection, tmp_path, service=service)
+    searcher = Searcher(collection, service=service)
+
+    first = searcher.search("two", page=2)
+    assert [hit["document"] for hit in first["hits"]] == ["two"]
+    assert not first["cached"]
+    assert searcher.search("two", page=2)["cached"]
+    assert collection.queries == 1
+    # the query embedding is reused for other filters
+    embedded = len(service.embedded)
+    assert not searcher.search("two", page=1)["cached"]
+    assert len(service.embedded) == embedded
+
+    write_doc(tmp_path, "memo.md", ["three"])
+    ingest_folder(collection, tmp_path, service=service)
+    assert not searcher.search("two", page=2)["cached"]
+    assert collection.queries == 3
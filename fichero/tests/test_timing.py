@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from fichero.timing import Instrumentation
+
+
+def test_stages_are_totalled_and_logged(tmp_path):
+    instrumentation = Instrumentation(slowest=2)
+    instrumentation.configure(tmp_path / "timings.jsonl")
+
+    instrumentation.record("a.pdf", "render", 0.5, page=1)
+    instrumentation.record("a.pdf", "vlm", 2.0, bytes=1000, page=1)
+    instrumentation.record("b.pdf", "vlm", 1.0, bytes=500)
+    instrumentation.record("c.pdf", "vlm", 3.0, bytes=500)
+    with pytest.raises(RuntimeError):
+        with instrumentation.stage("c.pdf", "save"):
+            raise RuntimeError("disk full")
+    for path in ("a.pdf", "b.pdf", "c.pdf"):
+        instrumentation.finish(path)
+
+    summary = instrumentation.summary()
+    assert summary["files"] == 3
+    assert summary["stages"]["vlm"] == {"count": 3, "seconds": 6.0, "bytes": 2000, "errors": 0}
+    assert summary["stages"]["save"]["errors"] == 1
+    assert [path for path, _ in instrumentation.slowest()] == ["c.pdf", "a.pdf"]
+
+    lines = [json.loads(line) for line in (tmp_path / "timings.jsonl").read_text().splitlines()]
+    assert lines[1]["stage"] == "vlm" and lines[1]["bytes"] == 1000 and lines[1]["page"] == 1
+    assert lines[4]["error"] == "disk full"
+    assert lines[-1] == {"file": "c.pdf", "stage": "file", "status": "done", "seconds": lines[-1]["seconds"]}
+
+
+def test_log_rotates(tmp_path):
+    instrumentation = Instrumentation()
+    instrumentation.configure(tmp_path / "timings.jsonl", max_bytes=500, backup_count=2)
+    for i in range(50):
+        instrumentation.record(f"{i}.pdf", "vlm", 0.1)
+    assert (tmp_path / "timings.jsonl.1").exists()
+    assert not (tmp_path / "timings.jsonl.3").exists()
@@ -0,0 +1,122 @@
+import multiprocessing
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from fichero.discovery import WorkItem
+from fichero.progress import FileRecord
+from fichero.workqueue import WorkQueue, run_worker
+
+
+def make_items(folder: Path, n: int) -> list:
+    items = []
+    for i in range(n):
+        path = folder / f"scan_{i:03d}.pdf"
+        path.write_bytes(b"%PDF")
+        items.append(WorkItem(path=path, input_dir=folder, size=4))
+    return items
+
+
+def test_enqueue_is_idempotent(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+    items = make_items(tmp_path, 3)
+    assert queue.enqueue(items) == 3
+    assert queue.enqueue(items) == 0
+    assert queue.stats() == {"pending": 3, "leased": 0, "done": 0, "failed": 0}
+
+
+def test_expired_leases_are_recovered(tmp_path):
+    now = [1000.0]
+    queue = WorkQueue(tmp_path / "queue.sqlite3", lease_seconds=60, max_attempts=2, clock=lambda: now[0])
+    queue.enqueue(make_items(tmp_path, 2))
+
+    first = queue.lease("a", n=2)
+    assert len(first) == 2
+    assert queue.lease("b") == []
+
+    # worker "a" dies; once the leases expire "b" picks them up
+    now[0] += 61
+    second = queue.lease("b", n=2)
+    assert {item.path for item in second} == {item.path for item in first}
+    assert not queue.complete(first[0].path, "a")
+    assert queue.complete(second[0].path, "b")
+
+    # the second file has now been leased twice, so a failure is final
+    assert queue.fail(second[1].path, "b", RuntimeError("bad scan"))
+    assert queue.stats() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+    assert queue.retry_failed() == 1
+    assert queue.stats()["pending"] == 1
+
+
+def test_renew_keeps_lease(tmp_path):
+    now = [0.0]
+    queue = WorkQueue(tmp_path / "queue.sqlite3", lease_seconds=60, clock=lambda: now[0])
+    queue.enqueue(make_items(tmp_path, 1))
+    queue.lease("a")
+    now[0] = 50
+    assert queue.renew("a") == 1
+    now[0] = 100
+    assert queue.lease("b") == []
+
+
+def convert_stub(item: WorkItem) -> FileRecord:
+    output = item.path.with_suffix(".md")
+    # each file must be converted by exactly one worker
+    with open(output, "x") as f:
+        f.write(str(multiprocessing.current_process().pid))
+    return FileRecord(path=item.path, status="done", output_path=output)
+
+
+def worker_process(queue_path: str, worker_id: str):
+    queue = WorkQueue(queue_path, lease_seconds=30)
+    summary = run_worker(queue, convert_stub, worker_id=worker_id, max_workers=2)
+    queue.close()
+    return summary.done
+
+
+def test_workers_in_several_processes_share_the_queue(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+    items = make_items(tmp_path, 40)
+    queue.enqueue(items)
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(4) as pool:
+        done = pool.starmap(worker_process, [(str(tmp_path / "queue.sqlite3"), f"w{i}") for i in range(4)])
+
+    assert sum(done) == 40
+    assert queue.stats() == {"pending": 0, "leased": 0, "done": 40, "failed": 0}
+    assert all(item.path.with_suffix(".md").exists() for item in items)
+
+
+def test_heartbeat_survives_renew_errors(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite3", lease_seconds=0.15)
+    queue.enqueue(make_items(tmp_path, 1))
+    renewals = []
+    renew = queue.renew
+
+    def flaky_renew(worker):
+        renewals.append(worker)
+        if len(renewals) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return renew(worker)
+
+    queue.renew = flaky_renew
+
+    def slow(item):
+        time.sleep(0.3)
+        return FileRecord(path=item.path, status="done")
+
+    summary = run_worker(queue, slow, worker_id="a")
+    assert summary.done == 1
+    assert len(renewals) >= 2
+
+
+def test_waiting_worker_stops_when_cancelled(tmp_path):
+    queue = WorkQueue(tmp_path / "queue.sqlite3")
+    cancel_event = threading.Event()
+    threading.Timer(0.1, cancel_event.set).start()
+    started = time.monotonic()
+    summary = run_worker(queue, convert_stub, cancel_event=cancel_event, wait_for_work=True, poll_interval=30)
+    assert time.monotonic() - started < 5
+    assert summary.cancelled